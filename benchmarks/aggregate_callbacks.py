@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Measure AggregateSignal callback latency under many fast sub-signals.
+
+Each sub-signal is updated from its own thread at a fixed rate, with its put
+time as the value, alongside a subscriber that takes a millisecond, like a
+GUI or lightpath update. Every readback is delivered unless --coalesce is
+given, so a subscriber slower than the updates builds up a backlog.
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+from ophyd.signal import Signal
+
+from pcdsdevices.signal import AggregateSignal
+
+
+class LatestSignal(AggregateSignal):
+    def __init__(self, signals, *, name, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self._sub_signals.extend(signals)
+
+    def _calc_readback(self):
+        return max(self._cache.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--signals', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='Updates per second for each sub-signal')
+    parser.add_argument('--duration', type=float, default=0.5)
+    parser.add_argument('--coalesce', action='store_true',
+                        help='Only deliver the newest readback')
+    args = parser.parse_args()
+
+    subs = [Signal(name='sub{}'.format(i), value=0.)
+            for i in range(args.signals)]
+    agg = LatestSignal(subs, name='agg')
+    agg._coalesce_sub_values = args.coalesce
+    latencies = []
+
+    def record(value, **kwargs):
+        latencies.append(time.perf_counter() - value)
+
+    def slow_subscriber(**kwargs):
+        time.sleep(0.001)
+
+    agg.subscribe(record)
+    agg.subscribe(slow_subscriber)
+    stop = time.perf_counter() + args.duration
+
+    def update(sig):
+        next_time = time.perf_counter()
+        while next_time < stop:
+            sig.put(time.perf_counter())
+            next_time += 1 / args.rate
+            time.sleep(max(0, next_time - time.perf_counter()))
+
+    threads = [threading.Thread(target=update, args=(sig,)) for sig in subs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = np.array(latencies) * 1e3
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print('{} signals at {:.0f} Hz: {} callbacks, latency p50 {:.2f} ms, '
+          'p99 {:.2f} ms, max {:.2f} ms'.format(
+              args.signals, args.rate, len(latencies), p50, p99,
+              latencies.max()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Time AggregateSignal.get when every sub-signal read is a slow round trip.
+
+Compares the concurrent reads against reading the sub-signals one at a
+time.
+"""
+import argparse
+import time
+
+from ophyd.signal import Signal
+
+from pcdsdevices.signal import AggregateSignal
+
+
+class SlowSignal(Signal):
+    """Soft signal where every read costs a simulated round trip."""
+    def __init__(self, *args, delay, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+
+    def get(self, **kwargs):
+        time.sleep(self.delay)
+        return super().get(**kwargs)
+
+
+class SumSignal(AggregateSignal):
+    def __init__(self, signals, *, name, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self._sub_signals.extend(signals)
+
+    def _calc_readback(self):
+        return sum(self._cache[sig] for sig in self._sub_signals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--signals', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.05,
+                        help='Seconds per read')
+    args = parser.parse_args()
+
+    subs = [SlowSignal(name='sub{}'.format(i), value=i, delay=args.delay)
+            for i in range(args.signals)]
+    agg = SumSignal(subs, name='agg')
+    start = time.perf_counter()
+    for sig in subs:
+        sig.get()
+    serial = time.perf_counter() - start
+    start = time.perf_counter()
+    agg.get()
+    concurrent = time.perf_counter() - start
+    print('get of {} signals with {:.0f} ms reads: serial {:.0f} ms, '
+          'concurrent {:.0f} ms'.format(args.signals, 1e3 * args.delay,
+                                        1e3 * serial, 1e3 * concurrent))
+
+
+if __name__ == '__main__':
+    main()
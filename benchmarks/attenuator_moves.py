@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Time Attenuator moves against a simulated IOC calculation.
+
+Compares the monitored calcpend wait against polling calcpend every 10 ms,
+which is how moves used to wait for the calculation.
+"""
+import argparse
+import threading
+import time
+
+from ophyd.sim import make_fake_device
+from ophyd.status import wait as status_wait
+
+from pcdsdevices.attenuator import MAX_FILTERS, _att_classes
+
+FakeAttenuator = make_fake_device(_att_classes[MAX_FILTERS-1])
+
+
+class PollingAttenuator(FakeAttenuator):
+    """Copy of the old polling wait for calcpend."""
+    @property
+    def actuate_value(self):
+        start = time.time()
+        while self.calcpend.get() != 0:
+            if time.time() - start > 1:
+                break
+            time.sleep(0.01)
+        goal = self.setpoint.get()
+        ceil = self.trans_ceil.get()
+        floor = self.trans_floor.get()
+        if abs(goal - ceil) > abs(goal - floor):
+            return 2
+        else:
+            return 3
+
+
+def time_moves(att, num_moves, calc_time):
+    att.readback.sim_put(1)
+    att.done.sim_put(0)
+    att.calcpend.sim_put(0)
+    att.trans_ceil.sim_put(0.8)
+    att.trans_floor.sim_put(0.2)
+
+    def fake_calc(*args, **kwargs):
+        att.calcpend.sim_put(1)
+        threading.Timer(calc_time, att.calcpend.sim_put, args=(0,)).start()
+
+    att.setpoint.subscribe(fake_calc, run=False)
+    start = time.perf_counter()
+    for i in range(num_moves):
+        goal = 0.4 + 0.1 * (i % 2)
+        status = att.move(goal, wait=False)
+        att.done.sim_put(1)
+        att.readback.sim_put(goal)
+        att.done.sim_put(0)
+        status_wait(status, timeout=1)
+    return num_moves / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--moves', type=int, default=50)
+    parser.add_argument('--calc-time', type=float, default=0.001,
+                        help='Seconds the IOC takes to calculate')
+    args = parser.parse_args()
+
+    polling = time_moves(PollingAttenuator('TST:ATT', name='poll'),
+                         args.moves, args.calc_time)
+    monitored = time_moves(FakeAttenuator('TST:ATT', name='att'),
+                           args.moves, args.calc_time)
+    print('moves per second: polling {:.1f}, monitored {:.1f}'
+          .format(polling, monitored))
+
+
+if __name__ == '__main__':
+    main()
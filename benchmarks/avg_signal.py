@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Time AvgSignal updates for a few buffer sizes.
+
+Compares the rolling statistics against calling np.nanmean over the whole
+buffer on every update.
+"""
+import argparse
+import time
+
+import numpy as np
+from ophyd.signal import Signal
+
+from pcdsdevices.signal import AvgSignal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--averages', type=int, nargs='+',
+                        default=[120, 12000])
+    args = parser.parse_args()
+
+    for averages in args.averages:
+        sig = Signal(name='raw', value=0)
+        avg = AvgSignal(sig, averages, name='avg')
+        avg._update_avg(value=0)
+        start = time.perf_counter()
+        for i in range(args.updates):
+            avg._update_avg(value=i)
+        rolling = (time.perf_counter() - start) / args.updates
+        start = time.perf_counter()
+        for i in range(args.updates):
+            np.nanmean(avg.values)
+        nanmean = (time.perf_counter() - start) / args.updates
+        print('{} averages: rolling {:.1f} us, nanmean {:.1f} us per update'
+              .format(averages, 1e6 * rolling, 1e6 * nanmean))
+
+
+if __name__ == '__main__':
+    main()
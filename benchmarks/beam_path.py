@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Time BeamPath updates and queries on a simulated beamline.
+
+Compares the incremental queries against walking every device on the path,
+which is what reading each device from EPICS would cost at best.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from ophyd.ophydobj import OphydObject
+
+from pcdsdevices.beampath import BeamPath
+
+
+class SimBlocker(OphydObject):
+    SUB_STATE = 'state'
+    _default_sub = SUB_STATE
+
+    def __init__(self, name, beamline, z, transmission=0.0):
+        super().__init__(name=name)
+        self.md = SimpleNamespace(name=name, beamline=beamline, z=z,
+                                  lightpath=True)
+        self.inserted = False
+        self.transmission = transmission
+
+    @property
+    def removed(self):
+        return not self.inserted
+
+    def set_inserted(self, inserted):
+        self.inserted = inserted
+        self._run_subs(sub_type=self.SUB_STATE, obj=self)
+
+
+class SimBranch(SimBlocker):
+    def __init__(self, name, beamline, z, branches):
+        super().__init__(name, beamline, z, transmission=1.0)
+        self.branches = branches
+        self.destination = [beamline]
+
+    def set_destination(self, destination):
+        self.destination = destination
+        self._run_subs(sub_type=self.SUB_STATE, obj=self)
+
+
+def make_beamline(num_devices):
+    """
+    MAIN continues to XCS, a mirror sends beam from MAIN to XPP and a
+    monochromator sends beam from XPP to MONO.
+    """
+    mirror = SimBranch('mirror', 'MAIN', 100, ['MAIN', 'XPP'])
+    mono = SimBranch('mono', 'XPP', 200, ['XPP', 'MONO'])
+    devices = [mirror, mono]
+    lines = {'MAIN': (0, 300), 'XPP': (100, 300), 'MONO': (200, 300)}
+    rng = random.Random(0)
+    for i in range(num_devices - len(devices)):
+        line = rng.choice(sorted(lines))
+        z = rng.uniform(*lines[line])
+        transmission = rng.choice([0.0, 0.05, 0.5, 0.9])
+        devices.append(SimBlocker('dev{}'.format(i), line, z, transmission))
+    return devices
+
+
+def naive_blocking(path, target):
+    """Check every device on the path."""
+    blocking = []
+    transmission = 1.0
+    route = path.routes[target]
+    for device, line in zip(route.devices, route.lines):
+        if line is not None:
+            if line not in device.destination:
+                blocking.append(device)
+                transmission = 0.0
+        elif device.inserted:
+            transmission *= device.transmission
+            if device.transmission < path.minimum_transmission:
+                blocking.append(device)
+    return blocking, transmission
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    devices = make_beamline(args.devices)
+    path = BeamPath(devices)
+    rng = random.Random(1)
+    toggles = [rng.choice(devices) for _ in range(args.updates)]
+    start = time.perf_counter()
+    for device in toggles:
+        if isinstance(device, SimBranch):
+            device.set_destination(rng.choice([[], ['MAIN'], device.branches,
+                                               device.branches[1:]]))
+        else:
+            device.set_inserted(not device.inserted)
+    update_time = (time.perf_counter() - start) / args.updates
+
+    lines = ('MAIN', 'XPP', 'MONO')
+    start = time.perf_counter()
+    for _ in range(args.queries):
+        for line in lines:
+            path.first_blocking(line)
+            path.transmission(line)
+    query_time = (time.perf_counter() - start) / args.queries / len(lines)
+
+    start = time.perf_counter()
+    for _ in range(args.queries):
+        for line in lines:
+            naive_blocking(path, line)
+    naive_time = (time.perf_counter() - start) / args.queries / len(lines)
+    print('{} devices: {:.1f} us per update, {:.2f} us per query, {:.1f} us '
+          'walking the path'.format(args.devices, 1e6 * update_time,
+                                    1e6 * query_time, 1e6 * naive_time))
+
+
+if __name__ == '__main__':
+    main()
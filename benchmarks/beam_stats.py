@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+"""
+Time BeamStats pulse energy updates with the default averaging windows.
+"""
+import argparse
+import time
+
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.beam_stats import BeamStats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--extra-windows', type=int, default=0,
+                        help='Extra windows to add with add_mj_window')
+    args = parser.parse_args()
+
+    stats = make_fake_device(BeamStats)()
+    stats.mj.sim_put(-1)
+    for shots in range(1, args.extra_windows + 1):
+        stats.add_mj_window(shots=shots)
+    now = time.time()
+    start = time.perf_counter()
+    for i in range(args.updates):
+        stats._mj_changed(value=float(i % 10), timestamp=now + i / 120)
+    elapsed = time.perf_counter() - start
+    print('{:.1f} us per pulse energy update'
+          .format(1e6 * elapsed / args.updates))
+
+
+if __name__ == '__main__':
+    main()
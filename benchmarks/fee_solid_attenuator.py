@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Time FEESolidAttenuator blade updates and inverse transmission solves.
+"""
+import argparse
+import time
+
+import numpy as np
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.attenuator import FEESolidAttenuator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--targets', type=int, default=500)
+    args = parser.parse_args()
+
+    materials = ['C'] * 9 + ['Si'] * 9 + [None]
+    thicknesses = [2**i for i in range(9)] * 2 + [0]
+    att = make_fake_device(FEESolidAttenuator)(
+        'AT2L0:XTES', name='at2l0', materials=materials,
+        thicknesses=thicknesses)
+    att.energy.put(10000)
+    for blade in att.blades:
+        blade.user_readback.sim_put(20)
+    # Fill the cache for this energy
+    att.transmission
+
+    start = time.perf_counter()
+    for i in range(args.updates):
+        att.blade_03.user_readback.sim_put(20 * (i % 2))
+    elapsed = time.perf_counter() - start
+    print('blade update: {:.1f} us per update'
+          .format(1e6 * elapsed / args.updates))
+
+    start = time.perf_counter()
+    att.find_configuration(np.linspace(0, 1, args.targets))
+    elapsed = time.perf_counter() - start
+    print('{} point inverse solve: {:.1f} ms'.format(args.targets,
+                                                     1e3 * elapsed))
+
+
+if __name__ == '__main__':
+    main()
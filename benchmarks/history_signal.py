@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Time HistorySignal downsampling of a full buffer for plotting.
+"""
+import argparse
+import time
+
+import numpy as np
+from ophyd.signal import Signal
+
+from pcdsdevices.signal import HistorySignal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=1000000)
+    parser.add_argument('--points', type=int, default=2000)
+    args = parser.parse_args()
+
+    sig = Signal(name='raw', value=0)
+    hist = HistorySignal(sig, capacity=args.samples, name='hist')
+    values = np.random.default_rng(2).normal(size=args.samples)
+    now = time.time()
+    for i, value in enumerate(values):
+        hist.buffer.append(value, timestamp=now + i)
+    start = time.perf_counter()
+    _, downsampled = hist.downsample(args.points)
+    elapsed = time.perf_counter() - start
+    print('downsample of {} samples to {} points: {:.1f} ms, {:.0f} MB buffer'
+          .format(args.samples, len(downsampled), 1e3 * elapsed,
+                  (hist.buffer._values.nbytes
+                   + hist.buffer._timestamps.nbytes) / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Time InOutRecordPositioner state callbacks while a StateStatus is waiting.
+"""
+import argparse
+import time
+
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.inout import InOutRecordPositioner
+from pcdsdevices.state import StateStatus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--callbacks', type=int, default=5000)
+    args = parser.parse_args()
+
+    inout = make_fake_device(InOutRecordPositioner)('Test:Ref', name='test')
+    inout.state.sim_put(0)
+    inout.state.sim_set_enum_strs(('Unknown', 'IN', 'OUT'))
+    inout.state.put('OUT')
+    StateStatus(inout, 'IN')
+    values = ('OUT', 2, 'Unknown')
+    start = time.perf_counter()
+    for i in range(args.callbacks):
+        # Same as a state signal update, without the fake signal overhead
+        inout._run_sub_state(sub_type=inout.state.SUB_VALUE, obj=inout.state,
+                             value=values[i % 3])
+        inout.check_inserted(values[i % 3])
+        inout.check_transmission(values[i % 3])
+    elapsed = time.perf_counter() - start
+    print('state callbacks per second: {:.0f}'
+          .format(args.callbacks / elapsed))
+
+
+if __name__ == '__main__':
+    main()
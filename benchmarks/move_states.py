@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Time state changes of many InOut devices at once.
+
+Compares a status per device against one batched move_states status.
+"""
+import argparse
+import time
+
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.inout import InOutRecordPositioner
+from pcdsdevices.state import move_states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=12)
+    parser.add_argument('--moves', type=int, default=50)
+    args = parser.parse_args()
+
+    Fake = make_fake_device(InOutRecordPositioner)
+    devices = []
+    for i in range(args.devices):
+        inout = Fake('Test:Ref{}'.format(i), name='test{}'.format(i))
+        inout.state.sim_put(0)
+        inout.state.sim_set_enum_strs(('Unknown', 'IN', 'OUT'))
+        inout.state.put('OUT')
+        devices.append(inout)
+
+    def separate(state):
+        statuses = [dev.move(state, timeout=10) for dev in devices]
+        for status in statuses:
+            status.wait(timeout=1)
+
+    def batched(state):
+        move_states({dev: state for dev in devices},
+                    timeout=10).wait(timeout=1)
+
+    for name, func in (('separate', separate), ('batched', batched)):
+        start = time.perf_counter()
+        for i in range(args.moves):
+            func(('IN', 'OUT')[i % 2])
+        elapsed = time.perf_counter() - start
+        print('{} device state change, {} statuses: {:.2f} ms'.format(
+            args.devices, name, 1e3 * elapsed / args.moves))
+
+
+if __name__ == '__main__':
+    main()
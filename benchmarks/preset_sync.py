@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Time setup_preset_paths for many devices.
+
+Compares YAML directories against SQLite databases, and a serial sync
+against the parallel one when a few files are locked by another session.
+"""
+import argparse
+import fcntl
+import tempfile
+import time
+from pathlib import Path
+
+from pcdsdevices.interface import setup_preset_paths
+from pcdsdevices.preset_store import YamlPresetStore, import_yaml
+from pcdsdevices.sim import FastMotor
+
+
+def sample_presets(index):
+    return {'zero': {'value': 0.0, 'active': True},
+            'out': {'value': float(index), 'active': True}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--motors', type=int, default=500)
+    parser.add_argument('--locked', type=int, default=4)
+    args = parser.parse_args()
+
+    folder = Path(tempfile.mkdtemp())
+    motors = [FastMotor(name='motor{}'.format(i)) for i in range(args.motors)]
+    yaml_paths = {}
+    sqlite_paths = {}
+    for preset_type in ('hutch', 'user'):
+        yaml_paths[preset_type] = folder / preset_type
+        yaml_paths[preset_type].mkdir()
+        store = YamlPresetStore(yaml_paths[preset_type])
+        for i, motor in enumerate(motors):
+            store.write(motor.name, sample_presets(i))
+            motor.presets
+        sqlite_paths[preset_type] = folder / (preset_type + '.db')
+        import_yaml(yaml_paths[preset_type], sqlite_paths[preset_type])
+
+    for backend, paths in (('yaml', yaml_paths), ('sqlite', sqlite_paths)):
+        start = time.perf_counter()
+        setup_preset_paths(**paths)
+        print('{} startup: {:.3f} s'.format(backend,
+                                            time.perf_counter() - start))
+
+    setup_preset_paths(**yaml_paths)
+    locked = [open(yaml_paths['hutch'] / (motor.name + '.yml'), 'r+')
+              for motor in motors[:args.locked]]
+    try:
+        for f in locked:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        start = time.perf_counter()
+        for motor in motors:
+            motor.presets._sync(force=True)
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        setup_preset_paths(**yaml_paths)
+        parallel = time.perf_counter() - start
+    finally:
+        for f in locked:
+            f.close()
+    print('sync with {} locked files: serial {:.3f} s, parallel {:.3f} s'
+          .format(args.locked, serial, parallel))
+    setup_preset_paths()
+
+
+if __name__ == '__main__':
+    main()
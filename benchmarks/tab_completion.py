@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Time building the tab-completion whitelist and dir() in user mode.
+
+Compares collecting the whitelist incrementally per class against
+rebuilding the regex from the whole MRO for every class.
+"""
+import argparse
+import re
+import time
+
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.attenuator import FEESolidAttenuator
+from pcdsdevices.interface import BaseInterface, set_engineering_mode
+
+
+def naive_tab_regex(cls):
+    """Build the whitelist regex from the whole MRO."""
+    string_whitelist = []
+    for parent in cls.mro():
+        if hasattr(parent, "tab_whitelist"):
+            string_whitelist.extend(parent.tab_whitelist)
+    return re.compile("|".join(string_whitelist))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=50)
+    parser.add_argument('--dirs', type=int, default=100)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cls = BaseInterface
+    for i in range(args.depth):
+        cls = type('Interface{}'.format(i), (cls,),
+                   dict(tab_whitelist=['method{}'.format(i),
+                                       'attr{}_.*'.format(i)]))
+    cls._get_tab_regex()
+    elapsed = time.perf_counter() - start
+
+    naive_start = time.perf_counter()
+    naive_cls = BaseInterface
+    for i in range(args.depth):
+        naive_cls = type('Interface{}'.format(i), (naive_cls,),
+                         dict(tab_whitelist=['method{}'.format(i),
+                                             'attr{}_.*'.format(i)]))
+        naive_tab_regex(naive_cls)
+    # Defining the classes also runs the new build, take that back out
+    naive_elapsed = time.perf_counter() - naive_start - elapsed
+    print('defining {} nested interfaces: {:.1f} ms, {:.1f} ms rebuilding '
+          'the regex from the MRO'.format(args.depth, 1e3 * elapsed,
+                                          1e3 * naive_elapsed))
+
+    set_engineering_mode(False)
+    try:
+        att = make_fake_device(FEESolidAttenuator)('AT2L0:XTES', name='att')
+        start = time.perf_counter()
+        dir(att)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.dirs):
+            dir(att)
+        cached = (time.perf_counter() - start) / args.dirs
+    finally:
+        set_engineering_mode(True)
+    print('dir of an FEESolidAttenuator in user mode: {:.1f} us first, '
+          '{:.1f} us cached'.format(1e6 * first, 1e6 * cached))
+
+
+if __name__ == '__main__':
+    main()
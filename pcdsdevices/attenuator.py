@@ -1,25 +1,299 @@
 """
 Module for `Attenuator` and related classes.
 """
+import functools
 import logging
-import time
+from threading import Condition
 
 import numpy as np
 from ophyd.device import Component as Cpt
 from ophyd.device import Device
 from ophyd.device import FormattedComponent as FCpt
+from ophyd.positioner import PositionerBase
 from ophyd.pv_positioner import PVPositioner, PVPositionerPC
 from ophyd.signal import EpicsSignal, EpicsSignalRO, Signal, SignalRO
+from ophyd.status import wait as status_wait
+from ophyd.utils import LimitError
+from periodictable import xsf
 
 from .epics_motor import BeckhoffAxis
 from .inout import InOutPositioner
 from .interface import BaseInterface, FltMvInterface, LightpathMixin
 from .signal import InternalSignal
+from .state import move_states
 
 logger = logging.getLogger(__name__)
 MAX_FILTERS = 12
 
 
+@functools.lru_cache(maxsize=1024)
+def get_attenuation_length(material, energy, density=None):
+    """
+    Get the x-ray attenuation length of a material.
+
+    Results are cached per material, energy, and density, so repeated
+    calculations at the same beam energy do not recompute the scattering
+    factors.
+
+    Parameters
+    ----------
+    material : str
+        Chemical formula of the material, e.g. 'Si'.
+
+    energy : float
+        Photon energy in eV.
+
+    density : float, optional
+        Mass density in g/cm^3. If omitted, the natural density of the
+        material will be used.
+
+    Returns
+    -------
+    length : float
+        The 1/e attenuation length in microns.
+    """
+
+    energy_kev = energy / 1000
+    index = xsf.index_of_refraction(material, density=density,
+                                    energy=energy_kev)
+    beta = -np.imag(index)
+    # Wavelength is in angstroms, convert to microns
+    wavelength = xsf.xray_wavelength(energy_kev) * 1e-4
+    return wavelength / (4 * np.pi * beta)
+
+
+def combination_sums(values):
+    """
+    Sum every possible subset of values.
+
+    The result is indexed by bitmask: bit ``i`` of an index is set if
+    ``values[i]`` is included in that subset.
+
+    Parameters
+    ----------
+    values : list of float
+        The per-item values to combine.
+
+    Returns
+    -------
+    sums : ~numpy.ndarray
+        Array of length ``2**len(values)``.
+    """
+
+    sums = np.zeros(1)
+    for value in values:
+        sums = np.concatenate((sums, sums + value))
+    return sums
+
+
+def index_to_config(index, num_blades):
+    """
+    Expand bitmask indices into boolean blade configurations.
+
+    Parameters
+    ----------
+    index : int or ~numpy.ndarray
+        One or more bitmask indices as used by :func:`combination_sums`.
+
+    num_blades : int
+        The number of blades in the configuration.
+
+    Returns
+    -------
+    config : ~numpy.ndarray
+        Boolean array of shape ``(..., num_blades)``, `True` where a blade
+        is inserted.
+    """
+
+    index = np.asarray(index)
+    return ((index[..., np.newaxis] >> np.arange(num_blades)) & 1).astype(bool)
+
+
+def config_to_index(config):
+    """
+    Collapse boolean blade configurations into bitmask indices.
+
+    This is the inverse of :func:`index_to_config`.
+    """
+
+    config = np.asarray(config, dtype=bool)
+    return (config << np.arange(config.shape[-1])).sum(axis=-1)
+
+
+class TransmissionCalculator:
+    """
+    Local calculator of attenuator transmissions.
+
+    This evaluates every combination of inserted and removed blades at once
+    as a single array, so that finding the best combination for any number
+    of target transmissions is a sorted search rather than a round trip to
+    the attenuator IOC.
+
+    Parameters
+    ----------
+    thicknesses : list of float
+        Thickness of each blade in microns.
+
+    materials : list of str
+        Chemical formula of each blade, e.g. 'Si'.
+
+    densities : list of float, optional
+        Mass density of each blade in g/cm^3. Defaults to the natural density
+        of each material.
+
+    max_cached_energies : int, optional
+        The number of energies to keep the full table of combinations for.
+        Each table holds ``2**num_blades`` values.
+    """
+
+    def __init__(self, thicknesses, materials, densities=None,
+                 max_cached_energies=16):
+        if densities is None:
+            densities = [None] * len(thicknesses)
+        if not len(thicknesses) == len(materials) == len(densities):
+            raise ValueError('Must provide one thickness, material, and '
+                             'density per blade.')
+        self.thicknesses = np.asarray(thicknesses, dtype=float)
+        self.materials = list(materials)
+        self.densities = list(densities)
+        self.max_cached_energies = max_cached_energies
+        self._tables = {}
+        self._sorted = {}
+
+    @property
+    def num_blades(self):
+        """The number of blades this calculator considers."""
+        return len(self.thicknesses)
+
+    def blade_transmissions(self, energy):
+        """
+        Transmission of each individual blade at the given energy in eV.
+        """
+
+        return np.exp(-self._blade_absorption(energy))
+
+    def _blade_absorption(self, energy):
+        lengths = [get_attenuation_length(mat, energy, density=dens)
+                   for mat, dens in zip(self.materials, self.densities)]
+        return self.thicknesses / np.asarray(lengths)
+
+    def _get_table(self, energy):
+        """Get the cached transmissions of all combinations at an energy."""
+        try:
+            return self._tables[energy]
+        except KeyError:
+            pass
+        table = np.exp(-combination_sums(self._blade_absorption(energy)))
+        if len(self._tables) >= self.max_cached_energies:
+            old_energy = next(iter(self._tables))
+            del self._tables[old_energy]
+            self._sorted.pop(old_energy, None)
+        self._tables[energy] = table
+        return table
+
+    def _get_sorted_table(self, energy):
+        """
+        Get the bitmask indices sorted by transmission at an energy, along
+        with the sorted transmissions.
+
+        This is only needed for the inverse problem, so it is computed on
+        first use.
+        """
+
+        table = self._get_table(energy)
+        try:
+            return self._sorted[energy]
+        except KeyError:
+            pass
+        # Stable sort keeps the lowest index (fewest blades) first on ties
+        order = np.argsort(table, kind='stable')
+        self._sorted[energy] = (order, table[order])
+        return self._sorted[energy]
+
+    def all_transmissions(self, energy):
+        """
+        Transmission of every blade combination at the given energy in eV.
+
+        Returns
+        -------
+        transmissions : ~numpy.ndarray
+            Array of length ``2**num_blades``, indexed by the bitmask of
+            inserted blades. See :func:`index_to_config`.
+        """
+
+        return self._get_table(energy)
+
+    def transmission(self, config, energy):
+        """
+        Transmission of a particular blade configuration.
+
+        Parameters
+        ----------
+        config : list of bool
+            `True` for each blade that is inserted. This can also be a 2D
+            array of many configurations.
+
+        energy : float
+            Photon energy in eV.
+        """
+
+        config = np.asarray(config, dtype=bool)
+        return np.exp(-(config * self._blade_absorption(energy)).sum(axis=-1))
+
+    def find_configuration(self, transmission, energy, mode='nearest'):
+        """
+        Find the blade configurations that best match target transmissions.
+
+        Parameters
+        ----------
+        transmission : float or list of float
+            One or more desired transmissions between 0 and 1. Passing many
+            values at once, e.g. every point of a scan, costs little more
+            than passing one.
+
+        energy : float
+            Photon energy in eV.
+
+        mode : {'nearest', 'ceil', 'floor'}, optional
+            Pick the closest achievable transmission, the closest one that
+            is not below the target, or the closest one that is not above
+            the target. 'nearest' picks the floor on a tie. If no
+            combination satisfies 'ceil' or 'floor', the closest one is
+            used.
+
+        Returns
+        -------
+        config : ~numpy.ndarray
+            Boolean array of inserted blades, with shape ``(num_blades,)``
+            for a scalar target or ``(len(transmission), num_blades)``
+            otherwise.
+
+        transmission : float or ~numpy.ndarray
+            The achieved transmission for each configuration.
+        """
+
+        if mode not in ('nearest', 'ceil', 'floor'):
+            raise ValueError(f'Invalid mode {mode}, must be one of '
+                             "'nearest', 'ceil', 'floor'")
+        targets = np.asarray(transmission, dtype=float)
+        order, sorted_trans = self._get_sorted_table(energy)
+        last = len(sorted_trans) - 1
+        ceil = np.clip(np.searchsorted(sorted_trans, targets, side='left'),
+                       0, last)
+        floor = np.clip(np.searchsorted(sorted_trans, targets, side='right')
+                        - 1, 0, last)
+        if mode == 'ceil':
+            pick = ceil
+        elif mode == 'floor':
+            pick = floor
+        else:
+            use_ceil = (np.abs(sorted_trans[ceil] - targets)
+                        < np.abs(sorted_trans[floor] - targets))
+            pick = np.where(use_ceil, ceil, floor)
+        config = index_to_config(order[pick], self.num_blades)
+        return config, sorted_trans[pick]
+
+
 class Filter(InOutPositioner):
     """
     A single attenuation blade.
@@ -74,13 +348,16 @@ class AttBase(FltMvInterface, PVPositioner):
 
     # Attenuator Signals
     energy = Cpt(EpicsSignalRO, ':COM:T_CALC.VALE', kind='normal')
-    trans_ceil = Cpt(EpicsSignalRO, ':COM:R_CEIL', kind='omitted')
-    trans_floor = Cpt(EpicsSignalRO, ':COM:R_FLOOR', kind='omitted')
+    trans_ceil = Cpt(EpicsSignalRO, ':COM:R_CEIL', auto_monitor=True,
+                     kind='omitted')
+    trans_floor = Cpt(EpicsSignalRO, ':COM:R_FLOOR', auto_monitor=True,
+                      kind='omitted')
     user_energy = Cpt(EpicsSignal, ':COM:EDES', kind='omitted')
     eget_cmd = Cpt(EpicsSignal, ':COM:EACT.SCAN', kind='omitted')
 
     # Aux Signals
-    calcpend = Cpt(EpicsSignalRO, ':COM:CALCP', kind='omitted')
+    calcpend = Cpt(EpicsSignalRO, ':COM:CALCP', auto_monitor=True,
+                   kind='omitted')
 
     egu = ''  # Transmission is a unitless ratio
     done_value = 0
@@ -90,17 +367,54 @@ class AttBase(FltMvInterface, PVPositioner):
     # Subscription Types
     SUB_STATE = 'state'
     # Tab complete whitelist
-    tab_whitelist = ['set_energy']
+    tab_whitelist = ['set_energy', 'find_configuration']
 
     def __init__(self, prefix, *, name, **kwargs):
         super().__init__(prefix, name=name, limits=(0, 1), **kwargs)
         self.filters = []
         self._has_subscribed_state = False
+        self._calculator = None
+        # Count finished IOC calculations, so a move can wait for a new one
+        self._calc_cond = Condition()
+        self._calc_pending = False
+        self._calc_count = 0
+        self._calc_requested = -1
         for i in range(1, MAX_FILTERS + 1):
             try:
                 self.filters.append(getattr(self, 'filter{}'.format(i)))
             except AttributeError:
                 break
+        self.calcpend.subscribe(self._calcpend_changed)
+
+    def _calcpend_changed(self, *args, value, **kwargs):
+        """Keep track of pending calculations without polling."""
+        with self._calc_cond:
+            if value == 0:
+                if self._calc_pending:
+                    self._calc_count += 1
+                self._calc_pending = False
+            else:
+                self._calc_pending = True
+            self._calc_cond.notify_all()
+
+    def _calc_ready(self):
+        return (not self._calc_pending
+                and self._calc_count > self._calc_requested)
+
+    def _wait_for_calc(self, timeout=1):
+        """
+        Wait for the IOC to finish calculating the transmission.
+
+        If a move changed the setpoint, this waits for a calculation that
+        finished after the change, not for one that was already done.
+        """
+
+        with self._calc_cond:
+            if not self._calc_cond.wait_for(self._calc_ready,
+                                            timeout=timeout):
+                logger.warning('Timed out waiting for %s to calculate the '
+                               'transmission, using the last result',
+                               self.name)
 
     @property
     def actuate_value(self):
@@ -112,14 +426,12 @@ class AttBase(FltMvInterface, PVPositioner):
         choose the floor.
 
         This will wait until a pending calculation completes before returning.
+        During a move, it waits for the calculation for the new setpoint.
+        The signals used here are monitored, so this does not need to ask the
+        IOC for any values.
         """
 
-        timeout = 1
-        start = time.time()
-        while self.calcpend.get() != 0:
-            if time.time() - start > timeout:
-                break
-            time.sleep(0.01)
+        self._wait_for_calc()
 
         goal = self.setpoint.get()
         ceil = self.trans_ceil.get()
@@ -159,6 +471,62 @@ class AttBase(FltMvInterface, PVPositioner):
         """
         return self.position
 
+    def get_calculator(self, refresh=False):
+        """
+        Get a :class:`TransmissionCalculator` for this attenuator's filters.
+
+        The thickness and material of each filter are read once and reused
+        on subsequent calls.
+
+        Parameters
+        ----------
+        refresh : bool, optional
+            If `True`, read the filter thicknesses and materials again, e.g.
+            after a blade has been swapped.
+        """
+
+        if self._calculator is None or refresh:
+            thicknesses = [filt.thickness.get() for filt in self.filters]
+            materials = [filt.material.get() for filt in self.filters]
+            self._calculator = TransmissionCalculator(thicknesses, materials)
+        return self._calculator
+
+    def find_configuration(self, transmission, energy=None, mode='nearest'):
+        """
+        Find the filters to insert for one or more transmissions locally.
+
+        This does not use the IOC's calculation, so it does not need to wait
+        for a pending calculation and can resolve an entire scan's worth of
+        transmissions in one call.
+
+        Parameters
+        ----------
+        transmission : float or list of float
+            One or more desired transmissions between 0 and 1.
+
+        energy : float, optional
+            Photon energy in eV. If omitted, we'll use the energy currently
+            used by the IOC's calculation.
+
+        mode : {'nearest', 'ceil', 'floor'}, optional
+            How to pick between the achievable transmissions around each
+            target. See :meth:`TransmissionCalculator.find_configuration`.
+
+        Returns
+        -------
+        config : ~numpy.ndarray
+            Boolean array of inserted filters, ordered like
+            :attr:`filters`.
+
+        transmission : float or ~numpy.ndarray
+            The achieved transmission for each configuration.
+        """
+
+        if energy is None:
+            energy = self.energy.get()
+        calc = self.get_calculator()
+        return calc.find_configuration(transmission, energy, mode=mode)
+
     @property
     def inserted(self):
         """`True` if any blade is inserted."""
@@ -209,7 +577,13 @@ class AttBase(FltMvInterface, PVPositioner):
         """
 
         old_position = self.position
+        # The calcpend monitor for this setpoint arrives after the put, so
+        # note which calculations are stale before making it
+        with self._calc_cond:
+            if self.setpoint.get() != position:
+                self._calc_requested = self._calc_count
         super()._setup_move(position)
+        self._wait_for_calc()
         ceil = self.trans_ceil.get()
         floor = self.trans_floor.get()
         if any(np.isclose((old_position, old_position), (ceil, floor))):
@@ -246,13 +620,17 @@ class AttBase3rd(AttBase):
     """
 
     # Positioner Signals
-    setpoint = Cpt(EpicsSignal, ':COM:R3_DES', kind='normal')
-    readback = Cpt(EpicsSignalRO, ':COM:R3_CUR', kind='hinted')
+    setpoint = Cpt(EpicsSignal, ':COM:R3_DES', auto_monitor=True,
+                   kind='normal')
+    readback = Cpt(EpicsSignalRO, ':COM:R3_CUR', auto_monitor=True,
+                   kind='hinted')
 
     # Attenuator Signals
     energy = Cpt(EpicsSignalRO, ':COM:T_CALC.VALH', kind='normal')
-    trans_ceil = Cpt(EpicsSignalRO, ':COM:R3_CEIL', kind='omitted')
-    trans_floor = Cpt(EpicsSignalRO, ':COM:R3_FLOOR', kind='omitted')
+    trans_ceil = Cpt(EpicsSignalRO, ':COM:R3_CEIL', auto_monitor=True,
+                     kind='omitted')
+    trans_floor = Cpt(EpicsSignalRO, ':COM:R3_FLOOR', auto_monitor=True,
+                      kind='omitted')
     user_energy = Cpt(EpicsSignal, ':COM:E3DES', kind='omitted')
 
 
@@ -266,8 +644,10 @@ class FeeAtt(AttBase, PVPositionerPC):
 
     # Attenuator Signals
     energy = Cpt(EpicsSignalRO, ':ETOA.E', kind='normal')
-    trans_ceil = Cpt(EpicsSignalRO, ':R_CEIL', kind='omitted')
-    trans_floor = Cpt(EpicsSignalRO, ':R_FLOOR', kind='omitted')
+    trans_ceil = Cpt(EpicsSignalRO, ':R_CEIL', auto_monitor=True,
+                     kind='omitted')
+    trans_floor = Cpt(EpicsSignalRO, ':R_FLOOR', auto_monitor=True,
+                      kind='omitted')
     user_energy = Cpt(EpicsSignal, ':EDES', kind='omitted')
     eget_cmd = Cpt(EpicsSignal, ':EACT.SCAN', kind='omitted')
 
@@ -346,15 +726,358 @@ def Attenuator(prefix, n_filters, *, name, use_3rd=False, **kwargs):
     return cls(prefix, name=name, **kwargs)
 
 
-'''
-# WIP
-def set_combined_attenuation(attenuation, *attenuators):
-    for i in range(len(attenuators)):
-        if i < len(attenuators)-1:
-            attenuators[i].actuate_value(force_ceil=True)
+def count_moved_blades(current, num_blades):
+    """
+    Count the blades that change for every possible blade configuration.
+
+    Parameters
+    ----------
+    current : int
+        Bitmask index of the current configuration.
+
+    num_blades : int
+        The number of blades in the configuration.
+
+    Returns
+    -------
+    moved : ~numpy.ndarray
+        Array of length ``2**num_blades``, indexed by the bitmask of the
+        new configuration.
+    """
+
+    config = index_to_config(current, num_blades)
+    # Each blade adds one move if its inserted state flips
+    moved = config.sum() + combination_sums(1 - 2 * config.astype(int))
+    return moved.astype(int)
+
+
+class AttenuatorGroup(FltMvInterface, PositionerBase):
+    """
+    Several attenuators in series, moved as a single transmission positioner.
+
+    The combined transmission is the product of each attenuator's
+    transmission. Moves pick a filter configuration for every attenuator at
+    once using each attenuator's local :class:`TransmissionCalculator`,
+    preferring the configuration that moves the fewest blades from the
+    current one, and then move all of the required blades in parallel.
+
+    Parameters
+    ----------
+    *attenuators : AttBase
+        The attenuators to combine. These can be any mix of :class:`AttBase`
+        and :class:`AttBase3rd` devices, each using its own energy.
+
+    name : str
+        An identifying name for the group.
+
+    tolerance : float, optional
+        Relative tolerance on the target transmission. Any configuration
+        within this tolerance, or as close as the best possible configuration
+        if that is further away, is acceptable, and the one that moves the
+        fewest blades is used.
+
+    Notes
+    -----
+    ``SUB_READBACK`` subscriptions run with the combined transmission
+    whenever a blade state or an attenuator's transmission readback updates.
+    """
+
+    egu = ''  # Transmission is a unitless ratio
+
+    tab_whitelist = ['attenuators', 'transmission', 'find_configuration',
+                     'plan_configurations']
+
+    # Limit on the size of the joint search before the last attenuator
+    _max_search_size = 2**20
+
+    def __init__(self, *attenuators, name, tolerance=0.01, **kwargs):
+        if not attenuators:
+            raise ValueError('Must provide at least one attenuator.')
+        super().__init__(name=name, **kwargs)
+        self.attenuators = list(attenuators)
+        self.tolerance = tolerance
+        for att in self.attenuators:
+            att.subscribe(self._run_sub_readback, event_type=att.SUB_READBACK,
+                          run=False)
+            for filt in att.filters:
+                filt.state.subscribe(self._run_sub_readback, run=False)
+
+    def _run_sub_readback(self, *args, timestamp=None, **kwargs):
+        self._run_subs(sub_type=self.SUB_READBACK, obj=self,
+                       value=self.position, timestamp=timestamp)
+
+    @property
+    def position(self):
+        """The combined transmission of all attenuators."""
+        return float(np.prod([att.position for att in self.attenuators]))
+
+    @property
+    def transmission(self):
+        """
+        Ratio of pass-through beam to incoming beam as a value between
+        1 (full beam) and 0 (no beam).
+        """
+        return self.position
+
+    @property
+    def limits(self):
+        return (0, 1)
+
+    def check_value(self, value):
+        """Raise a `LimitError` if value is not a valid transmission."""
+        low, high = self.limits
+        if not low <= value <= high:
+            raise LimitError('Value {} outside of range: [{}, {}]'
+                             .format(value, low, high))
+
+    def _current_indices(self):
+        """Get the bitmask index of each attenuator's inserted filters."""
+        return [int(config_to_index([filt.inserted for filt in att.filters]))
+                for att in self.attenuators]
+
+    def _get_tables(self):
+        """Get the transmission of every configuration of each attenuator."""
+        return [att.get_calculator().all_transmissions(att.energy.get())
+                for att in self.attenuators]
+
+    def find_configuration(self, transmission, current=None):
+        """
+        Find the filters to insert in every attenuator for a transmission.
+
+        The joint configuration space is searched as arrays: all
+        configurations of every attenuator but the largest are enumerated
+        together, and the matching configurations of the largest attenuator
+        are found with a sorted search for each of those.
+
+        Parameters
+        ----------
+        transmission : float
+            The desired combined transmission between 0 and 1.
+
+        current : list of list of bool, optional
+            The configuration to minimize blade moves from, one list per
+            attenuator. Defaults to the current filter states.
+
+        Returns
+        -------
+        configs : list of ~numpy.ndarray
+            Boolean array of inserted filters for each attenuator.
+
+        transmission : float
+            The achieved combined transmission.
+        """
+
+        if current is None:
+            current = self._current_indices()
         else:
-            attenuators[i].actuate_value()
-'''
+            current = [int(config_to_index(config)) for config in current]
+        indices, trans = self._search(transmission, self._get_tables(),
+                                      current)
+        configs = [index_to_config(index, len(att.filters))
+                   for index, att in zip(indices, self.attenuators)]
+        return configs, trans
+
+    def plan_configurations(self, transmissions):
+        """
+        Find the configurations for a sequence of transmissions.
+
+        Each configuration minimizes the blade moves from the previous one,
+        starting from the current filter states, which is the real time cost
+        of a transmission scan.
+
+        Parameters
+        ----------
+        transmissions : list of float
+            The desired combined transmissions, in scan order.
+
+        Returns
+        -------
+        configs : list of list of ~numpy.ndarray
+            For each step, the boolean array of inserted filters for each
+            attenuator.
+
+        transmissions : ~numpy.ndarray
+            The achieved combined transmission at each step.
+        """
+
+        tables = self._get_tables()
+        current = self._current_indices()
+        configs = []
+        achieved = []
+        for target in transmissions:
+            current, trans = self._search(target, tables, current)
+            configs.append([index_to_config(index, len(att.filters))
+                            for index, att in zip(current,
+                                                  self.attenuators)])
+            achieved.append(trans)
+        return configs, np.asarray(achieved)
+
+    def _search(self, target, tables, current):
+        """
+        Search the joint configuration space for a target transmission.
+
+        Parameters
+        ----------
+        target : float
+            The desired combined transmission.
+
+        tables : list of ~numpy.ndarray
+            The transmission of every configuration of each attenuator.
+
+        current : list of int
+            The bitmask index of each attenuator's current configuration.
+
+        Returns
+        -------
+        indices : list of int
+            The bitmask index of each attenuator's new configuration.
+
+        transmission : float
+            The achieved combined transmission.
+        """
+
+        num_blades = [int(np.log2(len(table))) for table in tables]
+        last = int(np.argmax(num_blades))
+        others = [k for k in range(len(tables)) if k != last]
+
+        # Enumerate every joint configuration of the other attenuators
+        prefix_trans = np.ones(1)
+        prefix_moved = np.zeros(1, dtype=int)
+        for k in others:
+            if len(prefix_trans) * len(tables[k]) > self._max_search_size:
+                raise ValueError('Too many filters to search the joint '
+                                 'configuration space.')
+            moved = count_moved_blades(current[k], num_blades[k])
+            prefix_trans = np.multiply.outer(prefix_trans, tables[k]).ravel()
+            prefix_moved = np.add.outer(prefix_moved, moved).ravel()
+
+        # Group the last attenuator's configurations by blades moved, each
+        # group sorted by transmission
+        last_table = tables[last]
+        last_moved = count_moved_blades(current[last], num_blades[last])
+        order = np.lexsort((last_table, last_moved))
+        sorted_trans = last_table[order]
+        bounds = np.searchsorted(last_moved[order],
+                                 np.arange(num_blades[last] + 2))
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            ratio = target / prefix_trans
+            # Best achievable error, to widen the tolerance if needed
+            full_sorted = np.sort(last_table)
+            nearest = _nearest_in_window(full_sorted, ratio, 0,
+                                         len(full_sorted))
+            errors = np.abs(prefix_trans * full_sorted[nearest] - target)
+            best_error = np.nanmin(errors)
+            tol = max(best_error, self.tolerance * target)
+            # Leave room for rounding in the products
+            tol += 1e-12
+            low = (target - tol) / prefix_trans
+            high = (target + tol) / prefix_trans
+
+        no_match = np.iinfo(int).max
+        last_count = np.full(len(prefix_trans), no_match)
+        last_pick = np.zeros(len(prefix_trans), dtype=int)
+        for count in range(num_blades[last] + 1):
+            start, end = bounds[count], bounds[count + 1]
+            if start == end:
+                continue
+            group = sorted_trans[start:end]
+            lo_idx = np.searchsorted(group, low, side='left')
+            hi_idx = np.searchsorted(group, high, side='right')
+            found = (hi_idx > lo_idx) & (last_count == no_match)
+            if not found.any():
+                continue
+            pick = _nearest_in_window(group, ratio[found], lo_idx[found],
+                                      hi_idx[found])
+            last_count[found] = count
+            last_pick[found] = order[start + pick]
+
+        valid = last_count != no_match
+        total_moved = np.where(valid, prefix_moved + last_count, no_match)
+        achieved = prefix_trans * last_table[last_pick]
+        error = np.abs(achieved - target)
+        best = np.lexsort((error, total_moved))[0]
+
+        indices = [0] * len(tables)
+        if others:
+            prefix_index = np.unravel_index(best, [len(tables[k])
+                                                   for k in others])
+            for k, index in zip(others, prefix_index):
+                indices[k] = int(index)
+        indices[last] = int(last_pick[best])
+        return indices, float(achieved[best])
+
+    def move(self, position, wait=False, timeout=None, moved_cb=None):
+        """
+        Move all of the attenuators to reach a combined transmission.
+
+        All required blade moves are started at once.
+
+        Parameters
+        ----------
+        position : float
+            The desired combined transmission between 0 and 1.
+
+        wait : bool, optional
+            If `True`, do not return until the motion has completed.
+
+        timeout : float, optional
+            Move timeout in seconds for each blade.
+
+        moved_cb : callable, optional
+            Function to call at the end of motion. i.e. ``moved_cb(obj=self)``
+            will be called when move is complete.
+
+        Returns
+        -------
+        status : MultiStateStatus
+            A single status that represents the progress of every blade move.
+        """
+
+        self.check_value(position)
+        configs, _ = self.find_configuration(position)
+        status = self._move_configuration(configs, timeout=timeout)
+        if moved_cb is not None:
+            status.add_callback(functools.partial(moved_cb, obj=self))
+        if wait:
+            status_wait(status)
+        return status
+
+    def set(self, position, moved_cb=None, timeout=None):
+        return self.move(position, moved_cb=moved_cb, timeout=timeout)
+
+    def _move_configuration(self, configs, timeout=None):
+        """Move every filter that differs from the requested configuration."""
+        moves = {}
+        for att, config in zip(self.attenuators, configs):
+            for filt, insert in zip(att.filters, config):
+                if insert and not filt.inserted:
+                    moves[filt] = filt.in_states[0]
+                elif not insert and filt.inserted:
+                    moves[filt] = filt.out_states[0]
+        return move_states(moves, timeout=timeout)
+
+    def stop(self, *, success=False):
+        for att in self.attenuators:
+            for filt in att.filters:
+                filt.stop(success=success)
+        super().stop(success=success)
+
+
+def _nearest_in_window(sorted_values, targets, lo_idx, hi_idx):
+    """
+    Index of the value closest to each target within a window of indices.
+
+    The window for each target is ``sorted_values[lo_idx:hi_idx]``, which
+    must not be empty.
+    """
+
+    last = np.maximum(hi_idx - 1, lo_idx)
+    above = np.clip(np.searchsorted(sorted_values, targets), lo_idx, last)
+    below = np.clip(above - 1, lo_idx, last)
+    use_below = (np.abs(sorted_values[below] - targets)
+                 <= np.abs(sorted_values[above] - targets))
+    return np.where(use_below, below, above)
 
 
 class FEESolidAttenuator(Device, BaseInterface, LightpathMixin):
@@ -366,6 +1089,11 @@ class FEESolidAttenuator(Device, BaseInterface, LightpathMixin):
     This is a quick-and-dirty Ophyd device for controlling AT2L0 motion and
     generating a PyDM control screen.
 
+    The transmission is calculated locally from the blade positions once the
+    blade materials, thicknesses, and the photon :attr:`energy` are known.
+    Until then, the transmission is 0 if any blade is inserted and 1
+    otherwise.
+
     Parameters
     ----------
     prefix : str
@@ -373,6 +1101,15 @@ class FEESolidAttenuator(Device, BaseInterface, LightpathMixin):
 
     name : str
         Alias for the Solid Attenuator.
+
+    materials : list of str, optional
+        Chemical formula of each blade in blade order, e.g. 'Si'. Use `None`
+        for a blade that blocks the beam when inserted, such as the inspection
+        mirror.
+
+    thicknesses : list of float, optional
+        Thickness of each blade in microns, in blade order. Ignored for blades
+        whose material is `None`.
     """
 
     # QIcon for UX
@@ -381,10 +1118,16 @@ class FEESolidAttenuator(Device, BaseInterface, LightpathMixin):
     # Register that all blades are needed for lightpath calc
     lightpath_cpts = ['blade_{:02}'.format(i+1) for i in range(19)]
 
+    # Tab complete whitelist
+    tab_whitelist = ['find_configuration']
+
     # Summary for lightpath view
     num_in = Cpt(InternalSignal, kind='hinted')
     num_out = Cpt(InternalSignal, kind='hinted')
 
+    # Photon energy in eV for the transmission calculation
+    energy = Cpt(Signal, value=None, kind='config')
+
     blade_01 = Cpt(BeckhoffAxis, ':MMS:01', kind='hinted')
     blade_02 = Cpt(BeckhoffAxis, ':MMS:02', kind='hinted')
     blade_03 = Cpt(BeckhoffAxis, ':MMS:03', kind='hinted')
@@ -405,20 +1148,171 @@ class FEESolidAttenuator(Device, BaseInterface, LightpathMixin):
     blade_18 = Cpt(BeckhoffAxis, ':MMS:18', kind='hinted')
     blade_19 = Cpt(BeckhoffAxis, ':MMS:19', kind='hinted')
 
-    def __init__(self, prefix, *, name, **kwargs):
+    # In is at zero, 2mm deadband is standard
+    _inserted_limit = 2
+
+    def __init__(self, prefix, *, name, materials=None, thicknesses=None,
+                 **kwargs):
         self._blade_positions = {}
+        self._blade_inserted = [False] * len(self.lightpath_cpts)
+        self._filter_index = 0
+        self._blocking_in = 0
+        self._calculator = None
+        self._filter_bits = {}
+        self._blocking_blades = set()
         super().__init__(prefix, name=name, **kwargs)
+        self.blades = [getattr(self, cpt) for cpt in self.lightpath_cpts]
+        self._blade_index = {blade: i for i, blade in enumerate(self.blades)}
+        if materials is not None:
+            self.set_blade_config(materials, thicknesses)
+        self.energy.subscribe(self._energy_changed, run=False)
+
+    def set_blade_config(self, materials, thicknesses):
+        """
+        Define the material and thickness of each blade.
+
+        Parameters
+        ----------
+        materials : list of str
+            Chemical formula of each blade in blade order. Use `None` for a
+            blade that blocks the beam when inserted.
+
+        thicknesses : list of float
+            Thickness of each blade in microns, in blade order.
+        """
+
+        if not len(materials) == len(thicknesses) == len(self.blades):
+            raise ValueError(f'Must provide a material and thickness for '
+                             f'each of the {len(self.blades)} blades.')
+        filter_blades = [i for i, mat in enumerate(materials)
+                         if mat is not None]
+        self._filter_bits = {blade: 1 << bit
+                             for bit, blade in enumerate(filter_blades)}
+        self._blocking_blades = {i for i, mat in enumerate(materials)
+                                 if mat is None}
+        # Each energy's table holds 2**num_filters values, keep only a few
+        self._calculator = TransmissionCalculator(
+            [thicknesses[i] for i in filter_blades],
+            [materials[i] for i in filter_blades],
+            max_cached_energies=4,
+            )
+        # Rebuild the cached state from the last known positions
+        self._filter_index = 0
+        self._blocking_in = 0
+        inserted = self._blade_inserted
+        self._blade_inserted = [False] * len(self.blades)
+        for blade, is_in in enumerate(inserted):
+            self._update_blade(blade, is_in)
+        self._update_transmission()
+
+    def _update_blade(self, blade, inserted):
+        """
+        Update the cached state of a single blade.
+
+        This only flips the blade's bit in the configuration index rather than
+        recomputing the configuration from scratch.
+        """
+
+        if self._blade_inserted[blade] == inserted:
+            return
+        self._blade_inserted[blade] = inserted
+        if blade in self._blocking_blades:
+            self._blocking_in += 1 if inserted else -1
+        elif self._calculator is not None:
+            self._filter_index ^= self._filter_bits[blade]
+
+    def calc_transmission(self, energy=None):
+        """
+        Calculate the transmission of the current blade configuration.
+
+        Parameters
+        ----------
+        energy : float, optional
+            Photon energy in eV. Defaults to the value of :attr:`energy`.
+
+        Returns
+        -------
+        transmission : float
+            The transmission, or `None` if it cannot be calculated because
+            the blade configuration or the energy is unknown.
+        """
+
+        if energy is None:
+            energy = self.energy.get()
+        if self._calculator is None or energy is None:
+            return None
+        if self._blocking_in:
+            return 0
+        table = self._calculator.all_transmissions(energy)
+        return table[self._filter_index]
+
+    def find_configuration(self, transmission, energy=None, mode='nearest'):
+        """
+        Find the filter blades to insert for one or more transmissions.
+
+        Blades that block the beam are never selected.
+
+        Parameters
+        ----------
+        transmission : float or list of float
+            One or more desired transmissions between 0 and 1.
+
+        energy : float, optional
+            Photon energy in eV. Defaults to the value of :attr:`energy`.
+
+        mode : {'nearest', 'ceil', 'floor'}, optional
+            How to pick between the achievable transmissions around each
+            target. See :meth:`TransmissionCalculator.find_configuration`.
+
+        Returns
+        -------
+        config : ~numpy.ndarray
+            Boolean array of inserted blades, ordered like :attr:`blades`.
+
+        transmission : float or ~numpy.ndarray
+            The achieved transmission for each configuration.
+        """
+
+        if self._calculator is None:
+            raise RuntimeError('Blade materials and thicknesses are unknown, '
+                               'call set_blade_config first.')
+        if energy is None:
+            energy = self.energy.get()
+        if energy is None:
+            raise RuntimeError('No energy provided for the calculation.')
+        filters, trans = self._calculator.find_configuration(
+            transmission, energy, mode=mode)
+        config = np.zeros(filters.shape[:-1] + (len(self.blades),),
+                          dtype=bool)
+        config[..., list(self._filter_bits)] = filters
+        return config, trans
+
+    def _update_transmission(self):
+        trans = self.calc_transmission()
+        if trans is None:
+            # Without a calculation, any inserted blade blocks the beam
+            trans = 0 if any(self._blade_inserted) else 1
+        self._transmission = trans
+
+    def _energy_changed(self, *args, **kwargs):
+        self._update_transmission()
+        if self._lightpath_ready and self._lightpath_state_changed():
+            self._run_subs(sub_type=self.SUB_STATE)
 
     def _set_lightpath_states(self, lightpath_values):
-        values = [kw['value'] for kw in lightpath_values.values()]
-        # In is at zero, 2mm deadband is standard
-        inserted_list = [value < 2 for value in values]
-        self._inserted = any(inserted_list)
+        self._update_lightpath_states(lightpath_values, lightpath_values)
+
+    def _update_lightpath_states(self, lightpath_values, changed):
+        for obj in changed:
+            self._update_blade(self._blade_index[obj],
+                               lightpath_values[obj]['value']
+                               < self._inserted_limit)
+        num_in = self._blade_inserted.count(True)
+        self._inserted = num_in > 0
         self._removed = not self._inserted
-        self.num_in.put(inserted_list.count(True), force=True)
-        self.num_out.put(inserted_list.count(False), force=True)
-        # No calc yet
-        self._transmission = 1
+        self.num_in.put(num_in, force=True)
+        self.num_out.put(len(self.blades) - num_in, force=True)
+        self._update_transmission()
 
 
 class GasAttenuator(Device, BaseInterface):
@@ -3,25 +3,81 @@ from ophyd.device import Device
 from ophyd.signal import AttributeSignal, EpicsSignalRO
 
 from .interface import BaseInterface
-from .signal import AvgSignal
+from .signal import TimeSeriesBuffer, WindowSignal, subscribe_when_connected
 
 
-class BeamStats(Device, BaseInterface):
+class PulseEnergyStats(Device):
+    """
+    Rolling statistics of the pulse energy signal ``mj``.
+
+    Every pulse energy update goes into one preallocated `TimeSeriesBuffer`,
+    ``mj_buffer``, which serves all of the averaging windows. More windows by
+    time or by shot count can be added with :meth:`add_mj_window` without
+    using any more buffer memory.
+
+    The buffer holds the last ``_mj_buffer_size`` shots, so ``mj_buffersize``
+    can not be set any higher than that. The time windows drop their stale
+    samples when they are read, so they go to ``nan`` when the beam stops.
+
+    Subclasses must define the ``mj`` component.
+    """
+
+    # Enough for a minute of beam at 120 Hz
+    _mj_buffer_size = 8192
+
+    mj_avg = Cpt(WindowSignal, 'mj_buffer', shots=120, kind='normal',
+                 doc='Mean pulse energy over the last mj_buffersize shots.')
+    mj_buffersize = Cpt(AttributeSignal, 'mj_avg.averages', kind='config',
+                        doc='Shots in mj_avg, at most 8192.')
+    mj_avg_1s = Cpt(WindowSignal, 'mj_buffer', seconds=1, kind='normal',
+                    doc='Mean pulse energy over the last second, '
+                        'nan without beam.')
+    mj_avg_10s = Cpt(WindowSignal, 'mj_buffer', seconds=10, kind='normal',
+                     doc='Mean pulse energy over the last 10 seconds, '
+                         'nan without beam.')
+    mj_avg_60s = Cpt(WindowSignal, 'mj_buffer', seconds=60, kind='normal',
+                     doc='Mean pulse energy over the last 60 seconds, '
+                         'nan without beam.')
+
+    def __init__(self, prefix='', *, name, **kwargs):
+        self.mj_buffer = TimeSeriesBuffer(self._mj_buffer_size)
+        super().__init__(prefix=prefix, name=name, **kwargs)
+        subscribe_when_connected(self.mj, self._mj_changed)
+
+    def _mj_changed(self, *args, value, timestamp=None, **kwargs):
+        if value is not None:
+            self.mj_buffer.append(value, timestamp=timestamp)
+
+    def add_mj_window(self, shots=None, seconds=None, callback=None):
+        """
+        Track the pulse energy statistics over another window.
+
+        See :meth:`TimeSeriesBuffer.add_window` for the arguments.
+
+        Returns
+        -------
+        window : BufferWindow
+            Holds the statistics in ``window.stats`` and the samples in
+            ``window.values`` and ``window.timestamps``.
+        """
+
+        return self.mj_buffer.add_window(shots=shots, seconds=seconds,
+                                         callback=callback)
+
+
+class BeamStats(PulseEnergyStats, BaseInterface):
     mj = Cpt(EpicsSignalRO, 'GDET:FEE1:241:ENRC', kind='hinted')
     ev = Cpt(EpicsSignalRO, 'BLD:SYS0:500:PHOTONENERGY', kind='normal')
     rate = Cpt(EpicsSignalRO, 'EVNT:SYS0:1:LCLSBEAMRATE', kind='normal')
     owner = Cpt(EpicsSignalRO, 'ECS:SYS0:0:BEAM_OWNER_ID', kind='omitted')
 
-    mj_avg = Cpt(AvgSignal, 'mj', averages=120, kind='normal')
-    mj_buffersize = Cpt(AttributeSignal, 'mj_avg.averages', kind='config')
-
     tab_component_names = True
 
     def __init__(self, prefix='', name='beam_stats', **kwargs):
         super().__init__(prefix=prefix, name=name, **kwargs)
 
 
-class SxrGmd(Device):
+class SxrGmd(PulseEnergyStats):
     mj = Cpt(EpicsSignalRO, 'SXR:GMD:BLD:milliJoulesPerPulse', kind='hinted')
 
     def __init__(self, prefix='', name='sxr_gmd', **kwargs):
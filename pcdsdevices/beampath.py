@@ -0,0 +1,348 @@
+"""
+Module for tracking the beam path through all of the beamlines.
+
+Devices are placed from their happi metadata: the ``beamline`` they are on
+and their ``z`` position along it. Devices with ``branches``, such as the
+`~pcdsdevices.mirror.PointingMirror` and the `~pcdsdevices.lodcm.LODCM`,
+join the beamlines together and pick which of them get beam through their
+``destination``.
+
+Each device's ``SUB_STATE`` callback only updates the paths that pass through
+it, so asking what blocks the beam to a beamline never touches EPICS.
+"""
+import bisect
+import functools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ProductTree:
+    """
+    Segment tree of transmissions.
+
+    Updates and products of the first n transmissions are both O(log n).
+
+    Parameters
+    ----------
+    size : int
+        The number of transmissions to hold. These all start at 1.
+    """
+
+    def __init__(self, size):
+        self._size = 1
+        while self._size < size:
+            self._size *= 2
+        self._tree = [1.0] * (2 * self._size)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        return self._tree[index + self._size]
+
+    def __setitem__(self, index, value):
+        tree = self._tree
+        pos = index + self._size
+        tree[pos] = value
+        pos //= 2
+        while pos:
+            tree[pos] = tree[2 * pos] * tree[2 * pos + 1]
+            pos //= 2
+
+    def prefix(self, stop):
+        """Product of the transmissions before index ``stop``."""
+        tree = self._tree
+        result = 1.0
+        lo = self._size
+        hi = stop + self._size
+        while lo < hi:
+            if lo & 1:
+                result *= tree[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result *= tree[hi]
+            lo //= 2
+            hi //= 2
+        return result
+
+    @property
+    def total(self):
+        """Product of all the transmissions."""
+        return self._tree[1]
+
+
+class BeamRoute:
+    """
+    The ordered devices between the source and the end of one beamline.
+
+    Parameters
+    ----------
+    beamline : str
+        The destination beamline.
+
+    steps : list of tuple
+        Pairs of ``(device, line)`` in beam order. ``line`` is the beamline a
+        branching device has to send beam to for it to continue along this
+        route, or `None` for devices that do not branch.
+    """
+
+    def __init__(self, beamline, steps):
+        self.beamline = beamline
+        self.devices = [device for device, _ in steps]
+        self.lines = [line for _, line in steps]
+        self.index = {device: i for i, device in enumerate(self.devices)}
+        # Sorted indices of the devices blocking this route
+        self.blocking = []
+        self.transmissions = ProductTree(len(steps))
+
+    def __len__(self):
+        return len(self.devices)
+
+    def update(self, index, blocking, transmission):
+        """Set the state of the device at ``index``."""
+        pos = bisect.bisect_left(self.blocking, index)
+        listed = pos < len(self.blocking) and self.blocking[pos] == index
+        if blocking and not listed:
+            self.blocking.insert(pos, index)
+        elif listed and not blocking:
+            del self.blocking[pos]
+        self.transmissions[index] = transmission
+
+    def num_blocking(self, stop):
+        """Number of blocking devices before index ``stop``."""
+        return bisect.bisect_left(self.blocking, stop)
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}({self.beamline!r}, '
+                f'devices={len(self)}, blocking={len(self.blocking)})')
+
+
+class BeamPath:
+    """
+    Beam path graph of every lightpath device.
+
+    The state of each beamline is updated incrementally from each device's
+    ``SUB_STATE``. Queries are answered from the cached state: finding the
+    first blocking device is O(1) and the transmission to any point is
+    O(log n).
+
+    Parameters
+    ----------
+    devices : iterable
+        Devices with happi metadata attached as ``md``, e.g. from
+        `happi.loader.from_container`. Devices without metadata or with
+        ``lightpath=False`` are skipped.
+
+    minimum_transmission : float, optional
+        Inserted devices that transmit less than this block the beam.
+    """
+
+    def __init__(self, devices, minimum_transmission=0.1):
+        self.minimum_transmission = minimum_transmission
+        self._lock = threading.RLock()
+        self.devices = {}
+        self.routes = {}
+        self._beamlines = {}
+        self._device_routes = {}
+        self._cids = {}
+        self._build(devices)
+        for device in self._device_routes:
+            self._update_device(device)
+            if hasattr(device, 'SUB_STATE'):
+                self._cids[device] = device.subscribe(
+                    functools.partial(self._state_changed, device),
+                    event_type=device.SUB_STATE, run=False)
+            else:
+                logger.debug('%s has no state subscription, call refresh to '
+                             'update it.', device.name)
+
+    @classmethod
+    def from_client(cls, client, minimum_transmission=0.1, **kwargs):
+        """
+        Load the beam path from every lightpath device in happi.
+
+        Parameters
+        ----------
+        client : happi.Client
+            The happi database to search.
+
+        minimum_transmission : float, optional
+            Inserted devices that transmit less than this block the beam.
+
+        kwargs
+            Additional happi search terms, e.g. ``beamline``.
+        """
+
+        devices = []
+        for result in client.search(lightpath=True, **kwargs):
+            try:
+                devices.append(result.get())
+            except Exception:
+                logger.exception('Unable to load %s', result['name'])
+        return cls(devices, minimum_transmission=minimum_transmission)
+
+    def _build(self, devices):
+        lines = {}
+        for device in devices:
+            md = getattr(device, 'md', None)
+            if md is None:
+                logger.warning('%s has no happi metadata, skipping.',
+                               device.name)
+                continue
+            if not getattr(md, 'lightpath', True):
+                continue
+            self.devices[device.name] = device
+            self._beamlines[device] = md.beamline
+            lines.setdefault(md.beamline, []).append((md.z, device))
+        for line_devices in lines.values():
+            line_devices.sort(key=lambda pair: pair[0])
+
+        # The most upstream device that sends beam into each beamline
+        junctions = {}
+        for line, line_devices in lines.items():
+            for z, device in line_devices:
+                for branch in getattr(device, 'branches', ()):
+                    if branch == line:
+                        continue
+                    if branch not in junctions or z < junctions[branch][0]:
+                        junctions[branch] = (z, line, device)
+
+        steps = {}
+
+        def route_steps(line, seen):
+            if line in steps:
+                return steps[line]
+            upstream = []
+            if line in junctions and junctions[line][1] not in seen:
+                _, parent, junction = junctions[line]
+                parent_steps = route_steps(parent, seen | {line})
+                for device, required in parent_steps:
+                    if device is junction:
+                        upstream.append((device, line))
+                        break
+                    upstream.append((device, required))
+            own = [(device, line if self._is_branching(device) else None)
+                   for _, device in lines.get(line, ())]
+            steps[line] = upstream + own
+            return steps[line]
+
+        for line in set(lines) | set(junctions):
+            route = BeamRoute(line, route_steps(line, {line}))
+            self.routes[line] = route
+            for i, device in enumerate(route.devices):
+                self._device_routes.setdefault(device, []).append((route, i))
+
+    @staticmethod
+    def _is_branching(device):
+        return hasattr(device, 'branches') and hasattr(device, 'destination')
+
+    def _check(self, device, line):
+        """Return whether the device blocks the beam and its transmission."""
+        try:
+            if line is not None:
+                blocking = line not in device.destination
+                return blocking, 0.0 if blocking else 1.0
+            if not device.inserted:
+                return False, 1.0
+            transmission = device.transmission
+            return transmission < self.minimum_transmission, transmission
+        except Exception:
+            logger.debug('Unable to check %s', device.name, exc_info=True)
+            return False, 1.0
+
+    def _update_device(self, device):
+        with self._lock:
+            checked = {}
+            for route, index in self._device_routes[device]:
+                line = route.lines[index]
+                if line not in checked:
+                    checked[line] = self._check(device, line)
+                route.update(index, *checked[line])
+
+    def _state_changed(self, device, *args, **kwargs):
+        try:
+            self._update_device(device)
+        except Exception:
+            # Without this, callbacks fail silently
+            logger.exception('Error updating the beam path for %s',
+                             device.name)
+
+    def refresh(self, device=None):
+        """
+        Check the state of one device again, or of every device.
+
+        This is only needed for devices that do not have ``SUB_STATE``.
+        """
+
+        if device is None:
+            devices = list(self._device_routes)
+        else:
+            devices = [self.devices.get(device, device)]
+        for dev in devices:
+            self._update_device(dev)
+
+    def unsubscribe_all(self):
+        """Stop following the devices' states."""
+        for device, cid in self._cids.items():
+            device.unsubscribe(cid)
+        self._cids.clear()
+
+    @property
+    def destinations(self):
+        """All of the beamlines, in alphabetical order."""
+        return sorted(self.routes)
+
+    def _locate(self, target):
+        """Return the route to target and the index where it stops."""
+        if isinstance(target, str) and target in self.routes:
+            route = self.routes[target]
+            return route, len(route)
+        device = self.devices.get(target, target)
+        try:
+            route = self.routes[self._beamlines[device]]
+        except (KeyError, TypeError):
+            raise KeyError(f'{target} is not a beamline or a device in the '
+                           'beam path') from None
+        return route, route.index[device]
+
+    def path(self, target):
+        """
+        The devices the beam passes through to reach target.
+
+        Parameters
+        ----------
+        target : str or Device
+            A beamline, or a device or device name. Devices include everything
+            upstream of them but not themselves.
+        """
+
+        route, stop = self._locate(target)
+        return route.devices[:stop]
+
+    def blocking_devices(self, target):
+        """The devices that block the beam to target, upstream first."""
+        with self._lock:
+            route, stop = self._locate(target)
+            return [route.devices[i]
+                    for i in route.blocking[:route.num_blocking(stop)]]
+
+    def first_blocking(self, target):
+        """The most upstream device that blocks the beam to target, or None."""
+        with self._lock:
+            route, stop = self._locate(target)
+            if route.blocking and route.blocking[0] < stop:
+                return route.devices[route.blocking[0]]
+            return None
+
+    def transmission(self, target):
+        """The fraction of the beam that reaches target."""
+        with self._lock:
+            route, stop = self._locate(target)
+            return route.transmissions.prefix(stop)
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(devices={len(self.devices)}, '
+                f'destinations={self.destinations})')
@@ -62,6 +62,8 @@ class InOutPositioner(StatePositioner):
         if self.__class__ is InOutPositioner:
             raise TypeError(('InOutPositioner must be subclassed with at '
                              'least a state signal'))
+        self._state_sets = {}
+        self._state_sets_lookup = None
         super().__init__(prefix, name=name, **kwargs)
 
     @required_for_connection
@@ -129,7 +131,7 @@ class InOutPositioner(StatePositioner):
     def check_transmission(self, state=None):
         """Query the transition at a particular state."""
         if state is None:
-            state = self.position
+            state = self.state.get()
         state_index = self.get_state(state).value
         return self._trans_enum.get(state_index, math.nan)
 
@@ -143,13 +145,19 @@ class InOutPositioner(StatePositioner):
 
     def _pos_in_list(self, state_list, check_state=None):
         if check_state is None:
-            current_state = self.get_state(self.position)
-        else:
-            current_state = self.get_state(check_state)
-        for state in state_list:
-            if current_state == self.get_state(state):
-                return True
-        return False
+            check_state = self.state.get()
+        current_state = self.get_state(check_state)
+        # Cache the enum members of each list until the enum changes
+        if self._state_sets_lookup is not self._state_lookup:
+            self._state_sets = {}
+            self._state_sets_lookup = self._state_lookup
+        key = tuple(state_list)
+        try:
+            members = self._state_sets[key]
+        except KeyError:
+            members = frozenset(self.get_state(state) for state in state_list)
+            self._state_sets[key] = members
+        return current_state in members
 
 
 class InOutRecordPositioner(StateRecordPositioner, InOutPositioner):
@@ -5,30 +5,28 @@ import functools
 import logging
 import numbers
 import re
-import signal
 import time
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from threading import Event, Thread
+from threading import Event, RLock, Thread
 from types import MethodType, SimpleNamespace
-from weakref import WeakSet
+from weakref import WeakKeyDictionary, WeakSet
 
-import yaml
+import numpy as np
 from bluesky.utils import ProgressBar
 from ophyd.device import Kind
 from ophyd.ophydobj import OphydObject
 from ophyd.status import wait as status_wait
 
 from . import utils as util
-
-try:
-    import fcntl
-except ImportError:
-    fcntl = None
+from .preset_store import get_store, is_store
 
 logger = logging.getLogger(__name__)
 engineering_mode = True
 
+# Threads used to sync the presets of every device in setup_preset_paths
+PRESET_SYNC_WORKERS = 16
+
 OphydObject_whitelist = ["name", "connected", "check_value", "log"]
 BlueskyInterface_whitelist = ["trigger", "read", "describe", "stage",
                               "unstage"]
@@ -38,6 +36,10 @@ Signal_whitelist = ["value", "put"]
 Positioner_whitelist = ["settle_time", "timeout", "egu", "limits", "move",
                         "position", "moving"]
 
+# Tab-completion names by class, then by engineering mode. Classes made on
+# the fly, like fake devices, can still be garbage collected.
+_tab_class_index = WeakKeyDictionary()
+
 
 class BaseInterface(OphydObject):
     """
@@ -62,19 +64,70 @@ class BaseInterface(OphydObject):
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
-        string_whitelist = []
-        for parent in cls.mro():
-            if hasattr(parent, "tab_whitelist"):
-                string_whitelist.extend(parent.tab_whitelist)
-            if getattr(parent, "tab_component_names", False):
-                for cpt_name in parent.component_names:
-                    if getattr(parent, cpt_name).kind != Kind.omitted:
-                        string_whitelist.append(cpt_name)
-        cls._tab_regex = re.compile("|".join(string_whitelist))
+        cls._init_tab_patterns()
+
+    @classmethod
+    def _init_tab_patterns(cls):
+        """
+        Collect the whitelist regexes from this class and its parents.
+
+        Parent classes have already done this for their own parents, so we
+        only need to add our own entries to theirs. The regex is compiled the
+        first time it is needed rather than at import.
+        """
+
+        patterns = {}
+        for base in cls.__bases__:
+            base_patterns = base.__dict__.get('_tab_patterns')
+            if base_patterns is not None:
+                patterns.update(dict.fromkeys(base_patterns))
+                continue
+            for parent in base.mro():
+                if hasattr(parent, "tab_whitelist"):
+                    patterns.update(dict.fromkeys(parent.tab_whitelist))
+        patterns.update(dict.fromkeys(cls.tab_whitelist))
+        if getattr(cls, "tab_component_names", False):
+            for cpt_name in cls.component_names:
+                if getattr(cls, cpt_name).kind != Kind.omitted:
+                    patterns[cpt_name] = None
+        cls._tab_patterns = tuple(patterns)
+        cls._tab_regex = None
+        # The names for this class and its subclasses may have changed
+        _tab_class_index.clear()
+
+    @classmethod
+    def _get_tab_regex(cls):
+        regex = cls.__dict__.get('_tab_regex')
+        if regex is None:
+            regex = re.compile("|".join(cls._tab_patterns))
+            cls._tab_regex = regex
+        return regex
+
+    @classmethod
+    def _get_tab_class_index(cls, engineering):
+        """
+        The tab-completion names that come from the class itself.
+
+        These are the same for every instance, so they are computed once per
+        class and engineering mode.
+        """
+
+        indices = _tab_class_index.setdefault(cls, {})
+        try:
+            return indices[engineering]
+        except KeyError:
+            pass
+        names = dir(cls)
+        if not engineering:
+            regex = cls._get_tab_regex()
+            names = [elem for elem in names if regex.fullmatch(elem)]
+        index = frozenset(names)
+        indices[engineering] = index
+        return index
 
     def __dir__(self):
         if get_engineering_mode():
-            return super().__dir__()
+            return list(self._get_tab_class_index(True).union(self.__dict__))
         elif self._filtered_dir_cache is None:
             self._init_filtered_dir_cache()
         return self._filtered_dir_cache
@@ -82,10 +135,15 @@ class BaseInterface(OphydObject):
     def _init_filtered_dir_cache(self):
         self._filtered_dir_cache = self._get_filtered_tab_dir()
 
+    def _reset_tab_dir(self):
+        """Find the tab-completion names again, e.g. for new presets."""
+        self._filtered_dir_cache = None
+
     def _get_filtered_tab_dir(self):
-        return [elem
-                for elem in super().__dir__()
-                if self._tab_regex.fullmatch(elem)]
+        regex = self._get_tab_regex()
+        names = set(self._get_tab_class_index(False))
+        names.update(elem for elem in self.__dict__ if regex.fullmatch(elem))
+        return list(names)
 
     def __repr__(self):
         """Simplify the ophydobject repr to avoid crazy long represenations."""
@@ -94,6 +152,9 @@ class BaseInterface(OphydObject):
         return f"{self.__class__.__name__}({prefix}, name={name})"
 
 
+BaseInterface._init_tab_patterns()
+
+
 def set_engineering_mode(expert):
     """
     Switches between expert and user modes for :class:`BaseInterface` features.
@@ -337,6 +398,86 @@ class FltMvInterface(MvInterface):
         return tweak_base(self)
 
 
+def mv_many(moves, timeout=None, wait=False):
+    """
+    Absolute move of several positioners at once.
+
+    Every target is checked before anything moves, then all of the moves are
+    started together, so the total time is that of the slowest axis.
+
+    Parameters
+    ----------
+    moves : dict
+        Mapping of positioner to its desired end position.
+
+    timeout : float, optional
+        If provided, each mover will throw an error if motion takes longer
+        than timeout to complete. If omitted, each mover's default timeout
+        will be used.
+
+    wait : bool, optional
+        If `True`, wait for every motion to complete before returning.
+        Defaults to :keyword:`False`.
+
+    Returns
+    -------
+    statuses : list of Status
+        The status of each move, in the same order as ``moves``.
+    """
+
+    moves = dict(moves)
+    for positioner, position in moves.items():
+        positioner.check_value(position)
+    statuses = []
+    try:
+        for positioner, position in moves.items():
+            statuses.append(positioner.move(position, timeout=timeout,
+                                            wait=False))
+    except Exception:
+        _stop_many(moves)
+        raise
+    if wait:
+        for status in statuses:
+            status_wait(status)
+    return statuses
+
+
+def umv_many(moves, timeout=None):
+    """
+    Move several positioners at once, wait, and update with a progress bar.
+
+    This is `mv_many` with one progress bar for all of the moves. A ctrl+c
+    stops every positioner.
+
+    Parameters
+    ----------
+    moves : dict
+        Mapping of positioner to its desired end position.
+
+    timeout : float, optional
+        If provided, each mover will throw an error if motion takes longer
+        than timeout to complete. If omitted, each mover's default timeout
+        will be used.
+    """
+
+    statuses = mv_many(moves, timeout=timeout)
+    AbsProgressBar(statuses)
+    try:
+        for status in statuses:
+            status_wait(status)
+    except KeyboardInterrupt:
+        _stop_many(moves)
+
+
+def _stop_many(positioners):
+    """Stop every positioner, even if stopping one of them fails."""
+    for positioner in positioners:
+        try:
+            positioner.stop()
+        except Exception:
+            logger.exception('Error stopping %s', positioner.name)
+
+
 def setup_preset_paths(**paths):
     """
     Prepare the :class:`Presets` class.
@@ -348,14 +489,123 @@ def setup_preset_paths(**paths):
     **paths : str keyword args
         A mapping from type of preset to destination path. These will be
         directories that contain the yaml files that define the preset
-        positions.
+        positions, or SQLite database files ending in ``.db`` that hold the
+        presets of every device. A database is loaded with a single query
+        for all of the registered devices.
     """
 
+    # Reuse the stores that are already open, and close the rest
+    open_stores = {store.path: store for store in Presets._stores.values()}
     Presets._paths = {}
+    Presets._stores = {}
     for k, v in paths.items():
-        Presets._paths[k] = Path(v)
-    for preset in Presets._registry:
-        preset.sync()
+        store = None
+        if not is_store(v):
+            store = open_stores.get(Path(v))
+        if store is None:
+            store = get_store(v)
+        Presets._paths[k] = store.path
+        Presets._stores[k] = store
+    for store in open_stores.values():
+        if store not in Presets._stores.values():
+            store.close()
+    preloaded = {}
+    for preset_type, store in Presets._stores.items():
+        if store.bulk_read:
+            try:
+                preloaded[preset_type] = store.read_all()
+            except BlockingIOError:
+                logger.error('Unable to load %s presets from %s',
+                             preset_type, store.path)
+                logger.debug('', exc_info=True)
+    presets = list(Presets._registry)
+    if presets:
+        # Each device has its own files and locks, so sync them in parallel
+        workers = min(len(presets), PRESET_SYNC_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda preset: preset._sync(preloaded, force=True),
+                          presets))
+
+
+class PresetWatcher:
+    """
+    Background thread that picks up preset changes from other sessions.
+
+    Every ``interval`` seconds this checks the files of every registered
+    :class:`Presets` and reloads only the ones that changed.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Seconds between checks.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._stop_event = Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """`True` while the watcher thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start checking for changes in a daemon thread."""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='preset_watcher',
+                              daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop checking for changes."""
+        self._stop_event.set()
+        if self.running:
+            self._thread.join()
+        self._thread = None
+
+    def poll(self):
+        """Sync every registered :class:`Presets` once."""
+        for preset in list(Presets._registry):
+            try:
+                preset.sync()
+            except Exception:
+                logger.exception('Error syncing %s', preset.name)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+
+_preset_watcher = None
+
+
+def watch_presets(interval=1.0):
+    """
+    Reload presets edited by other sessions without a manual ``sync``.
+
+    Parameters
+    ----------
+    interval : float or None, optional
+        Seconds between checks for changed preset files. Pass `None` to stop
+        watching.
+
+    Returns
+    -------
+    watcher : PresetWatcher or None
+        The running watcher.
+    """
+
+    global _preset_watcher
+    if _preset_watcher is not None:
+        _preset_watcher.stop()
+        _preset_watcher = None
+    if interval is not None:
+        _preset_watcher = PresetWatcher(interval=interval)
+        _preset_watcher.start()
+    return _preset_watcher
 
 
 class Presets:
@@ -384,50 +634,54 @@ class Presets:
 
     _registry = WeakSet()
     _paths = {}
+    _stores = {}
 
     def __init__(self, device):
         self._device = device
-        self._methods = []
-        self._fd = None
+        self._methods = {}
+        self._cache = {}
+        self._signatures = {}
+        self._dirty = set()
+        self._index = (np.array([]), [])
+        self._sync_lock = RLock()
+        self.positions = SimpleNamespace()
         self._registry.add(self)
         self.name = device.name + '_presets'
         self.sync()
 
     def _path(self, preset_type):
         """Utility function to get the preset file :class:`~pathlib.Path`."""
-        path = self._paths[preset_type] / (self._device.name + '.yml')
+        path = self._stores[preset_type].device_path(self._device.name)
         logger.debug('select presets path %s', path)
         return path
 
     def _read(self, preset_type):
         """Utility function to get a particular preset's datum dictionary."""
         logger.debug('read presets for %s', self._device.name)
-        with self._file_open_rlock(preset_type) as f:
-            f.seek(0)
-            return yaml.full_load(f) or {}
+        return self._stores[preset_type].read(self._device.name)
 
     def _write(self, preset_type, data):
         """
         Utility function to overwrite a particular preset's datum dictionary.
         """
         logger.debug('write presets for %s', self._device.name)
-        with self._file_open_rlock(preset_type) as f:
-            f.seek(0)
-            yaml.dump(data, f, default_flow_style=False)
-            f.truncate()
+        self._stores[preset_type].write(self._device.name, data)
 
-    @contextmanager
-    def _file_open_rlock(self, preset_type, timeout=1.0):
+    def _file_open_rlock(self, preset_type, timeout=None):
         """
-        File locking context manager for this object.
+        Locking context manager for this object's presets of one type.
 
         Works like threading.Rlock in that you can acquire it multiple times
         safely.
 
         Parameters
         ----------
-        fd : file
-            The file descriptor to lock on.
+        preset_type : str
+            The type of preset to lock.
+
+        timeout : float, optional
+            How long to wait for the lock. Defaults to
+            `~pcdsdevices.preset_store.LOCK_TIMEOUT`.
 
         Raises
         ------
@@ -435,46 +689,17 @@ class Presets:
             If we cannot acquire the file lock.
         """
 
-        if self._fd is None:
-            path = self._path(preset_type)
-            with open(path, 'r+') as fd:
-                # Set up file lock timeout with a raising handler
-                # We will need this handler due to PEP 475
-                def interrupt(signum, frame):
-                    raise InterruptedError()
-
-                old_handler = signal.signal(signal.SIGALRM, interrupt)
-                try:
-                    signal.setitimer(signal.ITIMER_REAL, timeout)
-                    fcntl.flock(fd, fcntl.LOCK_EX)
-                except InterruptedError:
-                    # Ignore interrupted and proceed to cleanup
-                    pass
-                finally:
-                    # Clean up file lock timeout
-                    signal.setitimer(signal.ITIMER_REAL, 0)
-                    signal.signal(signal.SIGALRM, old_handler)
-                # Error now if we still can't get the lock.
-                # Getting lock twice is safe.
-                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-                logger.debug('acquired lock for %s', path)
-                self._fd = fd
-                yield fd
-                fcntl.flock(fd, fcntl.LOCK_UN)
-                logger.debug('released lock for %s', path)
-            self._fd = None
-        else:
-            logger.debug('using already open file descriptor')
-            yield self._fd
+        return self._stores[preset_type].lock(self._device.name,
+                                              timeout=timeout)
 
     def _update(self, preset_type, name, value=None, comment=None,
                 active=True):
         """
         Utility function to update a preset position.
 
-        Reads the existing preset's datum, updates the value the comment, and
-        the active state, and then writes the datum back to the file, updating
-        the history accordingly.
+        Reads the existing preset's datum, updates the value and the active
+        state, and then writes the datum back to the file. The value and the
+        comment are appended to the history log afterwards.
         """
 
         logger.debug(('call %s presets._update(%s, %s, value=%s, comment=%s, '
@@ -487,10 +712,6 @@ class Presets:
             raise TypeError(('value must be a real numeric type, not type'
                              '{}'.format(type(value))))
         try:
-            path = self._path(preset_type)
-            if not path.exists():
-                path.touch()
-                path.chmod(0o666)
             with self._file_open_rlock(preset_type):
                 data = self._read(preset_type)
                 if value is None and comment is not None:
@@ -498,15 +719,7 @@ class Presets:
                 if value is not None:
                     if name not in data:
                         data[name] = {}
-                    ts = time.strftime('%d %b %Y %H:%M:%S')
                     data[name]['value'] = value
-                    history = data[name].get('history', {})
-                    if comment:
-                        comment = ' ' + comment
-                    else:
-                        comment = ''
-                    history[ts] = '{:10.4f}{}'.format(value, comment)
-                    data[name]['history'] = history
                 if active:
                     data[name]['active'] = True
                 else:
@@ -514,24 +727,111 @@ class Presets:
                 self._write(preset_type, data)
         except BlockingIOError:
             self._log_flock_error()
+            return
+        finally:
+            # Our own writes can land within the same mtime tick as the last
+            # read, so make sure the next sync reads them
+            with self._sync_lock:
+                self._dirty.add(preset_type)
+        if value is not None:
+            ts = time.strftime('%d %b %Y %H:%M:%S')
+            if comment:
+                comment = ' ' + comment
+            else:
+                comment = ''
+            try:
+                self._stores[preset_type].append_history(
+                    self._device.name, name, ts,
+                    '{:10.4f}{}'.format(value, comment))
+            except BlockingIOError:
+                self._log_flock_error()
+
+    def _read_history(self, preset_type):
+        """Utility function to get the history of a particular preset type."""
+        logger.debug('read preset history for %s', self._device.name)
+        return self._stores[preset_type].read_history(self._device.name)
+
+    def compact_history(self, keep=None):
+        """
+        Rewrite the preset history logs of this device.
+
+        Moves history still saved next to the preset values into the logs.
+
+        Parameters
+        ----------
+        keep : int, optional
+            How many of the most recent entries to keep for each preset. If
+            omitted, all of the history is kept.
+        """
+
+        for preset_type, store in self._stores.items():
+            if not store.exists(self._device.name):
+                continue
+            try:
+                store.compact(self._device.name, keep=keep)
+            except BlockingIOError:
+                self._log_flock_error()
+        self.sync()
 
     def sync(self):
-        """Synchronize the presets with the database."""
+        """
+        Synchronize the presets with the database.
+
+        Only the preset types whose files changed since the last sync are
+        read again.
+        """
+        self._sync()
+
+    def _sync(self, preloaded=None, force=False):
+        """
+        Synchronize the presets, using the presets of every device already
+        loaded from the bulk-read stores in ``preloaded`` where available.
+
+        Preset types are skipped if their file signature is unchanged, unless
+        ``force`` is set or we wrote to them ourselves.
+        """
         logger.debug('call %s presets.sync()', self._device.name)
-        self._remove_methods()
-        self._cache = {}
-        logger.debug('filling %s cache', self.name)
-        for preset_type in self._paths.keys():
-            path = self._path(preset_type)
-            if path.exists():
-                try:
-                    self._cache[preset_type] = self._read(preset_type)
-                except BlockingIOError:
-                    self._log_flock_error()
-            else:
-                logger.debug('No %s preset file for %s',
-                             preset_type, self._device.name)
-        self._create_methods()
+        preloaded = preloaded or {}
+        with self._sync_lock:
+            changed = force
+            for preset_type in list(self._signatures):
+                if preset_type not in self._stores:
+                    self._cache.pop(preset_type, None)
+                    del self._signatures[preset_type]
+                    changed = True
+            for preset_type, store in self._stores.items():
+                signature = store.signature(self._device.name)
+                if not (force or preset_type in preloaded
+                        or preset_type in self._dirty
+                        or preset_type not in self._signatures
+                        or self._signatures[preset_type] != signature):
+                    continue
+                changed = True
+                logger.debug('filling %s %s cache', self.name, preset_type)
+                self._signatures[preset_type] = signature
+                self._dirty.discard(preset_type)
+                if preset_type in preloaded:
+                    data = preloaded[preset_type].get(self._device.name)
+                    if data is not None:
+                        self._cache[preset_type] = data
+                    else:
+                        self._cache.pop(preset_type, None)
+                        logger.debug('No %s presets for %s',
+                                     preset_type, self._device.name)
+                elif signature is not None and store.exists(self._device.name):
+                    try:
+                        self._cache[preset_type] = self._read(preset_type)
+                    except BlockingIOError:
+                        # Try again on the next sync
+                        self._cache.pop(preset_type, None)
+                        self._dirty.add(preset_type)
+                        self._log_flock_error()
+                else:
+                    self._cache.pop(preset_type, None)
+                    logger.debug('No %s preset file for %s',
+                                 preset_type, self._device.name)
+            if changed:
+                self._create_methods()
 
     def _log_flock_error(self):
         logger.error(('Unable to acquire file lock for %s. '
@@ -546,35 +846,125 @@ class Presets:
         methods to the associated device to move and check each preset, and
         add :class:`PresetPosition` instances to :attr:`.positions` for
         each preset name.
+
+        Only the methods and positions that differ from the last call are
+        removed or added.
         """
 
         logger.debug('call %s presets._create_methods()', self._device.name)
-        for preset_type in self._paths.keys():
-            add, add_here = self._make_add(preset_type)
-            self._register_method(self, 'add_' + preset_type, add)
-            self._register_method(self, 'add_here_' + preset_type, add_here)
+        methods = {}
+        positions = {}
+        for preset_type in self._stores.keys():
+            methods[(self, 'add_' + preset_type)] = ('add', preset_type)
+            methods[(self, 'add_here_' + preset_type)] = ('add_here',
+                                                          preset_type)
         for preset_type, data in self._cache.items():
             for name, info in data.items():
                 if info['active']:
-                    mv, umv = self._make_mv_pre(preset_type, name)
-                    wm = self._make_wm_pre(preset_type, name)
-                    self._register_method(self._device, 'mv_' + name, mv)
-                    self._register_method(self._device, 'umv_' + name, umv)
-                    self._register_method(self._device, 'wm_' + name, wm)
-                    setattr(self.positions, name,
-                            PresetPosition(self, preset_type, name))
+                    for kind in ('mv', 'umv', 'wm'):
+                        methods[(self._device, kind + '_' + name)] = (
+                            kind, preset_type, name)
+                    positions[name] = preset_type
+        for key, spec in list(self._methods.items()):
+            if methods.get(key) != spec:
+                self._remove_method(*key)
+        for (obj, method_name), spec in methods.items():
+            if (obj, method_name) not in self._methods:
+                self._register_method(obj, method_name,
+                                      self._make_method(*spec), spec=spec)
+        for name, position in list(vars(self.positions).items()):
+            if positions.get(name) != position._preset_type:
+                delattr(self.positions, name)
+        for name, preset_type in positions.items():
+            if name not in vars(self.positions):
+                setattr(self.positions, name,
+                        PresetPosition(self, preset_type, name))
+        self._build_index(positions)
+
+    def _build_index(self, positions):
+        """
+        Sort the active preset values for `nearest`.
+
+        Parameters
+        ----------
+        positions : dict
+            Maps each active preset name to its preset type.
+        """
+
+        names = list(positions)
+        values = np.array([self._cache[preset_type][name]['value']
+                           for name, preset_type in positions.items()],
+                          dtype=float)
+        order = np.argsort(values, kind='stable')
+        self._index = (values[order], [names[i] for i in order])
+
+    def nearest(self, position=None):
+        """
+        Find the active preset closest to a position.
+
+        This is one binary search over the sorted preset values, with at
+        most one read of the device position.
+
+        Parameters
+        ----------
+        position : float, optional
+            The position to check. If omitted, we'll use the current
+            position.
+
+        Returns
+        -------
+        nearest : tuple or None
+            The preset name and the offset from the position to it, like
+            ``wm_presetname`` would return, or `None` if there are no active
+            presets.
+        """
+
+        values, names = self._index
+        if not len(values):
+            return None
+        if position is None:
+            position = self._device.wm()
+        index = np.searchsorted(values, position)
+        if index == len(values) or (
+                index > 0
+                and position - values[index - 1] <= values[index] - position):
+            index -= 1
+        return names[index], values[index] - position
+
+    def _make_method(self, kind, preset_type, name=None):
+        """Create one of the dynamic methods described in _create_methods."""
+        if kind in ('add', 'add_here'):
+            add, add_here = self._make_add(preset_type)
+            return add if kind == 'add' else add_here
+        if kind in ('mv', 'umv'):
+            mv, umv = self._make_mv_pre(preset_type, name)
+            return mv if kind == 'mv' else umv
+        return self._make_wm_pre(preset_type, name)
 
-    def _register_method(self, obj, method_name, method):
+    def _register_method(self, obj, method_name, method, spec=None):
         """
         Utility function for managing dynamic methods.
 
-        Adds a method to the :attr:`._methods` list and binds the method to an
-        object.
+        Adds a method to the :attr:`._methods` dictionary and binds the method
+        to an object.
         """
 
         logger.debug('register method %s to %s', method_name, obj.name)
-        self._methods.append((obj, method_name))
+        self._methods[(obj, method_name)] = spec
         setattr(obj, method_name, MethodType(method, obj))
+        if isinstance(obj, BaseInterface):
+            obj._reset_tab_dir()
+
+    def _remove_method(self, obj, method_name):
+        """Remove one method added by _register_method."""
+        logger.debug('remove method %s from %s', method_name, obj.name)
+        del self._methods[(obj, method_name)]
+        try:
+            delattr(obj, method_name)
+        except AttributeError:
+            pass
+        if isinstance(obj, BaseInterface):
+            obj._reset_tab_dir()
 
     def _make_add(self, preset_type):
         """
@@ -697,16 +1087,42 @@ class Presets:
         wm_pre.__doc__ = wm_pre.__doc__.format(name)
         return wm_pre
 
-    def _remove_methods(self):
-        """Remove all methods created in the last call to _create_methods."""
-        logger.debug('call %s presets._remove_methods()', self._device.name)
-        for obj, method_name in self._methods:
-            try:
-                delattr(obj, method_name)
-            except AttributeError:
-                pass
-        self._methods = []
-        self.positions = SimpleNamespace()
+
+def nearest_presets(devices, tolerance=None):
+    """
+    Find the active preset closest to each of several devices.
+
+    The positions of all of the devices are read in parallel, then each is
+    looked up in its device's sorted presets.
+
+    Parameters
+    ----------
+    devices : list of FltMvInterface
+        The devices to check.
+
+    tolerance : float, optional
+        If provided, presets farther than this from a device are ignored.
+
+    Returns
+    -------
+    nearest : dict
+        Maps each device name to the preset name and offset found by
+        `Presets.nearest`, or to `None` if no preset is close enough.
+    """
+
+    devices = list(devices)
+    if not devices:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(devices), 32)) as pool:
+        positions = list(pool.map(lambda device: device.wm(), devices))
+    nearest = {}
+    for device, position in zip(devices, positions):
+        found = device.presets.nearest(position)
+        if (found is not None and tolerance is not None
+                and abs(found[1]) > tolerance):
+            found = None
+        nearest[device.name] = found
+    return nearest
 
 
 class PresetPosition:
@@ -782,8 +1198,11 @@ class PresetPosition:
     def history(self):
         """
         This position history associated with this preset, returned as a dict.
+
+        This is read from the history log each time.
         """
-        return self.info['history']
+        history = self._presets._read_history(self._preset_type)
+        return history.get(self._name, {})
 
     @property
     def path(self):
@@ -899,6 +1318,11 @@ class LightpathMixin(OphydObject):
 
     Use this on classes that are not state positioners but would still like to
     be used as a top-level device in lightpath.
+
+    ``SUB_STATE`` only runs when the inserted, removed or transmission values
+    actually change. If ``lightpath_debounce`` is set, component updates that
+    arrive within that many seconds of each other are handled by a single
+    recompute.
     """
     SUB_STATE = 'state'
     _default_sub = SUB_STATE
@@ -906,13 +1330,24 @@ class LightpathMixin(OphydObject):
     # Component names whose values are relevant for inserted/removed
     lightpath_cpts = []
 
+    # Seconds to collect component updates before recomputing, or None to
+    # recompute on every update. Devices whose components often move
+    # together, like the FEE solid attenuator blades, can opt in per
+    # instance.
+    lightpath_debounce = None
+
     # Flag to signify that subclass is another mixin, rather than a device
     _lightpath_mixin = False
 
     def __init__(self, *args, **kwargs):
         self._lightpath_values = {}
+        self._lightpath_changed = set()
+        self._lightpath_lock = RLock()
+        self._lightpath_summary = None
         self._lightpath_ready = False
         self._retry_lightpath = False
+        # Waiting recomputes for this device merge into one
+        self._lightpath_task_key = object()
         super().__init__(*args, **kwargs)
 
     def __init_subclass__(cls, **kwargs):
@@ -934,29 +1369,74 @@ class LightpathMixin(OphydObject):
         # and optionally self._transmission
         raise NotImplementedError('Did not implement LightpathMixin')
 
+    def _update_lightpath_states(self, lightpath_values, changed):
+        # Override instead of _set_lightpath_states to only redo the work
+        # for the components in changed
+        self._set_lightpath_states(lightpath_values)
+
     def _update_lightpath(self, *args, obj, **kwargs):
         try:
-            # Universally cache values
-            self._lightpath_values[obj] = kwargs
-            # Only do the first lightpath state once all cpts have chimed in
-            if len(self._lightpath_values) >= len(self.lightpath_cpts):
+            with self._lightpath_lock:
+                # Universally cache values
+                self._lightpath_values[obj] = kwargs
+                self._lightpath_changed.add(obj)
+                # Only do the first lightpath state once all cpts have chimed
+                # in
+                if len(self._lightpath_values) < len(self.lightpath_cpts):
+                    return
+            if self.lightpath_debounce:
+                # Later updates in the window merge into this one
+                util.schedule_task(self._recompute_lightpath,
+                                   delay=self.lightpath_debounce,
+                                   key=self._lightpath_task_key)
+            else:
+                self._recompute_lightpath()
+        except Exception:
+            # Without this, callbacks fail silently
+            logger.exception('Error in lightpath update callback.')
+
+    def _recompute_lightpath(self):
+        try:
+            with self._lightpath_lock:
+                changed = self._lightpath_changed
+                if not changed:
+                    return
+                self._lightpath_changed = set()
                 self._retry_lightpath = False
                 # Pass user function the full set of values
-                self._set_lightpath_states(self._lightpath_values)
+                self._update_lightpath_states(self._lightpath_values, changed)
                 self._lightpath_ready = not self._retry_lightpath
-                if self._lightpath_ready:
+                if self._retry_lightpath:
+                    self._lightpath_changed |= changed
+                else:
+                    state_changed = self._lightpath_state_changed()
+            if self._lightpath_ready:
+                if state_changed:
                     # Tell lightpath to update
                     self._run_subs(sub_type=self.SUB_STATE)
-                elif self._retry_lightpath and not self._destroyed:
-                    # Use this when the device wasn't ready to set states
-                    kw = dict(obj=obj)
-                    kw.update(kwargs)
-                    util.schedule_task(self._update_lightpath,
-                                       args=args, kwargs=kw, delay=0.2)
+            elif self._retry_lightpath and not self._destroyed:
+                # Use this when the device wasn't ready to set states
+                util.schedule_task(self._recompute_lightpath, delay=0.2,
+                                   key=self._lightpath_task_key)
         except Exception:
             # Without this, callbacks fail silently
             logger.exception('Error in lightpath update callback.')
 
+    def _lightpath_state_changed(self):
+        """
+        `True` if the lightpath state differs from the last time we checked.
+        """
+
+        transmission = self.transmission
+        if transmission != transmission:
+            # nan, e.g. from an invalid state, never compares equal
+            transmission = None
+        summary = (self.inserted, self.removed, transmission)
+        with self._lightpath_lock:
+            changed = summary != self._lightpath_summary
+            self._lightpath_summary = summary
+        return changed
+
     @property
     def inserted(self):
         return self._lightpath_ready and bool(self._inserted)
@@ -982,18 +1462,38 @@ class LightpathInOutMixin(LightpathMixin):
     """
     _lightpath_mixin = True
 
+    def __init__(self, *args, **kwargs):
+        # Inserted, removed and transmission for each subdevice
+        self._lightpath_checks = {}
+        self._num_inserted = 0
+        self._num_not_removed = 0
+        super().__init__(*args, **kwargs)
+
     def _set_lightpath_states(self, lightpath_values):
-        in_check = []
-        out_check = []
-        trans_check = []
-        for obj, kwarg_dct in lightpath_values.items():
+        self._lightpath_checks = {}
+        self._num_inserted = 0
+        self._num_not_removed = 0
+        self._update_lightpath_states(lightpath_values, lightpath_values)
+
+    def _update_lightpath_states(self, lightpath_values, changed):
+        for obj in changed:
             if not obj._state_initialized:
                 # This would prevent make check_inserted, etc. fail
                 self._retry_lightpath = True
                 return
-            in_check.append(obj.check_inserted(kwarg_dct['value']))
-            out_check.append(obj.check_removed(kwarg_dct['value']))
-            trans_check.append(obj.check_transmission(kwarg_dct['value']))
-        self._inserted = any(in_check)
-        self._removed = all(out_check)
-        self._transmission = functools.reduce(lambda a, b: a*b, trans_check)
+        for obj in changed:
+            value = lightpath_values[obj]['value']
+            checks = (obj.check_inserted(value), obj.check_removed(value),
+                      obj.check_transmission(value))
+            old = self._lightpath_checks.get(obj)
+            if old is not None:
+                self._num_inserted -= old[0]
+                self._num_not_removed -= not old[1]
+            self._num_inserted += checks[0]
+            self._num_not_removed += not checks[1]
+            self._lightpath_checks[obj] = checks
+        self._inserted = self._num_inserted > 0
+        self._removed = self._num_not_removed == 0
+        self._transmission = functools.reduce(
+            lambda a, b: a*b,
+            (checks[2] for checks in self._lightpath_checks.values()))
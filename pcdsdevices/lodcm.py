@@ -86,6 +86,8 @@ class LODCM(Device, BaseInterface):
         Name of the mono, double-bounce beamline.
     """
 
+    SUB_STATE = 'state'
+
     h1n = Cpt(H1N, ':H1N', kind='hinted')
     yag = Cpt(YagLom, ":DV", kind='omitted')
     dectris = Cpt(Dectris, ":DH", kind='omitted')
@@ -99,10 +101,24 @@ class LODCM(Device, BaseInterface):
 
     def __init__(self, prefix, *, name, main_line='MAIN', mono_line='MONO',
                  **kwargs):
+        self._has_subscribed_state = False
         super().__init__(prefix, name=name, **kwargs)
         self.main_line = main_line
         self.mono_line = mono_line
 
+    def subscribe(self, cb, event_type=None, run=True):
+        cid = super().subscribe(cb, event_type=event_type, run=run)
+        if event_type == self.SUB_STATE and not self._has_subscribed_state:
+            # The destination depends on h1n and the blocking diagnostics
+            for dev in (self.h1n, self.yag, self.dectris, self.foil):
+                dev.subscribe(self._run_sub_state, event_type=dev.SUB_STATE,
+                              run=False)
+            self._has_subscribed_state = True
+        return cid
+
+    def _run_sub_state(self, *args, **kwargs):
+        self._run_subs(sub_type=self.SUB_STATE, obj=self)
+
     @property
     def inserted(self):
         """Returns `True` if either h1n crystal is in."""
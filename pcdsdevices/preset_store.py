@@ -0,0 +1,662 @@
+"""
+Storage backends for preset positions.
+
+Each preset type, e.g. ``hutch`` or ``user``, is saved in one store. A store
+holds the current presets of every device as a dictionary per device::
+
+    {name: {'value': float, 'active': bool}}
+
+The history of each preset, ``{timestamp: str}``, is kept apart in an
+append-only log, so saving a preset does not get slower as its history grows.
+Older files may still hold a ``'history'`` entry next to the value. This is
+merged into the log's history when read, and moved into the log by `compact`.
+
+`YamlPresetStore` is the original layout, with one YAML file per device in a
+directory. `SqlitePresetStore` keeps every device in one indexed SQLite
+database, so all of the presets can be loaded with a single query.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import yaml
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+# Seconds to wait for any preset file or database lock
+LOCK_TIMEOUT = 1.0
+
+# Timestamps are coarse on some filesystems, so a file modified within this
+# many seconds could change again without getting a new modification time
+MTIME_RESOLUTION = 2.0
+
+
+def file_signature(path):
+    """
+    Identify the version of a file by inode, modification time and size.
+
+    Returns `None` if the file does not exist. A file modified within the
+    last `MTIME_RESOLUTION` seconds gets a signature that never compares
+    equal, so it is read again until it settles.
+    """
+
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    if time.time() - stat.st_mtime < MTIME_RESOLUTION:
+        return object()
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def lock_file(fd, operation, timeout=None):
+    """
+    Take a flock, retrying with backoff until ``timeout`` runs out.
+
+    This only makes non-blocking calls, so unlike a timeout made with
+    SIGALRM it works in any thread.
+
+    Parameters
+    ----------
+    fd : file
+        The open file to lock.
+
+    operation : int
+        ``fcntl.LOCK_EX`` or ``fcntl.LOCK_SH``.
+
+    timeout : float, optional
+        How long to keep trying. Defaults to `LOCK_TIMEOUT`.
+
+    Raises
+    ------
+    BlockingIOError
+        If we cannot acquire the file lock in time.
+    """
+
+    if timeout is None:
+        timeout = LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            time.sleep(min(delay, remaining))
+            delay = min(2 * delay, 0.05)
+
+
+def trim_history(history, keep=None):
+    """
+    Keep the ``keep`` most recent entries of each preset's history.
+
+    Parameters
+    ----------
+    history : dict
+        ``{name: {timestamp: str}}``, oldest entries first.
+
+    keep : int, optional
+        How many entries to keep per preset. Keep everything if omitted.
+    """
+
+    if keep is None:
+        return history
+    return {name: dict(list(entries.items())[-keep:]) if keep else {}
+            for name, entries in history.items()}
+
+
+def split_history(data):
+    """
+    Separate the legacy history entries from a device's current presets.
+
+    Returns
+    -------
+    data, history : dict
+        The presets without history, and ``{name: {timestamp: str}}``.
+    """
+
+    values = {}
+    history = {}
+    for name, info in data.items():
+        info = dict(info)
+        entries = info.pop('history', None)
+        if entries:
+            history[name] = dict(entries)
+        values[name] = info
+    return values, history
+
+
+class YamlPresetStore:
+    """
+    Presets saved as one YAML file per device in a directory.
+
+    Parameters
+    ----------
+    path : str or Path
+        The directory that holds the YAML files.
+    """
+
+    # Loading everything means opening every file, so load devices one by one
+    bulk_read = False
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fds = {}
+
+    def device_path(self, device_name):
+        """The file that holds one device's presets."""
+        return self.path / (device_name + '.yml')
+
+    def history_path(self, device_name):
+        """The append-only log of one device's preset history."""
+        return self.path / (device_name + '.history')
+
+    def exists(self, device_name):
+        """`True` if the device has saved presets."""
+        return self.device_path(device_name).exists()
+
+    def signature(self, device_name):
+        """Changes whenever the device's presets file changes."""
+        return file_signature(self.device_path(device_name))
+
+    @contextmanager
+    def lock(self, device_name, timeout=None):
+        """
+        File locking context manager for one device.
+
+        Works like threading.Rlock in that you can acquire it multiple times
+        safely.
+
+        Parameters
+        ----------
+        device_name : str
+            The device whose file we should lock. The file is created if it
+            does not exist yet.
+
+        timeout : float, optional
+            How long to wait for the lock. Defaults to `LOCK_TIMEOUT`.
+
+        Raises
+        ------
+        BlockingIOError
+            If we cannot acquire the file lock.
+        """
+
+        key = (threading.get_ident(), device_name)
+        if key in self._fds:
+            logger.debug('using already open file descriptor')
+            yield self._fds[key]
+            return
+        path = self.device_path(device_name)
+        if not path.exists():
+            path.touch()
+            path.chmod(0o666)
+        with open(path, 'r+') as fd:
+            lock_file(fd, fcntl.LOCK_EX, timeout)
+            logger.debug('acquired lock for %s', path)
+            self._fds[key] = fd
+            try:
+                yield fd
+            finally:
+                del self._fds[key]
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                logger.debug('released lock for %s', path)
+
+    def read(self, device_name):
+        """Get one device's presets."""
+        with self.lock(device_name) as f:
+            f.seek(0)
+            return yaml.full_load(f) or {}
+
+    def write(self, device_name, data):
+        """Overwrite one device's presets."""
+        with self.lock(device_name) as f:
+            f.seek(0)
+            yaml.dump(data, f, default_flow_style=False)
+            f.truncate()
+
+    @contextmanager
+    def _history_lock(self, device_name, operation, timeout=None):
+        """Open the history log with a shared or exclusive flock."""
+        path = self.history_path(device_name)
+        if not path.exists():
+            path.touch()
+            path.chmod(0o666)
+        with open(path, 'r+') as fd:
+            lock_file(fd, operation, timeout)
+            try:
+                yield fd
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def append_history(self, device_name, name, timestamp, entry):
+        """
+        Add one entry to a preset's history.
+
+        Appends a single line to the log with one ``O_APPEND`` write, so
+        lines from many sessions never overlap. This only takes a shared
+        lock, which keeps out `compact` but not other writers.
+        """
+
+        line = (json.dumps([name, timestamp, entry]) + '\n').encode()
+        path = self.history_path(device_name)
+        created = not path.exists()
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            if created:
+                path.chmod(0o666)
+            lock_file(fd, fcntl.LOCK_SH)
+            os.write(fd, line)
+        finally:
+            # Closing also releases the lock
+            os.close(fd)
+
+    def read_history(self, device_name):
+        """Get the history of each of one device's presets."""
+        _, history = split_history(self.read(device_name)
+                                   if self.exists(device_name) else {})
+        if not self.history_path(device_name).exists():
+            return history
+        with self._history_lock(device_name, fcntl.LOCK_SH) as fd:
+            for line in fd:
+                if not line.strip():
+                    continue
+                try:
+                    name, timestamp, entry = json.loads(line)
+                except ValueError:
+                    logger.warning('Skipping bad history line in %s: %r',
+                                   self.history_path(device_name), line)
+                    continue
+                history.setdefault(name, {})[timestamp] = entry
+        return history
+
+    def write_history(self, device_name, history):
+        """
+        Replace one device's history log.
+
+        Any legacy history saved next to the presets is removed, because it
+        is expected to be part of ``history``.
+        """
+
+        with self.lock(device_name):
+            with self._history_lock(device_name, fcntl.LOCK_EX) as fd:
+                fd.seek(0)
+                for name, entries in history.items():
+                    for timestamp, entry in entries.items():
+                        fd.write(json.dumps([name, timestamp, entry]) + '\n')
+                fd.truncate()
+            data = self.read(device_name)
+            values, legacy = split_history(data)
+            if legacy:
+                self.write(device_name, values)
+
+    def compact(self, device_name, keep=None):
+        """
+        Rewrite one device's history log.
+
+        Moves legacy history out of the presets file and optionally drops all
+        but the ``keep`` most recent entries of each preset.
+        """
+
+        with self.lock(device_name):
+            history = self.read_history(device_name)
+            self.write_history(device_name, trim_history(history, keep))
+
+    def devices(self):
+        """The names of every device with saved presets."""
+        return sorted(path.stem for path in self.path.glob('*.yml'))
+
+    def read_all(self):
+        """Get every device's presets, keyed by device name."""
+        return {name: self.read(name) for name in self.devices()}
+
+    def write_all(self, presets):
+        """Overwrite the presets of every device in a dictionary."""
+        for device_name, data in presets.items():
+            self.write(device_name, data)
+
+    def close(self):
+        """Nothing to close, files are only open while in use."""
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({str(self.path)!r})'
+
+
+class SqlitePresetStore:
+    """
+    Presets for every device saved in one SQLite database.
+
+    Rows are indexed by device and preset name, and `read_all` loads every
+    device in a single query.
+
+    Parameters
+    ----------
+    path : str or Path
+        The database file. It is created if it does not exist.
+    """
+
+    bulk_read = True
+
+    # presets.history only holds legacy history that has not been compacted
+    _schema = """
+        CREATE TABLE IF NOT EXISTS presets (
+            device TEXT NOT NULL,
+            name TEXT NOT NULL,
+            value REAL,
+            active INTEGER NOT NULL DEFAULT 1,
+            history TEXT NOT NULL DEFAULT '{}',
+            PRIMARY KEY (device, name)
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device TEXT NOT NULL,
+            name TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            entry TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS history_device ON history (device);
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        created = not self.path.exists()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                     isolation_level=None)
+        self._rlock = threading.RLock()
+        self._depth = 0
+        with self._rlock:
+            self._conn.execute(
+                f'PRAGMA busy_timeout = {int(LOCK_TIMEOUT * 1000)}')
+            self._conn.executescript(self._schema)
+        if created:
+            self.path.chmod(0o666)
+
+    def device_path(self, device_name):
+        """The file that holds one device's presets."""
+        return self.path
+
+    def signature(self, device_name):
+        """Changes whenever the database changes."""
+        return file_signature(self.path)
+
+    def exists(self, device_name):
+        """`True` if the device has saved presets."""
+        with self._rlock:
+            row = self._conn.execute(
+                'SELECT 1 FROM presets WHERE device = ? LIMIT 1',
+                (device_name,)).fetchone()
+        return row is not None
+
+    @contextmanager
+    def lock(self, device_name, timeout=None):
+        """
+        Hold a write transaction on the database.
+
+        Works like threading.Rlock in that you can acquire it multiple times
+        safely. Everything written inside is committed together.
+
+        Raises
+        ------
+        BlockingIOError
+            If another session is holding the database.
+        """
+
+        if timeout is None:
+            timeout = LOCK_TIMEOUT
+        if not self._rlock.acquire(timeout=timeout):
+            raise BlockingIOError(f'{self.path} is in use by another thread')
+        busy_timeout = None
+        try:
+            if self._depth == 0:
+                busy_timeout, = self._conn.execute(
+                    'PRAGMA busy_timeout').fetchone()
+                self._conn.execute(
+                    f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+                try:
+                    self._conn.execute('BEGIN IMMEDIATE')
+                except sqlite3.OperationalError as exc:
+                    raise BlockingIOError(str(exc)) from exc
+                logger.debug('acquired lock for %s', self.path)
+            self._depth += 1
+            try:
+                yield self._conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute('ROLLBACK')
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute('COMMIT')
+                logger.debug('released lock for %s', self.path)
+        finally:
+            if busy_timeout is not None:
+                self._conn.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+            self._rlock.release()
+
+    @staticmethod
+    def _to_dict(rows):
+        data = {}
+        for name, value, active, history in rows:
+            data[name] = {'value': value, 'active': bool(active)}
+            history = json.loads(history)
+            if history:
+                data[name]['history'] = history
+        return data
+
+    def read(self, device_name):
+        """Get one device's presets."""
+        with self._rlock:
+            rows = self._conn.execute(
+                'SELECT name, value, active, history FROM presets '
+                'WHERE device = ?', (device_name,)).fetchall()
+        return self._to_dict(rows)
+
+    def write(self, device_name, data):
+        """Overwrite one device's presets."""
+        with self.lock(device_name) as conn:
+            conn.execute('DELETE FROM presets WHERE device = ?',
+                         (device_name,))
+            conn.executemany(
+                'INSERT INTO presets (device, name, value, active, history) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(device_name, name, info.get('value'),
+                  int(info.get('active', True)),
+                  json.dumps(info.get('history', {})))
+                 for name, info in data.items()])
+
+    def append_history(self, device_name, name, timestamp, entry):
+        """Add one entry to a preset's history."""
+        with self._rlock:
+            self._conn.execute(
+                'INSERT INTO history (device, name, timestamp, entry) '
+                'VALUES (?, ?, ?, ?)', (device_name, name, timestamp, entry))
+
+    def read_history(self, device_name):
+        """Get the history of each of one device's presets."""
+        _, history = split_history(self.read(device_name))
+        with self._rlock:
+            rows = self._conn.execute(
+                'SELECT name, timestamp, entry FROM history '
+                'WHERE device = ? ORDER BY id', (device_name,)).fetchall()
+        for name, timestamp, entry in rows:
+            history.setdefault(name, {})[timestamp] = entry
+        return history
+
+    def write_history(self, device_name, history):
+        """
+        Replace one device's history log.
+
+        Any legacy history saved next to the presets is removed, because it
+        is expected to be part of ``history``.
+        """
+
+        with self.lock(device_name) as conn:
+            conn.execute('DELETE FROM history WHERE device = ?',
+                         (device_name,))
+            conn.executemany(
+                'INSERT INTO history (device, name, timestamp, entry) '
+                'VALUES (?, ?, ?, ?)',
+                [(device_name, name, timestamp, entry)
+                 for name, entries in history.items()
+                 for timestamp, entry in entries.items()])
+            conn.execute("UPDATE presets SET history = '{}' WHERE device = ?",
+                         (device_name,))
+
+    def compact(self, device_name, keep=None):
+        """
+        Rewrite one device's history log.
+
+        Moves legacy history out of the presets table and optionally drops
+        all but the ``keep`` most recent entries of each preset.
+        """
+
+        with self.lock(device_name):
+            history = self.read_history(device_name)
+            self.write_history(device_name, trim_history(history, keep))
+
+    def devices(self):
+        """The names of every device with saved presets."""
+        with self._rlock:
+            rows = self._conn.execute(
+                'SELECT DISTINCT device FROM presets ORDER BY device')
+            return [row[0] for row in rows]
+
+    def read_all(self):
+        """Get every device's presets, keyed by device name."""
+        with self._rlock:
+            rows = self._conn.execute(
+                'SELECT device, name, value, active, history FROM presets '
+                'ORDER BY device').fetchall()
+        presets = {}
+        for device_name, *row in rows:
+            presets.setdefault(device_name, []).append(row)
+        return {device_name: self._to_dict(device_rows)
+                for device_name, device_rows in presets.items()}
+
+    def write_all(self, presets):
+        """Overwrite the presets of every device in a dictionary."""
+        with self.lock(None):
+            for device_name, data in presets.items():
+                self.write(device_name, data)
+
+    def close(self):
+        """Close the database connection."""
+        with self._rlock:
+            self._conn.close()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({str(self.path)!r})'
+
+
+def is_store(obj):
+    """`True` if ``obj`` is a preset store rather than a path."""
+    return isinstance(obj, (YamlPresetStore, SqlitePresetStore))
+
+
+def get_store(path):
+    """
+    Pick the preset store for a path.
+
+    Paths with a database suffix such as ``.db`` are SQLite databases, and
+    anything else is a directory of YAML files. Stores are passed through.
+    """
+
+    if is_store(path):
+        return path
+    path = Path(path)
+    if path.suffix in SQLITE_SUFFIXES:
+        return SqlitePresetStore(path)
+    return YamlPresetStore(path)
+
+
+def copy_presets(source, destination, embed_history=False):
+    """
+    Copy every device's presets and history from one store to another.
+
+    Parameters
+    ----------
+    source, destination : str, Path or store
+        The stores or their paths, see `get_store`. Stores opened here from
+        a path are closed again afterwards.
+
+    embed_history : bool, optional
+        Save the history next to each preset, as in the original YAML
+        layout, instead of in the destination's history log.
+
+    Returns
+    -------
+    devices : list of str
+        The devices that were copied.
+    """
+
+    close_source = not is_store(source)
+    close_destination = not is_store(destination)
+    source = get_store(source)
+    destination = get_store(destination)
+    try:
+        return _copy_presets(source, destination, embed_history)
+    finally:
+        if close_source:
+            source.close()
+        if close_destination:
+            destination.close()
+
+
+def _copy_presets(source, destination, embed_history):
+    presets = {}
+    histories = {}
+    for device_name, data in source.read_all().items():
+        presets[device_name], _ = split_history(data)
+        histories[device_name] = source.read_history(device_name)
+    if embed_history:
+        for device_name, data in presets.items():
+            for name, info in data.items():
+                info['history'] = histories[device_name].get(name, {})
+    destination.write_all(presets)
+    if not embed_history:
+        for device_name, history in histories.items():
+            destination.write_history(device_name, history)
+    logger.info('Copied presets for %d devices from %s to %s',
+                len(presets), source, destination)
+    return list(presets)
+
+
+def import_yaml(directory, database):
+    """Copy a directory of YAML preset files into a SQLite database."""
+    destination = SqlitePresetStore(database)
+    try:
+        return copy_presets(YamlPresetStore(directory), destination)
+    finally:
+        destination.close()
+
+
+def export_yaml(database, directory):
+    """
+    Write a SQLite preset database out as a directory of YAML files.
+
+    The history is saved in each YAML file, so older releases can read them.
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    source = SqlitePresetStore(database)
+    try:
+        return copy_presets(source, YamlPresetStore(directory),
+                            embed_history=True)
+    finally:
+        source.close()
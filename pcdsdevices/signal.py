@@ -10,9 +10,16 @@ if __name__ != 'pcdsdevices.signal':
                        'extremely confusing bugs. Please run your script '
                        'elsewhere for better results.')
 import logging
-from threading import RLock, Thread
+import math
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, RLock
+from types import MappingProxyType
 
 import numpy as np
+from ophyd.device import Component as Cpt
+from ophyd.device import Device
 from ophyd.signal import (EpicsSignal, EpicsSignalBase, EpicsSignalRO,
                           Signal, SignalRO)
 from ophyd.sim import FakeEpicsSignal, FakeEpicsSignalRO, fake_device_cache
@@ -20,6 +27,88 @@ from pytmc.pragmas import normalize_io
 
 logger = logging.getLogger(__name__)
 
+_get_executor = None
+_get_executor_lock = Lock()
+
+
+def get_executor():
+    """
+    Return the shared thread pool used for concurrent signal reads.
+
+    The pool is created on first use.
+    """
+
+    global _get_executor
+    with _get_executor_lock:
+        if _get_executor is None:
+            _get_executor = ThreadPoolExecutor(
+                max_workers=16, thread_name_prefix='pcdsdevices_get')
+        return _get_executor
+
+
+def subscribe_when_connected(signal, callback, done=None):
+    """
+    Subscribe to a signal once it connects, without blocking.
+
+    Signals that are already connected are subscribed to right away. The
+    others get a ``SUB_META`` callback that makes the subscription when the
+    signal reports that it connected, so no thread waits on a PV that never
+    connects.
+
+    Parameters
+    ----------
+    signal : Signal
+        The signal to subscribe to.
+
+    callback : callable
+        The ``SUB_VALUE`` callback.
+
+    done : callable, optional
+        Called with no arguments after the subscription is made.
+
+    Returns
+    -------
+    future : concurrent.futures.Future
+        Finishes when the subscription is made, or holds the error from
+        making it. Never finishes if the signal never connects.
+    """
+
+    future = Future()
+    lock = Lock()
+    meta_cid = None
+
+    def subscribe():
+        # Only the first call after connecting makes the subscription
+        with lock:
+            if (future.running() or future.done()
+                    or not future.set_running_or_notify_cancel()):
+                return
+        try:
+            signal.subscribe(callback)
+            if done is not None:
+                done()
+        except Exception as exc:
+            logger.debug('Error subscribing to %s', signal.name,
+                         exc_info=True)
+            future.set_exception(exc)
+        else:
+            future.set_result(None)
+
+    def connection_changed(*args, connected=False, **kwargs):
+        if connected:
+            subscribe()
+            signal.unsubscribe(meta_cid)
+
+    if not signal.connected:
+        meta_cid = signal.subscribe(connection_changed,
+                                    event_type=signal.SUB_META, run=False)
+    # Also covers a connection made just before the SUB_META subscription
+    if signal.connected:
+        subscribe()
+        if meta_cid is not None:
+            signal.unsubscribe(meta_cid)
+    return future
+
 
 class PytmcSignal(EpicsSignalBase):
     """
@@ -116,20 +205,61 @@ class AggregateSignal(Signal):
     This class exists to handle the group subscriptions without repeatedly
     getting the values of all the subsignals at all times.
 
+    The sub-signals are read concurrently on the shared thread pool from
+    :func:`get_executor`, so a `get` costs one round trip instead of one per
+    sub-signal.
+
+    The cache is copy-on-write: every update swaps in a new read-only
+    snapshot under a short lock, the readback is recalculated from that
+    snapshot outside of the lock, and subscriptions run after the new
+    readback is published. A slow subscriber therefore never holds up
+    updates from the other sub-signals.
+
+    Subscriptions see every readback, in snapshot order. One thread at a
+    time runs them, and readbacks that arrive while it is busy wait in a
+    queue for that thread to send.
+
     Attributes
     ----------
-    _cache : dict
-        Mapping from signal to last known value.
+    _cache : mapping
+        Read-only snapshot mapping each signal to its last known value.
+        Never modified in place, so :meth:`_calc_readback` should read it
+        once and use that snapshot throughout.
+
+    _cache_times : mapping
+        Read-only snapshot mapping each signal to the time its cached value
+        was last updated.
 
     _sub_signals : list
         Signals that contribute to this signal.
+
+    _max_cache_age : float or None
+        Default for the ``max_age`` argument to `get`.
+
+    _coalesce_sub_values : bool
+        If `True`, readbacks that arrive while the subscriptions are busy
+        are merged, and only the newest is sent. Subscribers then skip
+        intermediate values, so only use this for consumers that want the
+        latest value, like a display. Defaults to `False`.
     """
 
     _update_only_on_change = True
+    _max_cache_age = None
+    _coalesce_sub_values = False
 
     def __init__(self, *, name, **kwargs):
         super().__init__(name=name, **kwargs)
-        self._cache = {}
+        self._cache = MappingProxyType({})
+        self._cache_times = MappingProxyType({})
+        # Snapshot where each signal's cached value was last updated
+        self._cache_versions = {}
+        # Snapshot counter, and the snapshot the readback was calculated from
+        self._cache_version = 0
+        self._readback_version = 0
+        # Readbacks waiting for the subscriptions, and whether a thread is
+        # already running them
+        self._sub_queue = deque()
+        self._sub_running = False
         self._has_subscribed = False
         self._lock = RLock()
         self._sub_signals = []
@@ -147,25 +277,146 @@ class AggregateSignal(Signal):
 
         raise NotImplementedError('Subclasses must implement _calc_readback')
 
+    def _update_cache(self, values, since=None):
+        """
+        Swap in a new cache snapshot with some updated values.
+
+        Parameters
+        ----------
+        values : dict
+            New values for some of the signals.
+
+        since : int, optional
+            The snapshot that was current when the values were read. Values
+            for signals that were updated after it are skipped, because the
+            cache already has a newer value.
+
+        Returns
+        -------
+        version : int
+            The number of the new snapshot.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            if since is not None:
+                values = {signal: value for signal, value in values.items()
+                          if self._cache_versions.get(signal, 0) <= since}
+            cache = dict(self._cache)
+            cache.update(values)
+            cache_times = dict(self._cache_times)
+            cache_times.update(dict.fromkeys(values, now))
+            self._cache = MappingProxyType(cache)
+            self._cache_times = MappingProxyType(cache_times)
+            self._cache_version += 1
+            self._cache_versions.update(
+                dict.fromkeys(values, self._cache_version))
+            return self._cache_version
+
+    def _publish(self, version, readback):
+        """
+        Store a readback unless one from a newer snapshot is already stored.
+
+        Returns
+        -------
+        old_value
+            The previous readback.
+
+        published : bool
+            `False` if the readback was out of date and was discarded.
+        """
+
+        with self._lock:
+            old_value = self._readback
+            if version < self._readback_version:
+                return old_value, False
+            self._readback = readback
+            self._readback_version = version
+            return old_value, True
+
     def _insert_value(self, signal, value):
         """Update the cache with one value and recalculate."""
-        with self._lock:
-            self._cache[signal] = value
-            self._update_state()
-            return self._readback
+        self._update_state(self._update_cache({signal: value}))
+        return self._readback
 
-    def _update_state(self):
+    def _update_state(self, version=None):
         """Recalculate the state."""
-        with self._lock:
-            self._readback = self._calc_readback()
+        if version is None:
+            version = self._cache_version
+        return self._publish(version, self._calc_readback())
 
-    def get(self, **kwargs):
-        """Update all values and recalculate."""
-        with self._lock:
-            for signal in self._sub_signals:
-                self._cache[signal] = signal.get(**kwargs)
-            self._update_state()
-            return self._readback
+    def _cache_is_fresh(self, max_age):
+        """
+        `True` if every cached value is kept current by a subscription.
+
+        The monitor of a connected signal sends every change, so its cached
+        value is current no matter how long ago it last changed. A signal
+        that is disconnected only counts if its cached value was updated
+        within the last ``max_age`` seconds.
+        """
+
+        if not self._has_subscribed:
+            return False
+        oldest = time.monotonic() - max_age
+        for signal in self._sub_signals:
+            updated = self._cache_times.get(signal)
+            if updated is None:
+                return False
+            if not signal.connected and updated < oldest:
+                return False
+        return True
+
+    def _get_sub_values(self, **kwargs):
+        """
+        Read every sub-signal, running the round trips concurrently.
+
+        Nested `AggregateSignal` and auto-monitored EPICS signals are read in
+        this thread because their reads do not need a round trip, and so that
+        pool threads never wait on the pool.
+        """
+
+        pooled = [signal for signal in self._sub_signals
+                  if not isinstance(signal, AggregateSignal)
+                  and not getattr(signal, '_auto_monitor', False)]
+        if len(pooled) > 1:
+            executor = get_executor()
+            futures = {signal: executor.submit(signal.get, **kwargs)
+                       for signal in pooled}
+        else:
+            futures = {}
+        values = {}
+        for signal in self._sub_signals:
+            if signal not in futures:
+                values[signal] = signal.get(**kwargs)
+        for signal, future in futures.items():
+            values[signal] = future.result()
+        return values
+
+    def get(self, *, max_age=None, **kwargs):
+        """
+        Update all values and recalculate.
+
+        Parameters
+        ----------
+        max_age : float, optional
+            If every sub-signal is monitored through our subscriptions, skip
+            the reads and return the cached result. Connected sub-signals
+            always count as monitored, disconnected ones only if their cached
+            value is younger than this many seconds. Defaults to
+            ``_max_cache_age``, which disables this.
+        """
+
+        if max_age is None:
+            max_age = self._max_cache_age
+        if max_age is not None:
+            with self._lock:
+                if self._cache_is_fresh(max_age):
+                    return self._readback
+        since = self._cache_version
+        values = self._get_sub_values(**kwargs)
+        # Monitor updates that arrived during the reads are newer
+        self._update_state(self._update_cache(values, since=since))
+        return self._readback
 
     def put(self, value, **kwargs):
         raise NotImplementedError('put should be overriden in the subclass')
@@ -182,6 +433,7 @@ class AggregateSignal(Signal):
             # We need to subscribe to ALL relevant signals!
             for signal in self._sub_signals:
                 signal.subscribe(self._run_sub_value, run=False)
+            self._has_subscribed = True
             self.get()  # Ensure we have a full cache
         return cid
 
@@ -190,14 +442,159 @@ class AggregateSignal(Signal):
         sig = kwargs.pop('obj')
         kwargs.pop('old_value')
         value = kwargs['value']
+        # Update just one value and assume the rest are cached
+        # This allows us to run subs without EPICS gets
+        version = self._update_cache({sig: value})
+        value = self._calc_readback()
         with self._lock:
-            old_value = self._readback
-            # Update just one value and assume the rest are cached
-            # This allows us to run subs without EPICS gets
-            value = self._insert_value(sig, value)
-            if value != old_value or not self._update_only_on_change:
-                self._run_subs(sub_type=self.SUB_VALUE, obj=self, value=value,
-                               old_value=old_value)
+            # Queue in the same step as publishing, so that the queue is in
+            # snapshot order
+            old_value, published = self._publish(version, value)
+            if not published:
+                return
+            if value == old_value and self._update_only_on_change:
+                return
+            if self._coalesce_sub_values and self._sub_queue:
+                # The subscriptions never saw the merged readback
+                self._sub_queue[-1] = (value, self._sub_queue[-1][1])
+            else:
+                self._sub_queue.append((value, old_value))
+            if self._sub_running:
+                return
+            self._sub_running = True
+        self._deliver_sub_values()
+
+    def _deliver_sub_values(self):
+        """Run the subscriptions for every queued readback, in order."""
+        try:
+            while True:
+                with self._lock:
+                    if not self._sub_queue:
+                        self._sub_running = False
+                        return
+                    value, old_value = self._sub_queue.popleft()
+                self._run_subs(sub_type=self.SUB_VALUE, obj=self,
+                               value=value, old_value=old_value)
+        except Exception:
+            with self._lock:
+                self._sub_running = False
+            raise
+
+
+class WindowStats:
+    """
+    Incremental statistics of a sliding window of values.
+
+    Values enter at the back of the window and leave from the front in the
+    same order, each tagged with its position in the stream. Every update is
+    O(1) (amortized for the min and max) and NaN values are skipped. Floating
+    point drift in the running sums can be removed with :meth:`recompute`.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget every value."""
+        self.count = 0
+        self._sum = 0.
+        self._sumsq = 0.
+        # Monotonic queues of (index, value) for the sliding min and max
+        self._mins = deque()
+        self._maxs = deque()
+
+    def add(self, index, value):
+        """Add the value at stream position ``index`` to the window."""
+        if math.isnan(value):
+            return
+        self.count += 1
+        self._sum += value
+        self._sumsq += value * value
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((index, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((index, value))
+
+    def remove(self, index, value):
+        """Remove the value at stream position ``index`` from the window."""
+        if math.isnan(value):
+            return
+        self.count -= 1
+        if self.count:
+            self._sum -= value
+            self._sumsq -= value * value
+        else:
+            self._sum = self._sumsq = 0.
+        if self._mins and self._mins[0][0] <= index:
+            self._mins.popleft()
+        if self._maxs and self._maxs[0][0] <= index:
+            self._maxs.popleft()
+
+    def recompute(self, values):
+        """Replace the running sums with exact ones for the given values."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.count = len(values)
+        self._sum = float(values.sum())
+        self._sumsq = float(np.dot(values, values))
+
+    @property
+    def mean(self):
+        """Mean of the window, or NaN if it holds no values."""
+        if not self.count:
+            return np.nan
+        return self._sum / self.count
+
+    @property
+    def std(self):
+        """Population standard deviation of the window."""
+        if not self.count:
+            return np.nan
+        mean = self._sum / self.count
+        return math.sqrt(max(self._sumsq / self.count - mean * mean, 0.))
+
+    @property
+    def min(self):
+        """Smallest value in the window."""
+        return self._mins[0][1] if self._mins else np.nan
+
+    @property
+    def max(self):
+        """Largest value in the window."""
+        return self._maxs[0][1] if self._maxs else np.nan
+
+
+class RollingStats:
+    """
+    Statistics of the last ``size`` values appended.
+
+    Parameters
+    ----------
+    size : int
+        The number of values to keep.
+    """
+
+    def __init__(self, size):
+        self.size = int(size)
+        self.values = np.full(self.size, np.nan)
+        self.num_appended = 0
+        self.stats = WindowStats()
+
+    def append(self, value):
+        """Add a value, forgetting the oldest one if we are full."""
+        value = float(value)
+        index = self.num_appended
+        slot = index % self.size
+        if index >= self.size:
+            self.stats.remove(index - self.size, self.values[slot])
+        self.values[slot] = value
+        self.stats.add(index, value)
+        self.num_appended += 1
+        # Amortized O(1) cleanup of floating point drift
+        if not self.num_appended % self.size:
+            self.stats.recompute(self.values)
 
 
 class AvgSignal(Signal):
@@ -213,6 +610,9 @@ class AvgSignal(Signal):
     Warning: this means that if we only have recieved ONE value, the mean will
     just be the mean of a single value!
 
+    The mean is kept up to date incrementally by `RollingStats`, so each
+    update costs the same regardless of the buffer size.
+
     Parameters
     ----------
     signal : Signal
@@ -232,12 +632,10 @@ class AvgSignal(Signal):
         self._lock = RLock()
         self.averages = averages
         self._con = False
-        t = Thread(target=self._init_subs, args=())
-        t.start()
+        subscribe_when_connected(self.raw_sig, self._update_avg,
+                                 done=self._set_connected)
 
-    def _init_subs(self):
-        self.raw_sig.wait_for_connection()
-        self.raw_sig.subscribe(self._update_avg)
+    def _set_connected(self):
         self._con = True
 
     @property
@@ -254,19 +652,18 @@ class AvgSignal(Signal):
         """Reinitialize an empty internal buffer of size `avg`."""
         with self._lock:
             self._avg = avg
-            self.index = 0
-            # Allocate uninitalized array
-            self.values = np.empty(avg)
-            # Fill with nan
-            self.values.fill(np.nan)
+            self.rolling = RollingStats(avg)
+
+    @property
+    def values(self):
+        """The internal buffer, with NaN in the slots not yet filled."""
+        return self.rolling.values
 
     def _update_avg(self, *args, value, **kwargs):
         """Add new value to the buffer, overriding old values if needed."""
         with self._lock:
-            self.values[self.index] = value
-            self.index = (self.index + 1) % len(self.values)
-            # This takes a mean, skipping nan values.
-            self.put(np.nanmean(self.values))
+            self.rolling.append(value)
+            self.put(self.rolling.stats.mean)
 
 
 class NotImplementedSignal(SignalRO):
@@ -293,3 +690,468 @@ class InternalSignal(SignalRO):
 
     def set(self, value, *, timestamp=None, force=False):
         return Signal.set(self, value, timestamp=timestamp, force=force)
+
+
+class SignalStats(Device):
+    """
+    Rolling statistics of another signal as a group of child signals.
+
+    This subscribes to a signal like `AvgSignal` does, but publishes the
+    mean, standard deviation, minimum, maximum and count of the last
+    ``averages`` updates, all maintained incrementally.
+
+    Parameters
+    ----------
+    prefix : str
+        Unused, for compatibility with `~ophyd.device.Component`.
+
+    signal : Signal or str
+        The signal to collect statistics for, or its attribute name on the
+        parent device.
+
+    averages : int
+        The number of `SUB_VALUE` updates to include.
+    """
+
+    mean = Cpt(InternalSignal, kind='hinted',
+               doc='Mean of the recent values.')
+    std = Cpt(InternalSignal, kind='normal',
+              doc='Standard deviation of the recent values.')
+    min = Cpt(InternalSignal, kind='normal',
+              doc='Smallest recent value.')
+    max = Cpt(InternalSignal, kind='normal',
+              doc='Largest recent value.')
+    count = Cpt(InternalSignal, value=0, kind='normal',
+                doc='Number of recent values that are not NaN.')
+
+    def __init__(self, prefix='', *, signal, averages, name, parent=None,
+                 **kwargs):
+        super().__init__(prefix, name=name, parent=parent, **kwargs)
+        if isinstance(signal, str):
+            signal = getattr(parent, signal)
+        self.raw_sig = signal
+        self._lock = RLock()
+        self.averages = averages
+        self._subscribed = subscribe_when_connected(self.raw_sig,
+                                                    self._update_stats)
+
+    @property
+    def averages(self):
+        """The number of updates to include in the statistics."""
+        return self._avg
+
+    @averages.setter
+    def averages(self, avg):
+        with self._lock:
+            self._avg = avg
+            self.rolling = RollingStats(avg)
+
+    def _update_stats(self, *args, value, timestamp=None, **kwargs):
+        with self._lock:
+            self.rolling.append(value)
+            stats = self.rolling.stats
+            for sig, stat in ((self.count, stats.count),
+                              (self.mean, stats.mean),
+                              (self.std, stats.std),
+                              (self.min, stats.min),
+                              (self.max, stats.max)):
+                sig.put(stat, timestamp=timestamp, force=True)
+
+
+def downsample_minmax(timestamps, values, num_points):
+    """
+    Reduce a time series to at most ``num_points`` points for plotting.
+
+    The samples are split into ``num_points // 2`` equal bins and each bin
+    keeps its smallest and largest values, in time order, so that spikes and
+    dips still show up. Bins are reduced through a reshaped view, so the
+    input is not copied unless it contains NaN.
+
+    Parameters
+    ----------
+    timestamps, values : ~numpy.ndarray
+        The time series.
+
+    num_points : int
+        The most points to return.
+
+    Returns
+    -------
+    timestamps, values : ~numpy.ndarray
+        The downsampled time series.
+    """
+
+    num_samples = len(values)
+    num_bins = max(1, num_points // 2)
+    if num_samples <= num_points:
+        return timestamps, values
+    bin_size = -(-num_samples // num_bins)
+    num_full = num_samples // bin_size
+    full = num_full * bin_size
+    bins = values[:full].reshape(num_full, bin_size)
+    has_nan = np.isnan(bins).any()
+    lo = np.where(np.isnan(bins), np.inf, bins) if has_nan else bins
+    hi = np.where(np.isnan(bins), -np.inf, bins) if has_nan else bins
+    offsets = np.arange(num_full) * bin_size
+    picks = [lo.argmin(axis=1) + offsets, hi.argmax(axis=1) + offsets]
+    if full < num_samples:
+        rest = values[full:]
+        picks.append([full + np.argmin(np.where(np.isnan(rest), np.inf, rest)),
+                      full + np.argmax(np.where(np.isnan(rest), -np.inf,
+                                                rest))])
+    index = np.unique(np.concatenate([np.ravel(pick) for pick in picks]))
+    return timestamps[index], values[index]
+
+
+class TimeSeriesBuffer:
+    """
+    Preallocated ring buffer of timestamped values shared by many windows.
+
+    Each window covers the most recent samples, either a number of shots, a
+    span of time, or both, and keeps its own `WindowStats` up to date as
+    samples arrive. The memory used is fixed by ``capacity`` no matter how
+    many windows there are.
+
+    Every sample is stored twice, ``capacity`` slots apart, so that any run
+    of up to ``capacity`` recent samples is one contiguous slice and can be
+    returned as a view without copying.
+
+    Parameters
+    ----------
+    capacity : int
+        The number of samples to keep.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._values = np.full(2 * self.capacity, np.nan)
+        self._timestamps = np.full(2 * self.capacity, np.nan)
+        self.num_appended = 0
+        self._windows = []
+        self._lock = RLock()
+
+    def append(self, value, timestamp=None):
+        """Add a sample and update every window."""
+        if timestamp is None:
+            timestamp = time.time()
+        value = float(value)
+        with self._lock:
+            index = self.num_appended
+            # Drop the sample we are about to overwrite from every window
+            overwritten = index - self.capacity
+            for window in self._windows:
+                if window.start <= overwritten:
+                    window._remove_oldest()
+            slot = index % self.capacity
+            self._values[slot] = self._values[slot + self.capacity] = value
+            self._timestamps[slot] = timestamp
+            self._timestamps[slot + self.capacity] = timestamp
+            self.num_appended += 1
+            for window in self._windows:
+                window._append(index, value, timestamp)
+            windows = list(self._windows)
+        for window in windows:
+            if window.callback is not None:
+                window.callback(window)
+
+    def view(self, start, stop):
+        """
+        Values and timestamps for samples ``start`` to ``stop`` as views.
+
+        Samples are numbered from zero in the order they were appended. The
+        views share memory with the buffer and will change as new samples
+        overwrite the old ones, so copy them to keep them.
+        """
+
+        length = stop - start
+        if length < 0 or stop > self.num_appended:
+            raise ValueError(f'Invalid sample range {start} to {stop}')
+        if length > self.capacity or start < self.num_appended - self.capacity:
+            raise ValueError(f'Samples before {start + length} have been '
+                             'overwritten')
+        begin = start % self.capacity
+        return (self._values[begin:begin + length],
+                self._timestamps[begin:begin + length])
+
+    def add_window(self, shots=None, seconds=None, callback=None):
+        """
+        Start tracking a window of recent samples.
+
+        The window includes any samples already in the buffer that fit.
+
+        Parameters
+        ----------
+        shots : int, optional
+            The most samples to include.
+
+        seconds : float, optional
+            Only include samples newer than this relative to the latest one.
+
+        callback : callable, optional
+            Called as ``callback(window)`` after every new sample.
+
+        Returns
+        -------
+        window : BufferWindow
+        """
+
+        window = BufferWindow(self, shots=shots, seconds=seconds,
+                              callback=callback)
+        with self._lock:
+            self._windows.append(window)
+        return window
+
+    def remove_window(self, window):
+        """Stop tracking a window."""
+        with self._lock:
+            self._windows.remove(window)
+
+
+class BufferWindow:
+    """
+    Window of the most recent samples in a `TimeSeriesBuffer`.
+
+    Use :meth:`TimeSeriesBuffer.add_window` to create these. A window
+    advances when new samples arrive, and a time window can also drop stale
+    samples with :meth:`expire` when no new samples are coming.
+
+    Attributes
+    ----------
+    stats : WindowStats
+        The statistics of the samples in the window.
+
+    start : int
+        The number of the oldest sample in the window.
+    """
+
+    def __init__(self, buffer, shots=None, seconds=None, callback=None):
+        self.buffer = buffer
+        self.callback = callback
+        self.stats = WindowStats()
+        self.resize(shots=shots, seconds=seconds)
+
+    def resize(self, shots=None, seconds=None):
+        """
+        Change the size of the window.
+
+        The statistics are rebuilt from the samples in the buffer.
+        """
+
+        with self.buffer._lock:
+            self.shots = shots
+            self.seconds = seconds
+            stop = self.buffer.num_appended
+            self.start = max(0, stop - self.buffer.capacity)
+            self.stats.reset()
+            values, timestamps = self.buffer.view(self.start, stop)
+            for index, value in enumerate(values, start=self.start):
+                self.stats.add(index, value)
+            if stop:
+                self._evict(timestamps[-1])
+
+    def _append(self, index, value, timestamp):
+        self.stats.add(index, value)
+        self._evict(timestamp)
+        # Amortized O(1) cleanup of floating point drift
+        if not (index + 1) % self.buffer.capacity:
+            self.stats.recompute(self.values)
+
+    def _remove_oldest(self):
+        slot = self.start % self.buffer.capacity
+        self.stats.remove(self.start, self.buffer._values[slot])
+        self.start += 1
+
+    def _evict(self, latest):
+        stop = self.buffer.num_appended
+        if self.shots is not None:
+            while stop - self.start > self.shots:
+                self._remove_oldest()
+        if self.seconds is not None:
+            oldest = latest - self.seconds
+            timestamps = self.buffer._timestamps
+            capacity = self.buffer.capacity
+            while (self.start < stop
+                   and timestamps[self.start % capacity] <= oldest):
+                self._remove_oldest()
+
+    def expire(self, now=None):
+        """
+        Drop the samples that are older than ``seconds`` before ``now``.
+
+        Parameters
+        ----------
+        now : float, optional
+            The current time, defaults to `time.time`.
+
+        Returns
+        -------
+        expired : bool
+            `True` if any samples were dropped.
+        """
+
+        if self.seconds is None:
+            return False
+        if now is None:
+            now = time.time()
+        with self.buffer._lock:
+            start = self.start
+            self._evict(now)
+            return self.start != start
+
+    @property
+    def values(self):
+        """The values in the window, as a view of the buffer."""
+        with self.buffer._lock:
+            return self.buffer.view(self.start, self.buffer.num_appended)[0]
+
+    @property
+    def timestamps(self):
+        """The timestamps in the window, as a view of the buffer."""
+        with self.buffer._lock:
+            return self.buffer.view(self.start, self.buffer.num_appended)[1]
+
+
+class WindowSignal(InternalSignal):
+    """
+    Signal with the mean of a window of a `TimeSeriesBuffer`.
+
+    The window itself is available as ``window`` for the other statistics
+    and the raw samples.
+
+    Parameters
+    ----------
+    buffer : TimeSeriesBuffer or str
+        The buffer, or its attribute name on the parent device.
+
+    shots : int, optional
+        The most samples to include.
+
+    seconds : float, optional
+        Only include samples newer than this relative to the latest one.
+        Reading the signal also drops samples that are older than this
+        relative to the current time, so the mean goes to ``nan`` once the
+        source stops updating.
+    """
+
+    def __init__(self, buffer, *, shots=None, seconds=None, name,
+                 parent=None, **kwargs):
+        kwargs.setdefault('value', np.nan)
+        super().__init__(name=name, parent=parent, **kwargs)
+        if isinstance(buffer, str):
+            buffer = getattr(parent, buffer)
+        self.window = buffer.add_window(shots=shots, seconds=seconds,
+                                        callback=self._window_updated)
+
+    @property
+    def averages(self):
+        """The number of shots in the window."""
+        return self.window.shots
+
+    @averages.setter
+    def averages(self, shots):
+        capacity = self.window.buffer.capacity
+        if shots is not None and shots > capacity:
+            raise ValueError(f'{self.name} can average at most {capacity} '
+                             f'shots, not {shots}.')
+        self.window.resize(shots=shots, seconds=self.window.seconds)
+        self._window_updated(self.window)
+
+    def get(self, **kwargs):
+        if self.window.expire():
+            self._window_updated(self.window)
+        return super().get(**kwargs)
+
+    def _window_updated(self, window):
+        self.put(window.stats.mean, force=True)
+
+
+class HistorySignal(InternalSignal):
+    """
+    Signal that records the recent history of another signal.
+
+    Every `SUB_VALUE` update of the source signal is stored with its
+    timestamp in a preallocated `TimeSeriesBuffer`, so the memory used is
+    fixed by ``capacity``. The value of this signal is the latest recorded
+    value.
+
+    Parameters
+    ----------
+    signal : Signal or str
+        Any signal with numeric values, or its attribute name on the parent
+        device.
+
+    capacity : int, optional
+        The number of samples to keep. Each sample uses 32 bytes.
+    """
+
+    def __init__(self, signal, *, capacity=100000, name, parent=None,
+                 **kwargs):
+        kwargs.setdefault('value', np.nan)
+        super().__init__(name=name, parent=parent, **kwargs)
+        if isinstance(signal, str):
+            signal = getattr(parent, signal)
+        self.raw_sig = signal
+        self.buffer = TimeSeriesBuffer(capacity)
+        self._subscribed = subscribe_when_connected(self.raw_sig,
+                                                    self._record)
+
+    @property
+    def capacity(self):
+        """The number of samples kept."""
+        return self.buffer.capacity
+
+    def _record(self, *args, value, timestamp=None, **kwargs):
+        if value is None:
+            return
+        self.buffer.append(value, timestamp=timestamp)
+        self.put(value, timestamp=timestamp, force=True)
+
+    def history(self, start=None, stop=None):
+        """
+        The recorded samples between two times.
+
+        The arrays are views of the buffer and will change as new samples
+        arrive, so copy them to keep them.
+
+        Parameters
+        ----------
+        start, stop : float, optional
+            Unix timestamps to limit the samples to. Defaults to
+            everything that was recorded.
+
+        Returns
+        -------
+        timestamps, values : ~numpy.ndarray
+        """
+
+        buffer = self.buffer
+        with buffer._lock:
+            stop_index = buffer.num_appended
+            values, timestamps = buffer.view(
+                max(0, stop_index - buffer.capacity), stop_index)
+        first = 0 if start is None else np.searchsorted(timestamps, start)
+        last = (len(timestamps) if stop is None
+                else np.searchsorted(timestamps, stop, side='right'))
+        return timestamps[first:last], values[first:last]
+
+    def downsample(self, num_points=2000, start=None, stop=None):
+        """
+        The recorded samples reduced to at most ``num_points`` for plotting.
+
+        See :func:`downsample_minmax`.
+
+        Parameters
+        ----------
+        num_points : int, optional
+            The most points to return.
+
+        start, stop : float, optional
+            Unix timestamps to limit the samples to.
+
+        Returns
+        -------
+        timestamps, values : ~numpy.ndarray
+        """
+
+        timestamps, values = self.history(start=start, stop=stop)
+        return downsample_minmax(timestamps, values, num_points)
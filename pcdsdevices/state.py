@@ -2,14 +2,20 @@
 Module to define positioners that move between discrete named states.
 """
 import functools
+import itertools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from types import MappingProxyType
+from weakref import WeakKeyDictionary
 
+import numpy as np
 from ophyd.device import Component as Cpt
 from ophyd.device import Device, required_for_connection
 from ophyd.positioner import PositionerBase
 from ophyd.signal import EpicsSignal
-from ophyd.status import SubscriptionStatus
+from ophyd.status import StatusBase, SubscriptionStatus
 from ophyd.status import wait as status_wait
 
 from .doc_stubs import basic_positioner_init
@@ -20,6 +26,79 @@ from .variety import set_metadata
 
 logger = logging.getLogger(__name__)
 
+# Mapping of states enum -> {positioner class: StateLookup}
+_state_lookups = WeakKeyDictionary()
+# Mapping of (class, states, invalid states, unknown) -> state lists
+_state_lists_cache = {}
+# Mapping of (class, states, aliases) -> states enum
+_states_enum_cache = {}
+# Mapping of (class, enum_strs, states, aliases) -> states record aliases
+_record_alias_cache = {}
+
+
+def _freeze_alias(states_alias):
+    """Convert a `_states_alias` dict into a hashable key."""
+    return tuple((state, alias if isinstance(alias, str) else tuple(alias))
+                 for state, alias in states_alias.items())
+
+
+class StateLookup:
+    """
+    Precomputed, read-only lookup tables for a states enum.
+
+    These are built once per positioner class and states enum and shared
+    between instances, so that resolving a state is a single dictionary
+    lookup.
+
+    Attributes
+    ----------
+    enum : ~enum.Enum
+        The states enum these tables were built from.
+
+    states : mapping
+        Mapping from every state name, alias, integer value, digit string,
+        and enum member to the corresponding enum member.
+
+    positions : mapping
+        Mapping from each enum member to the name reported as the position,
+        which is the first alias if aliases were provided.
+
+    invalid : frozenset
+        The enum members that cannot be moved to.
+    """
+
+    def __init__(self, states_enum, states_alias, invalid_states):
+        self.enum = states_enum
+        states = {}
+        positions = {}
+        for state in states_enum:
+            states[state] = state
+            states[state.value] = state
+            states[str(state.value)] = state
+            alias = states_alias.get(state.name, state.name)
+            if isinstance(alias, list):
+                alias = alias[0]
+            positions[state] = alias
+        # Includes both the canonical names and the aliases
+        for name, state in states_enum.__members__.items():
+            states[name] = state
+        self.states = MappingProxyType(states)
+        self.positions = MappingProxyType(positions)
+        self.invalid = frozenset(states[name] for name in invalid_states
+                                 if name in states)
+
+    @classmethod
+    def get(cls, positioner):
+        """Get the shared lookup tables for a positioner's current enum."""
+        by_class = _state_lookups.setdefault(positioner.states_enum, {})
+        try:
+            return by_class[type(positioner)]
+        except KeyError:
+            lookup = cls(positioner.states_enum, positioner._states_alias,
+                         positioner._invalid_states)
+            by_class[type(positioner)] = lookup
+            return lookup
+
 
 class StatePositioner(Device, PositionerBase, MvInterface):
     """
@@ -80,6 +159,7 @@ class StatePositioner(Device, PositionerBase, MvInterface):
                              'least a state signal'))
         self._state_initialized = False
         self._has_subscribed_state = False
+        self._state_lookup = None
         super().__init__(prefix, name=name, **kwargs)
         if self.states_list:
             self._state_init()
@@ -92,16 +172,36 @@ class StatePositioner(Device, PositionerBase, MvInterface):
     @required_for_connection
     def _state_init(self):
         if not self._state_initialized:
-            self._valid_states = [state for state in self.states_list
-                                  if state not in self._invalid_states
-                                  and state is not None]
-            if self._unknown:
-                self.states_list = [self._unknown] + self.states_list
-                self._invalid_states = [self._unknown] + self._invalid_states
+            # These lists are shared between instances, do not mutate them
+            key = (type(self), tuple(self.states_list),
+                   tuple(self._invalid_states), self._unknown)
+            try:
+                state_lists = _state_lists_cache[key]
+            except KeyError:
+                state_lists = self._create_state_lists()
+                _state_lists_cache[key] = state_lists
+            (self.states_list, self._invalid_states,
+             self._valid_states) = state_lists
             if not hasattr(self, 'states_enum'):
                 self.states_enum = self._create_states_enum()
             self._state_initialized = True
 
+    def _create_state_lists(self):
+        """
+        Create the full states list, invalid states list, and valid states
+        list from the class definition.
+        """
+
+        valid_states = [state for state in self.states_list
+                        if state not in self._invalid_states
+                        and state is not None]
+        states_list = list(self.states_list)
+        invalid_states = list(self._invalid_states)
+        if self._unknown:
+            states_list = [self._unknown] + states_list
+            invalid_states = [self._unknown] + invalid_states
+        return states_list, invalid_states, valid_states
+
     def _late_state_init(self, *args, enum_strs=None, **kwargs):
         if enum_strs is not None and not self.states_list:
             self.states_list = list(enum_strs)
@@ -204,15 +304,8 @@ class StatePositioner(Device, PositionerBase, MvInterface):
         Name of the positioner's current state. If aliases were provided, the
         first alias will be used instead of the base name.
         """
-        state = self.state.get()
-        state = self.get_state(state).name
-        try:
-            alias = self._states_alias[state]
-            if isinstance(alias, list):
-                alias = alias[0]
-            return alias
-        except KeyError:
-            return state
+        state = self.get_state(self.state.get())
+        return self._state_lookup.positions[state]
 
     def check_value(self, value):
         """
@@ -228,7 +321,7 @@ class StatePositioner(Device, PositionerBase, MvInterface):
         if not isinstance(value, (int, str)):
             raise TypeError('Valid states must be of type str or int')
         state = self.get_state(value)
-        if state.name in self._invalid_states:
+        if state in self._state_lookup.invalid:
             raise ValueError('Cannot set the %s state', state.name)
         return state
 
@@ -243,21 +336,31 @@ class StatePositioner(Device, PositionerBase, MvInterface):
             meaningful fields, ``name`` and ``value``.
         """
 
-        # Check for a malformed string digit
-        if isinstance(value, str) and value.isdigit():
-            value = int(value)
+        lookup = self._get_state_lookup()
         try:
-            return self.states_enum[value]
+            return lookup.states[value]
         except KeyError:
+            pass
+        # Check for a malformed string digit, e.g. '02'
+        if isinstance(value, str) and value.isdigit():
             try:
-                return self.states_enum(value)
-            except ValueError:
-                err = ('{0} is not a valid state for {1}. Valid state names '
-                       'are: {2}, and their corresponding values are {3}.')
-                enum_names = [state.name for state in self.states_enum]
-                enum_values = [state.value for state in self.states_enum]
-                raise ValueError(err.format(value, self.name, enum_names,
-                                            enum_values))
+                return lookup.states[int(value)]
+            except KeyError:
+                pass
+        err = ('{0} is not a valid state for {1}. Valid state names '
+               'are: {2}, and their corresponding values are {3}.')
+        enum_names = [state.name for state in self.states_enum]
+        enum_values = [state.value for state in self.states_enum]
+        raise ValueError(err.format(value, self.name, enum_names,
+                                    enum_values))
+
+    def _get_state_lookup(self):
+        """Get the lookup tables, rebuilding them if the enum changed."""
+        lookup = self._state_lookup
+        if lookup is None or lookup.enum is not self.states_enum:
+            lookup = StateLookup.get(self)
+            self._state_lookup = lookup
+        return lookup
 
     def _do_move(self, state):
         """
@@ -279,7 +382,23 @@ class StatePositioner(Device, PositionerBase, MvInterface):
         """
         Create an enum that can be used to keep track of aliases, state names,
         and integer enum values.
+
+        Enums are shared between all instances of a class that have the same
+        states and aliases.
         """
+
+        key = (type(self), tuple(self.states_list),
+               _freeze_alias(self._states_alias))
+        try:
+            return _states_enum_cache[key]
+        except KeyError:
+            pass
+        enum = self._build_states_enum()
+        _states_enum_cache[key] = enum
+        return enum
+
+    def _build_states_enum(self):
+        """Build a new states enum, see `_create_states_enum`."""
         state_def = {}
         state_count = 0
         for i, state in enumerate(self.states_list):
@@ -334,32 +453,17 @@ class PVStateSignal(AggregateSignal):
         return {self.name: desc}
 
     def _calc_readback(self):
-        state_value = None
-        for signal_name, info in self.parent._state_logic.items():
-            # Get last cached value
-            value = self._cache[self._sub_map[signal_name]]
+        # Cached values in the same order as the _state_logic keys
+        cache = self._cache
+        values = tuple(cache[sig] for sig in self._sub_signals)
+        table = self.parent._state_table
+        if table is not None:
             try:
-                signal_state = info[value]
-            # Handle unaccounted readbacks
+                return table[values]
             except KeyError:
-                state_value = self.parent._unknown
-                break
-            # Associate readback with device state
-            if signal_state != 'defer':
-                if state_value:
-                    # Handle inconsistent readbacks
-                    if signal_state != state_value:
-                        state_value = self.parent._unknown
-                        break
-                else:
-                    # Set state to first non-deferred value
-                    state_value = signal_state
-                    if self.parent._state_logic_mode == 'ALL':
-                        continue
-                    elif self.parent._state_logic_mode == 'FIRST':
-                        break
-        # If all states deferred, report as unknown
-        return state_value or self.parent._unknown
+                # Unaccounted values, may still resolve in 'FIRST' mode
+                pass
+        return self.parent._evaluate_state_logic(values)
 
     def put(self, value, **kwargs):
         self.parent.move(value, **kwargs)
@@ -399,6 +503,11 @@ class PVStatePositioner(StatePositioner):
         state. You can set this to 'FIRST' instead to use the first state
         found while traversing the `_state_logic` tree. This means an earlier
         state definition can mask a later state definition.
+
+    _state_table : dict
+        The `_state_logic` precomputed for every combination of accounted
+        values when the class is defined, so that recalculating the state is
+        a single lookup.
     """
 
     __doc__ = __doc__ % basic_positioner_init
@@ -407,6 +516,78 @@ class PVStatePositioner(StatePositioner):
 
     _state_logic = {}
     _state_logic_mode = 'ALL'
+    _state_table = None
+
+    # Maximum number of value combinations to precompute
+    _max_state_table_size = 4096
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._state_table = cls._compile_state_logic()
+
+    @classmethod
+    def _compile_state_logic(cls):
+        """
+        Precompute the state for every combination of accounted values.
+
+        Returns
+        -------
+        table : dict or None
+            Mapping from a tuple of values, ordered like the `_state_logic`
+            keys, to the resulting state name. `None` if there are too many
+            combinations to precompute.
+        """
+
+        size = 1
+        for info in cls._state_logic.values():
+            size *= len(info)
+        if not cls._state_logic or size > cls._max_state_table_size:
+            return None
+        combos = itertools.product(*(info.keys()
+                                     for info in cls._state_logic.values()))
+        return {values: cls._evaluate_state_logic(values)
+                for values in combos}
+
+    @classmethod
+    def _evaluate_state_logic(cls, values):
+        """
+        Walk the `_state_logic` to find the state for a set of values.
+
+        Parameters
+        ----------
+        values : tuple
+            The value of each signal, ordered like the `_state_logic` keys.
+
+        Returns
+        -------
+        state : str
+            The resulting state name.
+        """
+
+        state_value = None
+        for info, value in zip(cls._state_logic.values(), values):
+            try:
+                signal_state = info[value]
+            # Handle unaccounted readbacks
+            except KeyError:
+                state_value = cls._unknown
+                break
+            # Associate readback with device state
+            if signal_state != 'defer':
+                if state_value:
+                    # Handle inconsistent readbacks
+                    if signal_state != state_value:
+                        state_value = cls._unknown
+                        break
+                else:
+                    # Set state to first non-deferred value
+                    state_value = signal_state
+                    if cls._state_logic_mode == 'ALL':
+                        continue
+                    elif cls._state_logic_mode == 'FIRST':
+                        break
+        # If all states deferred, report as unknown
+        return state_value or cls._unknown
 
     def __init__(self, prefix, *, name, **kwargs):
         if self.__class__ is PVStatePositioner:
@@ -448,12 +629,22 @@ class StateRecordPositionerBase(StatePositioner):
 
     def get_state(self, value):
         if not self._has_checked_state_enum:
-            # Add the real enum as the first alias
-            for enum_val, state in zip(self.state.enum_strs, self.states_list):
-                aliases = self._states_alias.get(state, [])
-                if isinstance(aliases, str):
-                    aliases = [aliases]
-                self._states_alias[state] = [enum_val] + aliases
+            # Add the real enum as the first alias, on a shared copy so that
+            # the class definition is left alone
+            enum_strs = tuple(self.state.enum_strs)
+            key = (type(self), enum_strs, tuple(self.states_list),
+                   _freeze_alias(self._states_alias))
+            try:
+                states_alias = _record_alias_cache[key]
+            except KeyError:
+                states_alias = dict(self._states_alias)
+                for enum_val, state in zip(enum_strs, self.states_list):
+                    aliases = states_alias.get(state, [])
+                    if isinstance(aliases, str):
+                        aliases = [aliases]
+                    states_alias[state] = [enum_val] + aliases
+                _record_alias_cache[key] = states_alias
+            self._states_alias = states_alias
             self.states_enum = self._create_states_enum()
             self._has_checked_state_enum = True
         return super().get_state(value)
@@ -545,23 +736,77 @@ class TwinCATStateConfigAll(Device):
 
     Designed to be used with the array of ``DUT_PositionState`` from
     ``FB_PositionStateManager``.
+
+    Every state position is a lazy component: its signals are not created or
+    connected until the state is first accessed. Use :meth:`read_state_table`
+    to read all of them at once.
     """
 
-    state01 = Cpt(TwinCATStateConfigOne, ':01', kind='omitted')
-    state02 = Cpt(TwinCATStateConfigOne, ':02', kind='omitted')
-    state03 = Cpt(TwinCATStateConfigOne, ':03', kind='omitted')
-    state04 = Cpt(TwinCATStateConfigOne, ':04', kind='omitted')
-    state05 = Cpt(TwinCATStateConfigOne, ':05', kind='omitted')
-    state06 = Cpt(TwinCATStateConfigOne, ':06', kind='omitted')
-    state07 = Cpt(TwinCATStateConfigOne, ':07', kind='omitted')
-    state08 = Cpt(TwinCATStateConfigOne, ':08', kind='omitted')
-    state09 = Cpt(TwinCATStateConfigOne, ':09', kind='omitted')
-    state10 = Cpt(TwinCATStateConfigOne, ':10', kind='omitted')
-    state11 = Cpt(TwinCATStateConfigOne, ':11', kind='omitted')
-    state12 = Cpt(TwinCATStateConfigOne, ':12', kind='omitted')
-    state13 = Cpt(TwinCATStateConfigOne, ':13', kind='omitted')
-    state14 = Cpt(TwinCATStateConfigOne, ':14', kind='omitted')
-    state15 = Cpt(TwinCATStateConfigOne, ':15', kind='omitted')
+    # Let read_state_table connect every state at the same time
+    lazy_wait_for_connection = False
+
+    # Field name and dtype for each TwinCATStateConfigOne signal
+    _state_table_fields = (('state_name', 'U'),
+                           ('setpoint', 'f8'),
+                           ('delta', 'f8'),
+                           ('velo', 'f8'),
+                           ('accl', 'f8'),
+                           ('dccl', 'f8'),
+                           ('move_ok', '?'),
+                           ('locked', '?'),
+                           ('valid', '?'))
+
+    state01 = Cpt(TwinCATStateConfigOne, ':01', kind='omitted', lazy=True)
+    state02 = Cpt(TwinCATStateConfigOne, ':02', kind='omitted', lazy=True)
+    state03 = Cpt(TwinCATStateConfigOne, ':03', kind='omitted', lazy=True)
+    state04 = Cpt(TwinCATStateConfigOne, ':04', kind='omitted', lazy=True)
+    state05 = Cpt(TwinCATStateConfigOne, ':05', kind='omitted', lazy=True)
+    state06 = Cpt(TwinCATStateConfigOne, ':06', kind='omitted', lazy=True)
+    state07 = Cpt(TwinCATStateConfigOne, ':07', kind='omitted', lazy=True)
+    state08 = Cpt(TwinCATStateConfigOne, ':08', kind='omitted', lazy=True)
+    state09 = Cpt(TwinCATStateConfigOne, ':09', kind='omitted', lazy=True)
+    state10 = Cpt(TwinCATStateConfigOne, ':10', kind='omitted', lazy=True)
+    state11 = Cpt(TwinCATStateConfigOne, ':11', kind='omitted', lazy=True)
+    state12 = Cpt(TwinCATStateConfigOne, ':12', kind='omitted', lazy=True)
+    state13 = Cpt(TwinCATStateConfigOne, ':13', kind='omitted', lazy=True)
+    state14 = Cpt(TwinCATStateConfigOne, ':14', kind='omitted', lazy=True)
+    state15 = Cpt(TwinCATStateConfigOne, ':15', kind='omitted', lazy=True)
+
+    def read_state_table(self, timeout=None):
+        """
+        Read the configuration of every state position in one batch.
+
+        All of the signals are connected together and then read in parallel,
+        rather than one round trip at a time.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait for all of the signals to connect. Defaults
+            to the device's connection timeout.
+
+        Returns
+        -------
+        table : ~numpy.ndarray
+            Structured array with one row per state position, in order, and
+            one field per `TwinCATStateConfigOne` signal.
+        """
+
+        fields = [field for field, _ in self._state_table_fields]
+        signals = [getattr(getattr(self, state), field)
+                   for state in self.component_names for field in fields]
+        if timeout is None:
+            self.wait_for_connection(all_signals=True)
+        else:
+            self.wait_for_connection(all_signals=True, timeout=timeout)
+        with ThreadPoolExecutor(max_workers=min(len(signals), 32)) as pool:
+            values = list(pool.map(lambda sig: sig.get(), signals))
+        rows = [tuple(values[i:i + len(fields)])
+                for i in range(0, len(values), len(fields))]
+        name_len = max(1, max(len(row[0]) for row in rows))
+        dtype = [(field, f'U{name_len}' if kind == 'U' else kind)
+                 for field, kind in self._state_table_fields]
+        return np.array(rows, dtype=dtype)
 
 
 class TwinCATStatePositioner(StatePositioner):
@@ -612,7 +857,7 @@ class TwinCATStatePositioner(StatePositioner):
     reset_cmd = Cpt(PytmcSignal, ':RESET', io='o', kind='config',
                     doc='Command to reset an error.')
 
-    config = Cpt(TwinCATStateConfigAll, '', kind='omitted',
+    config = Cpt(TwinCATStateConfigAll, '', kind='omitted', lazy=True,
                  doc='Configuration of state positions, deltas, etc.')
 
     set_metadata(error_id, dict(variety='scalar', display_format='hex'))
@@ -647,11 +892,12 @@ class StateStatus(SubscriptionStatus):
 
     def __init__(self, device, desired_state,
                  timeout=None, settle_time=None):
+        # Resolve the constant desired state once, not on every callback
+        desired = device.get_state(desired_state)
+
         # Make a quick check_state callable
         def check_state(*, value, **kwargs):
-            value = device.get_state(value)
-            desired = device.get_state(desired_state)
-            return value == desired
+            return device.get_state(value) == desired
 
         # Start timeout and subscriptions
         super().__init__(device, check_state, event_type=device.SUB_STATE,
@@ -664,3 +910,141 @@ class StateStatus(SubscriptionStatus):
     def set_exception(self, exc):
         self.device._done_moving(success=False)
         super().set_exception(exc)
+
+
+class MultiStateStatus(StatusBase):
+    """
+    `Status` produced by moving several state positioners at once.
+
+    This behaves like one `StateStatus` per device, but every device shares
+    the same ``SUB_STATE`` callback and the status has a single timeout
+    instead of one per device. Each device is marked done as soon as it
+    reaches its own state, and the status finishes when the last one does.
+
+    Parameters
+    ----------
+    moves : dict
+        Mapping of `StatePositioner` to requested state.
+
+    timeout : float, optional
+        The default timeout to wait to mark the request as a failure.
+
+    settle_time : float, optional
+        Time to wait after completion until running callbacks.
+
+    Attributes
+    ----------
+    results : dict
+        Mapping of each device to `True` if it has reached its requested
+        state, or `False` if it is still moving or the move failed.
+    """
+
+    def __init__(self, moves, timeout=None, settle_time=None):
+        self._desired = {device: device.get_state(state)
+                         for device, state in moves.items()}
+        self.devices = tuple(self._desired)
+        self.results = dict.fromkeys(self.devices, False)
+        self._remaining = len(self.devices)
+        self._results_lock = threading.Lock()
+        super().__init__(timeout=timeout, settle_time=settle_time)
+        if not self.devices:
+            self.set_finished()
+            return
+        for device in self.devices:
+            device.subscribe(self._state_changed,
+                             event_type=device.SUB_STATE, run=True)
+
+    def _state_changed(self, *, obj, value, **kwargs):
+        """Shared ``SUB_STATE`` callback for every device in the move."""
+        if obj.get_state(value) != self._desired[obj]:
+            return
+        with self._results_lock:
+            if self.done or self.results[obj]:
+                return
+            self.results[obj] = True
+            self._remaining -= 1
+            finished = not self._remaining
+        obj.clear_sub(self._state_changed, event_type=obj.SUB_STATE)
+        obj._done_moving(success=True)
+        if finished:
+            self.set_finished()
+
+    def _clear_subs(self):
+        for device in self.devices:
+            device.clear_sub(self._state_changed, event_type=device.SUB_STATE)
+
+    def set_finished(self, **kwargs):
+        self._clear_subs()
+        super().set_finished(**kwargs)
+
+    def _handle_failure(self):
+        # Called on both timeouts and set_exception
+        self._clear_subs()
+        with self._results_lock:
+            failed = [device for device, done in self.results.items()
+                      if not done]
+        for device in failed:
+            device._done_moving(success=False)
+        return super()._handle_failure()
+
+    def __repr__(self):
+        return ('{0}(done={1.done}, success={1.success}, devices={2})'
+                ''.format(self.__class__.__name__, self,
+                          [device.name for device in self.devices]))
+
+
+def move_states(moves, timeout=None, wait=False):
+    """
+    Move several state positioners at once and track them with one status.
+
+    Every requested state is checked before anything moves, then all of the
+    moves are issued back-to-back. This is much cheaper than calling
+    `StatePositioner.move` on each device, which creates a separate
+    subscription and timeout for every one of them.
+
+    Parameters
+    ----------
+    moves : dict
+        Mapping of `StatePositioner` to the enumerate state or the
+        corresponding integer to move it to.
+
+    timeout : int or float, optional
+        Move timeout in seconds. Defaults to the longest timeout of the
+        devices being moved.
+
+    wait : bool, optional
+        If `True`, do not return until every device has finished moving.
+
+    Returns
+    -------
+    status : MultiStateStatus
+        `Status` object that represents the progress of every move, with
+        per-device results available as ``status.results``.
+    """
+
+    states = {device: device.check_value(position)
+              for device, position in moves.items()}
+    logger.debug('set %s', {device.name: state.name
+                            for device, state in states.items()})
+
+    if timeout is None:
+        timeouts = [device._timeout for device in states
+                    if device._timeout is not None]
+        if timeouts:
+            timeout = max(timeouts)
+    settle_time = max((device._settle_time or 0 for device in states),
+                      default=0)
+
+    status = MultiStateStatus(states, timeout=timeout,
+                              settle_time=settle_time)
+    try:
+        for device, state in states.items():
+            device._do_move(state)
+            device._run_subs(sub_type=device.SUB_START)
+    except Exception as exc:
+        status.set_exception(exc)
+        raise
+
+    if wait:
+        status_wait(status)
+    return status
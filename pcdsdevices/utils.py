@@ -1,9 +1,13 @@
+import heapq
+import itertools
+import logging
 import os
 import select
 import shutil
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import ophyd
 import pint
@@ -15,6 +19,7 @@ except ImportError:
     tty = None
     termios = None
 
+logger = logging.getLogger(__name__)
 
 arrow_up = '\x1b[A'
 arrow_down = '\x1b[B'
@@ -160,7 +165,7 @@ def get_component(obj):
     return getattr(type(obj.parent), obj.attr_name, None)
 
 
-def schedule_task(func, args=None, kwargs=None, delay=None):
+def schedule_task(func, args=None, kwargs=None, delay=None, key=None):
     """
     Use ophyd's dispatcher to schedule a task for later.
 
@@ -168,6 +173,22 @@ def schedule_task(func, args=None, kwargs=None, delay=None):
     Schedules a task for the utility thread if we're in some arbitrary thread,
     schedules a task for the same thread if we're in one of ophyd's callback
     queues already.
+
+    Delayed tasks wait in the shared `TaskScheduler` rather than each
+    starting a thread.
+
+    Parameters
+    ----------
+    key : hashable, optional
+        For delayed tasks, merge this with a waiting task that has the same
+        key. The merged task runs at the earlier time with the newer
+        arguments. Only use this for tasks where a single late call does the
+        work of all of them, like a debounced recompute.
+
+    Returns
+    -------
+    task : ScheduledTask or None
+        For delayed tasks, a handle that can cancel the task.
     """
     if args is None:
         args = ()
@@ -177,26 +198,394 @@ def schedule_task(func, args=None, kwargs=None, delay=None):
     dispatcher = ophyd.cl.get_dispatcher()
 
     # Check if we're already in an ophyd dispatcher thread
-    current_thread = threading.currentThread()
-    matched_thread = None
+    current_thread = threading.current_thread()
+    context = None
     for name, thread in dispatcher.threads.items():
         if thread == current_thread:
-            matched_thread = name
-            context = dispatcher.get_thread_context(matched_thread)
+            context = dispatcher.get_thread_context(name)
             break
 
-    def schedule():
-        if matched_thread is None:
-            # Put into utility queue
-            dispatcher.schedule_utility_task(func, *args, **kwargs)
-        else:
-            # Put into same queue
-            context.event_thread.queue.put((func, args, kwargs))
-
     if delay is None:
         # Do it right away
-        schedule()
+        _dispatch_task(dispatcher, context, func, args, kwargs)
+        return None
+    # Do it later
+    return get_scheduler().call_later(
+        delay, _dispatch_task, args=(dispatcher, context, func, args, kwargs),
+        key=key)
+
+
+def _dispatch_task(dispatcher, context, func, args, kwargs):
+    if context is None:
+        # Put into utility queue
+        dispatcher.schedule_utility_task(func, *args, **kwargs)
     else:
-        # Do it later
-        timer = threading.Timer(delay, schedule)
-        timer.start()
+        # Put into same queue
+        context.event_thread.queue.put((func, args, kwargs))
+
+
+class ScheduledTask:
+    """
+    Handle for a function call waiting in a `TaskScheduler`.
+
+    Attributes
+    ----------
+    when : float
+        The `time.monotonic` time the call is due.
+    """
+
+    __slots__ = ('when', '_seq', 'func', 'args', 'kwargs', 'key',
+                 'cancelled', 'started', '_scheduler')
+
+    def __init__(self, scheduler, when, seq, func, args, kwargs, key):
+        self._scheduler = scheduler
+        self.when = when
+        self._seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.cancelled = False
+        self.started = False
+
+    def __lt__(self, other):
+        return (self.when, self._seq) < (other.when, other._seq)
+
+    def cancel(self):
+        """
+        Do not run the call if it has not started yet.
+
+        Does nothing if the call has already started or run.
+        """
+        self._scheduler._cancel(self)
+
+
+class TaskScheduler:
+    """
+    Run function calls at later times from a single thread.
+
+    The calls wait in a heap ordered by due time, so any number of them
+    share one thread. The calls run in the scheduler thread and should be
+    quick.
+
+    Calls scheduled with a ``key`` are coalesced: while one is waiting,
+    scheduling another with the same key replaces its arguments, and moves
+    it earlier if the new call is due first.
+
+    Slower work can be handed to `submit`, which runs it in a small pool of
+    delivery threads that belong to this scheduler.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name for the scheduler thread and prefix for the delivery threads.
+
+    delivery_workers : int, optional
+        The most `submit` calls to run at once.
+    """
+
+    def __init__(self, name='pcdsdevices_scheduler', delivery_workers=4):
+        self.name = name
+        self.delivery_workers = delivery_workers
+        self._executor = None
+        self._heap = []
+        self._keyed = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._queue_depth = 0
+        self._num_run = 0
+        self._num_coalesced = 0
+        self._num_cancelled = 0
+        self._total_lateness = 0.
+        self._max_lateness = 0.
+
+    def call_later(self, delay, func, args=(), kwargs=None, key=None):
+        """
+        Call ``func(*args, **kwargs)`` after ``delay`` seconds.
+
+        Parameters
+        ----------
+        delay : float
+            Seconds to wait.
+
+        func : callable
+            The function to call.
+
+        args : tuple, optional
+            Positional arguments for the call.
+
+        kwargs : dict, optional
+            Keyword arguments for the call.
+
+        key : hashable, optional
+            Merge this with any waiting call that has the same key.
+
+        Returns
+        -------
+        task : ScheduledTask
+            Handle that can cancel the call.
+        """
+
+        if kwargs is None:
+            kwargs = {}
+        with self._cond:
+            if key is not None:
+                task = self._keyed.get(key)
+                if task is not None:
+                    task.func = func
+                    task.args = args
+                    task.kwargs = kwargs
+                    self._num_coalesced += 1
+                    when = time.monotonic() + delay
+                    if when < task.when:
+                        task.when = when
+                        heapq.heapify(self._heap)
+                        if self._heap[0] is task:
+                            self._cond.notify()
+                    return task
+            task = ScheduledTask(self, time.monotonic() + delay,
+                                 next(self._seq), func, args, kwargs, key)
+            heapq.heappush(self._heap, task)
+            self._queue_depth += 1
+            if key is not None:
+                self._keyed[key] = task
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name=self.name, daemon=True)
+                self._thread.start()
+            elif self._heap[0] is task:
+                # Due before everything else, wake up early
+                self._cond.notify()
+        return task
+
+    def submit(self, func, args=(), kwargs=None):
+        """
+        Call ``func(*args, **kwargs)`` soon in a delivery thread.
+
+        Unlike ophyd's utility thread, the delivery threads are only used by
+        this scheduler, so other ophyd callbacks cannot hold these calls up.
+        """
+
+        if kwargs is None:
+            kwargs = {}
+        with self._cond:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.delivery_workers,
+                    thread_name_prefix=self.name + '_delivery')
+        self._executor.submit(self._call, func, args, kwargs)
+
+    def _call(self, func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Error in scheduled task %s', func)
+
+    def _forget(self, task):
+        """Remove bookkeeping for a task leaving the queue."""
+        self._queue_depth -= 1
+        if task.key is not None and self._keyed.get(task.key) is task:
+            del self._keyed[task.key]
+
+    def _cancel(self, task):
+        with self._cond:
+            if not task.cancelled and not task.started:
+                task.cancelled = True
+                self._num_cancelled += 1
+                self._forget(task)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._heap:
+                        timeout = self._heap[0].when - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._cond.wait(timeout)
+                task = heapq.heappop(self._heap)
+                if task.cancelled:
+                    continue
+                task.started = True
+                self._forget(task)
+                lateness = time.monotonic() - task.when
+                self._num_run += 1
+                self._total_lateness += lateness
+                self._max_lateness = max(self._max_lateness, lateness)
+            self._call(task.func, task.args, task.kwargs)
+
+    def metrics(self):
+        """
+        Statistics about the scheduled calls.
+
+        Returns
+        -------
+        metrics : dict
+            ``queue_depth`` is the number of calls waiting, ``run``,
+            ``coalesced`` and ``cancelled`` count calls so far, and
+            ``mean_lateness`` and ``max_lateness`` are how many seconds
+            after their due time the calls started.
+        """
+
+        with self._cond:
+            return dict(
+                queue_depth=self._queue_depth,
+                run=self._num_run,
+                coalesced=self._num_coalesced,
+                cancelled=self._num_cancelled,
+                mean_lateness=(self._total_lateness / self._num_run
+                               if self._num_run else 0.),
+                max_lateness=self._max_lateness,
+            )
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the shared `TaskScheduler`, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TaskScheduler()
+        return _scheduler
+
+
+class RateLimitedCallback:
+    """
+    Wrapper that runs an ophyd callback at most ``max_rate`` times a second.
+
+    Events that arrive faster are coalesced: each delivery uses the latest
+    event, and the events it replaced are counted in ``dropped``. Deliveries
+    are timed by the shared `TaskScheduler` and run in its delivery threads,
+    never in the thread that produced the event or in ophyd's callback
+    threads. There is at most one delivery pending or running per callback,
+    so a slow callback only sees fewer events rather than backing up the
+    callback queues. Nothing is delivered after `unsubscribe`.
+
+    Use `subscribe_rate_limited` to create these.
+
+    Parameters
+    ----------
+    callback : callable
+        The callback to wrap.
+
+    max_rate : float
+        The most calls per second.
+
+    Attributes
+    ----------
+    delivered : int
+        The number of events passed on to the callback.
+
+    dropped : int
+        The number of events replaced by a newer one before delivery.
+    """
+
+    def __init__(self, callback, max_rate):
+        self.callback = callback
+        self.max_rate = max_rate
+        self.delivered = 0
+        self.dropped = 0
+        self.obj = None
+        self.cid = None
+        self._period = 1 / max_rate
+        self._lock = threading.Lock()
+        self._pending = None
+        self._task = None
+        self._busy = False
+        self._unsubscribed = False
+        self._last_delivery = -float('inf')
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            if self._unsubscribed:
+                return
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (args, kwargs)
+            if self._task is None and not self._busy:
+                self._schedule()
+
+    def _schedule(self):
+        delay = max(0, self._last_delivery + self._period - time.monotonic())
+        self._task = get_scheduler().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        with self._lock:
+            self._task = None
+            self._busy = True
+        get_scheduler().submit(self._deliver)
+
+    def _deliver(self):
+        with self._lock:
+            if self._pending is None:
+                # Unsubscribed since the delivery was scheduled
+                self._busy = False
+                return
+            args, kwargs = self._pending
+            self._pending = None
+            self._last_delivery = time.monotonic()
+        try:
+            self.callback(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.delivered += 1
+                self._busy = False
+                if self._pending is not None:
+                    self._schedule()
+
+    def unsubscribe(self):
+        """Remove the subscription and cancel any pending delivery."""
+        if self.obj is not None:
+            self.obj.unsubscribe(self.cid)
+        with self._lock:
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+            self._pending = None
+            self._unsubscribed = True
+
+
+def subscribe_rate_limited(obj, callback, max_rate, event_type=None,
+                           run=True):
+    """
+    Subscribe to an ophyd signal or device at a bounded callback rate.
+
+    This is for monitors that update at beam rate when the subscriber only
+    needs the latest value every so often, such as a display. See
+    `RateLimitedCallback` for how events are coalesced.
+
+    Parameters
+    ----------
+    obj : OphydObject
+        The signal or device to subscribe to.
+
+    callback : callable
+        The callback, with the usual ophyd signature.
+
+    max_rate : float
+        The most calls per second.
+
+    event_type : str, optional
+        The subscription type, defaults to the object's default.
+
+    run : bool, optional
+        If `True`, send the current value right away as usual.
+
+    Returns
+    -------
+    rate_limited : RateLimitedCallback
+        The subscribed wrapper, with the subscription id as ``cid``, drop
+        counters, and an ``unsubscribe`` method.
+    """
+
+    rate_limited = RateLimitedCallback(callback, max_rate)
+    rate_limited.obj = obj
+    rate_limited.cid = obj.subscribe(rate_limited, event_type=event_type,
+                                     run=run)
+    return rate_limited
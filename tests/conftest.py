@@ -11,6 +11,7 @@ from ophyd.sim import FakeEpicsSignal, make_fake_device
 from pcdsdevices.attenuator import (MAX_FILTERS, Attenuator, _att3_classes,
                                     _att_classes)
 from pcdsdevices.mv_interface import setup_preset_paths
+from pcdsdevices.sim import FastMotor
 
 # Signal.put warning is a testing artifact.
 # FakeEpicsSignal needs an update, but I don't have time today
@@ -32,6 +33,11 @@ for name, cls in _att3_classes.items():
 
 
 # Used in multiple test files
+@pytest.fixture(scope='function')
+def fast_motor():
+    return FastMotor(name='sim_fast')
+
+
 @pytest.fixture(scope='function')
 def fake_att():
     att = Attenuator('TST:ATT', MAX_FILTERS-1, name='test_att')
@@ -3,12 +3,16 @@ import threading
 import time
 from unittest.mock import Mock
 
+import numpy as np
 import pytest
 from ophyd.sim import make_fake_device
 from ophyd.status import wait as status_wait
 
 from pcdsdevices.attenuator import (MAX_FILTERS, AttBase, Attenuator,
-                                    _att3_classes, _att_classes)
+                                    AttenuatorGroup, FEESolidAttenuator,
+                                    TransmissionCalculator, _att3_classes,
+                                    _att_classes, config_to_index,
+                                    index_to_config)
 
 logger = logging.getLogger(__name__)
 
@@ -52,10 +56,33 @@ def fake_move_transition(att, status, goal):
     assert status.success
 
 
+def simulate_calc(att, ceil=None, floor=None, delay=None):
+    """
+    Have the fake IOC calculate the transmission for each new setpoint, after
+    delay seconds if given
+    """
+    def calc():
+        att.calcpend.sim_put(1)
+        if ceil is not None:
+            att.trans_ceil.sim_put(ceil)
+        if floor is not None:
+            att.trans_floor.sim_put(floor)
+        att.calcpend.sim_put(0)
+
+    def start_calc(*args, **kwargs):
+        if delay is None:
+            calc()
+        else:
+            threading.Timer(delay, calc).start()
+
+    att.setpoint.subscribe(start_calc, run=False)
+
+
 @pytest.mark.timeout(5)
 def test_attenuator_motion(fake_att):
     logger.debug('test_attenuator_motion')
     att = fake_att
+    simulate_calc(att)
     # Set up the ceil and floor
     att.trans_ceil.sim_put(0.8001)
     att.trans_floor.sim_put(0.5001)
@@ -122,6 +149,23 @@ def test_attenuator_calcpend(fake_att):
     assert time.time() - start >= 1
 
 
+@pytest.mark.timeout(5)
+def test_attenuator_async_calc(fake_att):
+    logger.debug('test_attenuator_async_calc')
+    att = fake_att
+    # Results of the last calculation, which pick the floor for 0.5
+    att.trans_ceil.sim_put(0.9)
+    att.trans_floor.sim_put(0.2)
+    simulate_calc(att, ceil=0.5001, floor=0.1, delay=0.1)
+    att.calcpend.get = Mock(wraps=att.calcpend.get)
+    status = att.move(0.5, wait=False)
+    # The GO value comes from the new calculation, which picks the ceiling
+    assert att.actuate.get() == 3
+    # Waiting on the monitor does not poll the calcpend PV
+    assert not att.calcpend.get.called
+    fake_move_transition(att, status, 0.5001)
+
+
 @pytest.mark.timeout(5)
 def test_attenuator_set_energy(fake_att):
     logger.debug('test_attenuator_set_energy')
@@ -154,6 +198,145 @@ def test_attenuator_staging(fake_att):
         assert filt.removed
 
 
+def test_transmission_calculator():
+    logger.debug('test_transmission_calculator')
+    calc = TransmissionCalculator([10, 20, 40, 80], ['Si'] * 4)
+    energy = 8000
+    blades = calc.blade_transmissions(energy)
+    assert np.all((blades > 0) & (blades < 1))
+    # Thicker blades attenuate exponentially more
+    assert np.isclose(blades[1], blades[0]**2)
+
+    table = calc.all_transmissions(energy)
+    assert len(table) == 2**4
+    assert table[0] == 1
+    for index in range(2**4):
+        config = index_to_config(index, 4)
+        assert config_to_index(config) == index
+        assert np.isclose(table[index], np.prod(blades[config]))
+        assert np.isclose(table[index], calc.transmission(config, energy))
+
+    # Vector of targets compared with brute force
+    targets = np.linspace(0, 1, 500)
+    configs, trans = calc.find_configuration(targets, energy)
+    assert configs.shape == (500, 4)
+    for target, config, value in zip(targets, configs, trans):
+        assert np.isclose(value, calc.transmission(config, energy))
+        assert np.isclose(abs(value - target), np.min(np.abs(table - target)))
+
+    # Scalar targets and modes
+    config, value = calc.find_configuration(0.5, energy, mode='ceil')
+    assert config.shape == (4,)
+    assert value == np.min(table[table >= 0.5])
+    _, value = calc.find_configuration(0.5, energy, mode='floor')
+    assert value == np.max(table[table <= 0.5])
+    _, value = calc.find_configuration(2, energy, mode='floor')
+    assert value == 1
+    with pytest.raises(ValueError):
+        calc.find_configuration(0.5, energy, mode='cats')
+
+
+def test_attenuator_find_configuration(fake_att):
+    logger.debug('test_attenuator_find_configuration')
+    att = fake_att
+    for filt in att.filters:
+        filt.material.put('Si')
+    config, trans = att.find_configuration([0.1, 0.5], energy=9500)
+    assert config.shape == (2, len(att.filters))
+    calc = att.get_calculator()
+    assert calc is att.get_calculator()
+    assert calc is not att.get_calculator(refresh=True)
+    assert np.allclose(trans, calc.transmission(config, 9500))
+
+
+def make_small_att(name, thicknesses, energy):
+    att = Attenuator('TST:' + name.upper(), len(thicknesses), name=name)
+    att.energy.sim_put(energy)
+    att.readback.sim_put(1)
+    for filt, thick in zip(att.filters, thicknesses):
+        filt.state.put('OUT')
+        filt.thickness.put(thick)
+        filt.material.put('Si')
+    return att
+
+
+@pytest.fixture(scope='function')
+def att_group():
+    att1 = make_small_att('att1', [10, 20, 40, 80], 8000)
+    att2 = make_small_att('att2', [15, 30, 60, 120, 240], 8000)
+    return AttenuatorGroup(att1, att2, name='att_group')
+
+
+def test_attenuator_group_search(att_group):
+    logger.debug('test_attenuator_group_search')
+    group = att_group
+    att1, att2 = group.attenuators
+    assert group.position == att1.position * att2.position
+    table1 = att1.get_calculator().all_transmissions(8000)
+    table2 = att2.get_calculator().all_transmissions(8000)
+    joint = np.multiply.outer(table1, table2)
+    current = [[True, False, True, False],
+               [False, True, False, False, True]]
+    cur1, cur2 = (config_to_index(config) for config in current)
+    moved = np.add.outer([bin(i ^ cur1).count('1') for i in range(16)],
+                         [bin(i ^ cur2).count('1') for i in range(32)])
+    for target in (0.9, 0.5, 0.1, 0.01, 1e-4):
+        configs, trans = group.find_configuration(target, current=current)
+        index = (config_to_index(configs[0]), config_to_index(configs[1]))
+        assert np.isclose(trans, joint[index])
+        # Compare with brute force over the joint space
+        tol = max(np.min(np.abs(joint - target)), group.tolerance * target)
+        ok = np.abs(joint - target) <= tol + 1e-12
+        assert ok[index]
+        assert moved[index] == np.min(moved[ok])
+
+
+def test_attenuator_group_plan(att_group):
+    logger.debug('test_attenuator_group_plan')
+    group = att_group
+    targets = np.geomspace(1, 1e-3, 20)
+    configs, trans = group.plan_configurations(targets)
+    assert len(configs) == 20
+    assert np.allclose(trans, targets, rtol=0.5)
+    # Staying put costs no moves
+    configs, trans = group.plan_configurations([trans[-1], trans[-1]])
+    for att_old, att_new in zip(*configs):
+        assert np.all(att_old == att_new)
+
+
+@pytest.mark.timeout(5)
+def test_attenuator_group_move(att_group):
+    logger.debug('test_attenuator_group_move')
+    group = att_group
+    configs, trans = group.find_configuration(0.05)
+    cb = Mock()
+    status = group.move(0.05, wait=True, timeout=1, moved_cb=cb)
+    assert status.done and status.success
+    assert cb.called
+    for att, config in zip(group.attenuators, configs):
+        assert [filt.inserted for filt in att.filters] == list(config)
+    # Nothing to move
+    status = group.move(trans, wait=True)
+    assert status.done
+    with pytest.raises(ValueError):
+        group.move(2)
+    group.stop()
+
+
+def test_attenuator_group_subscriptions(att_group):
+    logger.debug('test_attenuator_group_subscriptions')
+    group = att_group
+    att1, att2 = group.attenuators
+    cb = Mock()
+    group.subscribe(cb, run=False)
+    att1.filters[0].state.put('IN')
+    assert cb.call_count == 1
+    assert cb.call_args[1]['value'] == group.position
+    att2.readback.sim_put(0.5)
+    assert cb.call_count == 2
+    assert cb.call_args[1]['value'] == att1.position * 0.5
+
+
 def test_attenuator_third_harmonic():
     logger.debug('test_attenuator_third_harmonic')
     att = Attenuator('TRD:ATT', MAX_FILTERS-1, name='third', use_3rd=True)
@@ -163,3 +346,96 @@ def test_attenuator_third_harmonic():
 @pytest.mark.timeout(5)
 def test_attenuator_disconnected():
     AttBase('TST:ATT', name='test_att')
+
+
+@pytest.fixture(scope='function')
+def fake_solid_att():
+    FakeSolidAtt = make_fake_device(FEESolidAttenuator)
+    materials = ['C'] * 9 + ['Si'] * 9 + [None]
+    thicknesses = [2**i for i in range(9)] * 2 + [0]
+    att = FakeSolidAtt('AT2L0:XTES', name='at2l0', materials=materials,
+                       thicknesses=thicknesses)
+    att.energy.put(10000)
+    for blade in att.blades:
+        blade.user_readback.sim_put(20)
+    return att
+
+
+def test_fee_solid_attenuator_transmission(fake_solid_att):
+    logger.debug('test_fee_solid_attenuator_transmission')
+    att = fake_solid_att
+    assert att.removed
+    assert att.transmission == 1
+    calc = att._calculator
+    config = np.zeros(18, dtype=bool)
+    for blade in (0, 5, 12):
+        att.blades[blade].user_readback.sim_put(0)
+        config[blade] = True
+        assert att.inserted
+        assert np.isclose(att.transmission, calc.transmission(config, 10000))
+    assert att.num_in.get() == 3
+    # Energy changes update the transmission
+    att.energy.put(20000)
+    assert np.isclose(att.transmission, calc.transmission(config, 20000))
+    # The inspection mirror blocks the beam
+    att.blade_19.user_readback.sim_put(0)
+    assert att.transmission == 0
+    att.blade_19.user_readback.sim_put(20)
+    assert att.transmission > 0
+
+    targets = [0.01, 0.5]
+    config, trans = att.find_configuration(targets)
+    assert config.shape == (2, 19)
+    assert not config[:, 18].any()
+    assert np.allclose(trans, calc.transmission(config[:, :18], 20000))
+
+
+def test_fee_solid_attenuator_no_config():
+    logger.debug('test_fee_solid_attenuator_no_config')
+    FakeSolidAtt = make_fake_device(FEESolidAttenuator)
+    att = FakeSolidAtt('AT2L0:XTES', name='at2l0')
+    for blade in att.blades:
+        blade.user_readback.sim_put(20)
+    assert att.transmission == 1
+    att.blade_01.user_readback.sim_put(0)
+    assert att.transmission == 0
+    with pytest.raises(RuntimeError):
+        att.find_configuration(0.5)
+
+
+def test_fee_solid_attenuator_debounce(fake_solid_att):
+    logger.debug('test_fee_solid_attenuator_debounce')
+    att = fake_solid_att
+    att.lightpath_debounce = 0.05
+    states = []
+    att.subscribe(lambda **kwargs: states.append(att.transmission),
+                  event_type=att.SUB_STATE, run=False)
+    # A burst of blade moves is one recompute and one state update
+    for blade in att.blades[:10]:
+        blade.user_readback.sim_put(0)
+    time.sleep(0.2)
+    assert len(states) == 1
+    assert att.num_in.get() == 10
+    assert states[0] == att.transmission < 1
+    # Updates that do not change the state do not fire
+    att.blade_01.user_readback.sim_put(0.5)
+    time.sleep(0.2)
+    assert len(states) == 1
+    att.blade_01.user_readback.sim_put(20)
+    time.sleep(0.2)
+    assert len(states) == 2
+
+
+def test_fee_solid_attenuator_repeated_updates(fake_solid_att):
+    logger.debug('test_fee_solid_attenuator_repeated_updates')
+    att = fake_solid_att
+    calc = att._calculator
+    att.blade_01.user_readback.sim_put(0)
+    # The running counts do not drift over many updates
+    for i in range(1000):
+        att.blade_03.user_readback.sim_put(20 * (i % 2))
+    assert att.num_in.get() == 1
+    assert att.num_out.get() == 18
+    config = np.zeros(18, dtype=bool)
+    config[0] = True
+    assert np.isclose(att.transmission, calc.transmission(config, 10000))
@@ -1,9 +1,11 @@
 import logging
+import time
 
+import numpy as np
 import pytest
 from ophyd.sim import make_fake_device
 
-from pcdsdevices.beam_stats import BeamStats
+from pcdsdevices.beam_stats import BeamStats, SxrGmd
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +43,74 @@ def test_beam_stats_avg(fake_beam_stats):
 
     assert cfg['beam_stats_mj_buffersize']['value'] == 20
 
+    # The buffer can not hold more shots than its capacity
+    with pytest.raises(ValueError):
+        stats.mj_buffersize.put(stats.mj_buffer.capacity + 1)
+    assert stats.mj_buffersize.get() == 20
+
 
 @pytest.mark.timeout(5)
 def test_beam_stats_disconnected():
     BeamStats()
+
+
+def test_beam_stats_windows(fake_beam_stats):
+    logger.debug('test_beam_stats_windows')
+    stats = fake_beam_stats
+    buffer_bytes = stats.mj_buffer._values.nbytes
+    now = time.time()
+    # Two minutes of 120 Hz beam, ramping up by 1 mJ per second
+    for i in range(120 * 120):
+        stats.mj_buffer.append(i / 120, timestamp=now + i / 120)
+    last = (120 * 120 - 1) / 120
+    assert np.isclose(stats.mj_avg.get(), np.mean(last - np.arange(120) / 120))
+    assert np.isclose(stats.mj_avg_1s.get(), last - 0.5 + 1 / 240)
+    assert np.isclose(stats.mj_avg_10s.get(), last - 5 + 1 / 240)
+    assert np.isclose(stats.mj_avg_60s.get(), last - 30 + 1 / 240)
+    # Any number of windows share the same fixed buffer
+    windows = [stats.add_mj_window(shots=shots) for shots in range(1, 101)]
+    assert stats.mj_buffer._values.nbytes == buffer_bytes
+    assert windows[9].stats.count == 10
+    assert windows[9].stats.max == last
+
+
+def test_beam_stats_updates(fake_beam_stats):
+    logger.debug('test_beam_stats_updates')
+    stats = fake_beam_stats
+    num_updates = 5000
+    values = np.arange(num_updates) % 10
+    now = time.time()
+    for i, value in enumerate(values):
+        stats._mj_changed(value=float(value), timestamp=now + i / 120)
+    # Every update is within the last minute, plus the fixture's value
+    assert stats.mj_avg_60s.window.stats.count == num_updates + 1
+    assert np.isclose(stats.mj_avg_1s.get(), np.mean(values[-120:]))
+    assert np.isclose(stats.mj_avg_10s.get(), np.mean(values[-1200:]))
+    assert np.isclose(stats.mj_avg.get(), np.mean(values[-120:]))
+
+
+def test_beam_stats_windows_expire():
+    logger.debug('test_beam_stats_windows_expire')
+    FakeStats = make_fake_device(BeamStats)
+    stats = FakeStats()
+    now = time.time()
+    # The beam stopped 30 seconds ago
+    for i in range(120):
+        stats.mj_buffer.append(1.0, timestamp=now - 31 + i / 120)
+    assert np.isnan(stats.mj_avg_1s.get())
+    assert np.isnan(stats.mj_avg_10s.get())
+    assert stats.mj_avg_60s.get() == 1.0
+    assert stats.mj_avg_60s.window.stats.count == 120
+    assert stats.read()['beam_stats_mj_avg_10s']['value'] != 1.0
+    # The shot window keeps the last shots no matter how old
+    assert stats.mj_avg.get() == 1.0
+
+
+def test_sxr_gmd_windows():
+    logger.debug('test_sxr_gmd_windows')
+    FakeGmd = make_fake_device(SxrGmd)
+    gmd = FakeGmd()
+    for i in range(10):
+        gmd.mj.sim_put(i)
+    assert gmd.mj_avg_1s.get() == np.mean(range(10))
+    gmd.read()
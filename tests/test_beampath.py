@@ -0,0 +1,197 @@
+import logging
+import random
+from types import SimpleNamespace
+
+import pytest
+from ophyd.ophydobj import OphydObject
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.beampath import BeamPath, ProductTree
+from pcdsdevices.lodcm import H1N, LODCM, Dectris, Foil, YagLom
+
+logger = logging.getLogger(__name__)
+
+
+class SimBlocker(OphydObject):
+    SUB_STATE = 'state'
+    _default_sub = SUB_STATE
+
+    def __init__(self, name, beamline, z, transmission=0.0):
+        super().__init__(name=name)
+        self.md = SimpleNamespace(name=name, beamline=beamline, z=z,
+                                  lightpath=True)
+        self._inserted = False
+        self._transmission = transmission
+
+    @property
+    def inserted(self):
+        return self._inserted
+
+    @property
+    def removed(self):
+        return not self._inserted
+
+    @property
+    def transmission(self):
+        return self._transmission
+
+    def set_inserted(self, inserted):
+        self._inserted = inserted
+        self._run_subs(sub_type=self.SUB_STATE, obj=self)
+
+
+class SimBranch(SimBlocker):
+    def __init__(self, name, beamline, z, branches):
+        super().__init__(name, beamline, z, transmission=1.0)
+        self.branches = branches
+        self.destination = [beamline]
+
+    def set_destination(self, destination):
+        self.destination = destination
+        self._run_subs(sub_type=self.SUB_STATE, obj=self)
+
+
+def make_beamline(num_devices):
+    """
+    Simulated beamlines: MAIN continues to XCS, a mirror sends beam from MAIN
+    to XPP and a monochromator sends beam from XPP to MONO.
+    """
+    mirror = SimBranch('mirror', 'MAIN', 100, ['MAIN', 'XPP'])
+    mono = SimBranch('mono', 'XPP', 200, ['XPP', 'MONO'])
+    devices = [mirror, mono]
+    lines = {'MAIN': (0, 300), 'XPP': (100, 300), 'MONO': (200, 300)}
+    rng = random.Random(0)
+    for i in range(num_devices - len(devices)):
+        line = rng.choice(sorted(lines))
+        z = rng.uniform(*lines[line])
+        transmission = rng.choice([0.0, 0.05, 0.5, 0.9])
+        devices.append(SimBlocker(f'dev{i}', line, z, transmission))
+    return devices
+
+
+def naive_blocking(path, target):
+    """Check every device on the path, like reading them all from EPICS."""
+    blocking = []
+    transmission = 1.0
+    route = path.routes[target]
+    for device, line in zip(route.devices, route.lines):
+        if line is not None:
+            if line not in device.destination:
+                blocking.append(device)
+                transmission = 0.0
+        elif device.inserted:
+            transmission *= device.transmission
+            if device.transmission < path.minimum_transmission:
+                blocking.append(device)
+    return blocking, transmission
+
+
+def test_product_tree():
+    logger.debug('test_product_tree')
+    values = [0.5, 0.9, 1.0, 0.1, 0.7]
+    tree = ProductTree(len(values))
+    for i, value in enumerate(values):
+        tree[i] = value
+    for stop in range(len(values) + 1):
+        expected = 1.0
+        for value in values[:stop]:
+            expected *= value
+        assert tree.prefix(stop) == pytest.approx(expected)
+    assert tree.total == pytest.approx(tree.prefix(len(values)))
+    tree[3] = 0
+    assert tree.total == 0
+    assert tree.prefix(3) == pytest.approx(0.45)
+
+
+def test_beam_path_routes():
+    logger.debug('test_beam_path_routes')
+    mirror = SimBranch('mirror', 'MAIN', 100, ['MAIN', 'XPP'])
+    upstream = SimBlocker('upstream', 'MAIN', 50, transmission=0.5)
+    main = SimBlocker('main', 'MAIN', 150)
+    xpp = SimBlocker('xpp', 'XPP', 120)
+    skipped = SimBlocker('skipped', 'XPP', 130)
+    skipped.md.lightpath = False
+    path = BeamPath([main, xpp, mirror, upstream, skipped])
+
+    assert path.destinations == ['MAIN', 'XPP']
+    assert path.path('MAIN') == [upstream, mirror, main]
+    assert path.path('XPP') == [upstream, mirror, xpp]
+    assert path.path('xpp') == [upstream, mirror]
+    assert path.first_blocking('MAIN') is None
+    # The mirror sends beam down MAIN
+    assert path.first_blocking('XPP') is mirror
+    assert path.transmission('XPP') == 0
+
+    mirror.set_destination(['XPP'])
+    assert path.first_blocking('XPP') is None
+    assert path.first_blocking('MAIN') is mirror
+
+    xpp.set_inserted(True)
+    upstream.set_inserted(True)
+    assert path.blocking_devices('XPP') == [xpp]
+    assert path.first_blocking(xpp) is None
+    assert path.transmission('xpp') == 0.5
+    assert path.transmission('XPP') == 0
+    # Partial transmission does not block the beam
+    main.set_inserted(False)
+    mirror.set_destination(['MAIN', 'XPP'])
+    assert path.first_blocking('MAIN') is None
+    assert path.transmission('MAIN') == 0.5
+
+    path.unsubscribe_all()
+    mirror.set_destination([])
+    assert path.first_blocking('MAIN') is None
+    path.refresh('mirror')
+    assert path.first_blocking('MAIN') is mirror
+
+    with pytest.raises(KeyError):
+        path.first_blocking('MFX')
+
+
+def test_beam_path_lodcm():
+    logger.debug('test_beam_path_lodcm')
+    FakeLODCM = make_fake_device(LODCM)
+    lodcm = FakeLODCM('FAKE:LOM', name='lom', main_line='XCS',
+                      mono_line='XPP')
+    lodcm.h1n.state.sim_set_enum_strs(['Unknown'] + H1N.states_list)
+    lodcm.h1n.state.sim_put(1)
+    lodcm.yag.state.sim_set_enum_strs(['Unknown'] + YagLom.states_list)
+    lodcm.yag.state.sim_put(1)
+    lodcm.dectris.state.sim_set_enum_strs(['Unknown'] + Dectris.states_list)
+    lodcm.dectris.state.sim_put(1)
+    lodcm.foil.state.sim_set_enum_strs(['Unknown'] + Foil.states_list)
+    lodcm.foil.state.sim_put(1)
+    lodcm.md = SimpleNamespace(beamline='XCS', z=100, lightpath=True)
+    xpp = SimBlocker('xpp', 'XPP', 120)
+    path = BeamPath([lodcm, xpp])
+
+    assert path.path('XPP') == [lodcm, xpp]
+    assert path.first_blocking('XPP') is lodcm
+    lodcm.h1n.state.sim_put('Si')
+    assert path.first_blocking('XPP') is None
+    assert path.first_blocking('XCS') is lodcm
+    lodcm.yag.state.sim_put('YAG')
+    assert path.first_blocking('XPP') is lodcm
+
+
+def test_beam_path_random_updates():
+    logger.debug('test_beam_path_random_updates')
+    devices = make_beamline(200)
+    path = BeamPath(devices)
+    rng = random.Random(1)
+    for i in range(500):
+        device = rng.choice(devices)
+        if isinstance(device, SimBranch):
+            device.set_destination(rng.choice([[], ['MAIN'], device.branches,
+                                               device.branches[1:]]))
+        else:
+            device.set_inserted(not device.inserted)
+        if i % 50:
+            continue
+        # The incremental state matches walking the whole path
+        for line in ('MAIN', 'XPP', 'MONO'):
+            blocking, transmission = naive_blocking(path, line)
+            assert path.blocking_devices(line) == blocking
+            assert path.first_blocking(line) is (blocking[0] if blocking
+                                                 else None)
+            assert path.transmission(line) == pytest.approx(transmission)
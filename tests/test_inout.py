@@ -1,4 +1,6 @@
 import logging
+import time
+import tracemalloc
 from unittest.mock import Mock
 
 import pytest
@@ -6,6 +8,7 @@ from ophyd.sim import make_fake_device
 
 from pcdsdevices.inout import (InOutPositioner, InOutPVStatePositioner,
                                InOutRecordPositioner, TwinCATInOutPositioner)
+from pcdsdevices.state import MultiStateStatus, StateStatus, move_states
 
 logger = logging.getLogger(__name__)
 
@@ -90,3 +93,105 @@ def test_in_if_not_out(fake_tcinout):
     fake_tcinout.state.sim_put(2)
     assert fake_tcinout.inserted
     assert not fake_tcinout.removed
+
+
+def test_inout_state_callbacks(fake_inout):
+    logger.debug('test_inout_state_callbacks')
+    inout = fake_inout
+    inout.state.put('OUT')
+    status = StateStatus(inout, 'IN')
+    values = ('OUT', 2, 'Unknown')
+    for i in range(30):
+        # Same as a state signal update, without the fake signal overhead
+        inout._run_sub_state(sub_type=inout.state.SUB_VALUE, obj=inout.state,
+                             value=values[i % 3])
+        assert not inout.check_inserted(values[i % 3])
+        if values[i % 3] != 'Unknown':
+            assert inout.check_transmission(values[i % 3]) == 1
+    assert not status.done
+    inout.state.sim_put('IN')
+    status.wait(timeout=1)
+    assert status.success
+
+
+def test_inout_shared_states():
+    logger.debug('test_inout_shared_states')
+    Fake = make_fake_device(InOutRecordPositioner)
+    alias = dict(Fake._states_alias)
+    num_devices = 500
+    tracemalloc.start()
+    start = time.perf_counter()
+    devices = []
+    for i in range(num_devices):
+        inout = Fake(f'Test:Ref{i}', name=f'test{i}')
+        inout.state.sim_put(0)
+        inout.state.sim_set_enum_strs(('Unknown', 'IN', 'OUT'))
+        inout.position
+        devices.append(inout)
+    elapsed = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.info('%d fake InOutRecordPositioners: %.3f s, %.1f MB',
+                num_devices, elapsed, memory / 1e6)
+    # State definitions are shared, not rebuilt or mutated per instance
+    assert all(dev.states_enum is devices[0].states_enum for dev in devices)
+    assert Fake._states_alias == alias
+    assert devices[-1].position == 'Unknown'
+
+
+def make_fake_inouts(num_devices):
+    Fake = make_fake_device(InOutRecordPositioner)
+    devices = []
+    for i in range(num_devices):
+        inout = Fake(f'Test:Ref{i}', name=f'test{i}')
+        inout.state.sim_put(0)
+        inout.state.sim_set_enum_strs(('Unknown', 'IN', 'OUT'))
+        inout.state.put('OUT')
+        devices.append(inout)
+    return devices
+
+
+def test_move_states():
+    logger.debug('test_move_states')
+    devices = make_fake_inouts(3)
+    done = Mock()
+    devices[0].subscribe(done, event_type=devices[0].SUB_DONE, run=False)
+    status = move_states({dev: 'IN' for dev in devices}, wait=True)
+    assert isinstance(status, MultiStateStatus)
+    assert status.done and status.success
+    assert all(status.results.values())
+    assert all(dev.inserted for dev in devices)
+    assert done.called
+    # Shared callback is cleared from every device
+    for dev in devices:
+        assert status._state_changed not in dev._callbacks[dev.SUB_STATE]
+    # Nothing to move
+    assert move_states({}).done
+    # Every value is checked before anything moves
+    with pytest.raises(ValueError):
+        move_states({devices[0]: 'OUT', devices[1]: 'cats'})
+    assert devices[0].inserted
+
+
+def test_move_states_timeout():
+    logger.debug('test_move_states_timeout')
+    stuck, ok = make_fake_inouts(2)
+    stuck._do_move = Mock()
+    status = move_states({stuck: 'IN', ok: 'IN'}, timeout=0.1)
+    with pytest.raises(Exception):
+        status.wait(timeout=1)
+    assert not status.success
+    assert status.results == {stuck: False, ok: True}
+    assert status._state_changed not in stuck._callbacks[stuck.SUB_STATE]
+
+
+def test_move_states_repeated():
+    logger.debug('test_move_states_repeated')
+    devices = make_fake_inouts(12)
+    for state in ('IN', 'OUT', 'IN', 'OUT'):
+        status = move_states({dev: state for dev in devices}, timeout=10)
+        status.wait(timeout=1)
+        assert status.success
+        assert all(dev.position == state for dev in devices)
+        for dev in devices:
+            assert status._state_changed not in dev._callbacks[dev.SUB_STATE]
@@ -1,15 +1,24 @@
 import fcntl
+import gc
 import logging
 import multiprocessing as mp
 import os
+import re
 import signal
 import threading
 import time
+import weakref
 
 import pytest
-
-from pcdsdevices.interface import (get_engineering_mode, set_engineering_mode,
-                                   setup_preset_paths)
+import yaml
+from ophyd.sim import make_fake_device
+
+from pcdsdevices import preset_store
+from pcdsdevices.attenuator import FEESolidAttenuator
+from pcdsdevices.interface import (BaseInterface, get_engineering_mode,
+                                   mv_many, nearest_presets,
+                                   set_engineering_mode, setup_preset_paths,
+                                   umv_many, watch_presets)
 from pcdsdevices.sim import FastMotor, SlowMotor
 
 logger = logging.getLogger(__name__)
@@ -20,11 +29,6 @@ def slow_motor():
     return SlowMotor(name='sim_slow')
 
 
-@pytest.fixture(scope='function')
-def fast_motor():
-    return FastMotor(name='sim_fast')
-
-
 @pytest.mark.timeout(5)
 def test_mv(fast_motor):
     logger.debug('test_mv')
@@ -42,6 +46,50 @@ def test_umv(slow_motor):
     assert slow_motor.position == 7
 
 
+@pytest.mark.timeout(5)
+def test_umv_many():
+    logger.debug('test_umv_many')
+    motors = [SlowMotor(name='sim_slow{}'.format(i)) for i in range(5)]
+    for motor in motors:
+        motor._set_position(0)
+    start = time.monotonic()
+    umv_many({motor: i + 1 for i, motor in enumerate(motors)})
+    elapsed = time.monotonic() - start
+    assert [motor.position for motor in motors] == [1, 2, 3, 4, 5]
+    # The slowest axis takes 0.5 s, all of them in a row would take 1.5 s
+    assert elapsed < 1.2
+
+
+def test_mv_many_check_value(fast_motor):
+    logger.debug('test_mv_many_check_value')
+    other = FastMotor(name='sim_fast_other')
+    fast_motor._limits = (-10, 10)
+    with pytest.raises(ValueError):
+        mv_many({other: 5, fast_motor: 100}, wait=True)
+    assert other.position == 0
+    statuses = mv_many({other: 5, fast_motor: 3}, wait=True)
+    assert all(status.done for status in statuses)
+    assert (other.position, fast_motor.position) == (5, 3)
+
+
+def test_umv_many_interrupt():
+    logger.debug('test_umv_many_interrupt')
+    motors = [SlowMotor(name='sim_slow{}'.format(i)) for i in range(2)]
+    for motor in motors:
+        motor._set_position(0)
+    pid = os.getpid()
+
+    def interrupt():
+        time.sleep(0.25)
+        os.kill(pid, signal.SIGINT)
+
+    threading.Thread(target=interrupt, args=()).start()
+    umv_many({motor: 10 for motor in motors})
+    time.sleep(0.2)
+    for motor in motors:
+        assert motor.position < 10
+
+
 def test_camonitor(fast_motor):
     logger.debug('test_camonitor')
     pid = os.getpid()
@@ -169,6 +217,102 @@ def test_presets_type(presets, fast_motor):
         fast_motor.presets.add_user(234234, 'cats')
 
 
+def test_presets_incremental_sync(presets, fast_motor, monkeypatch):
+    logger.debug('test_presets_incremental_sync')
+    monkeypatch.setattr(preset_store, 'MTIME_RESOLUTION', 0)
+    fast_motor.presets.add_hutch('zero', 0)
+    fast_motor.presets.add_user('sample', 1)
+    mv_zero = fast_motor.mv_zero
+    sample = fast_motor.presets.positions.sample
+
+    # Nothing changed on disk, so nothing is read or registered again
+    read_count = 0
+    orig_read = fast_motor.presets._read
+
+    def counting_read(preset_type):
+        nonlocal read_count
+        read_count += 1
+        return orig_read(preset_type)
+
+    fast_motor.presets._read = counting_read
+    fast_motor.presets.sync()
+    assert read_count == 0
+    assert fast_motor.mv_zero is mv_zero
+
+    # Only the changed preset type is read, only the new names registered
+    fast_motor.presets.positions.zero.update_pos(2)
+    assert read_count == 2
+    assert fast_motor.mv_zero is mv_zero
+    assert fast_motor.wm_zero() == 2
+    assert fast_motor.presets.positions.sample is sample
+
+    # Edits made by another session
+    path = fast_motor.presets.positions.sample.path
+    with open(path, 'r') as f:
+        data = yaml.full_load(f)
+    data['other'] = dict(value=4, active=True, history={})
+    data['sample']['active'] = False
+    with open(path, 'w') as f:
+        yaml.dump(data, f)
+    fast_motor.presets.sync()
+    assert read_count == 3
+    assert fast_motor.wm_other() == 4
+    assert not hasattr(fast_motor, 'wm_sample')
+    assert fast_motor.mv_zero is mv_zero
+
+
+def test_presets_watcher(presets, fast_motor):
+    logger.debug('test_presets_watcher')
+    fast_motor.presets.add_hutch('zero', 0)
+    path = fast_motor.presets.positions.zero.path
+    watcher = watch_presets(interval=0.05)
+    try:
+        assert watcher.running
+        with open(path, 'r') as f:
+            data = yaml.full_load(f)
+        data['zero']['value'] = 5
+        with open(path, 'w') as f:
+            yaml.dump(data, f)
+        deadline = time.monotonic() + 2
+        while fast_motor.wm_zero() != 5 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert fast_motor.wm_zero() == 5
+    finally:
+        watch_presets(interval=None)
+    assert not watcher.running
+
+
+def test_presets_nearest(presets, fast_motor):
+    logger.debug('test_presets_nearest')
+    assert fast_motor.presets.nearest() is None
+    fast_motor.presets.add_hutch('low', -5)
+    fast_motor.presets.add_hutch('zero', 0)
+    fast_motor.presets.add_user('high', 10)
+    fast_motor.mv(1, wait=True)
+    assert fast_motor.presets.nearest() == ('zero', -1)
+    assert fast_motor.presets.nearest(-100) == ('low', 95)
+    assert fast_motor.presets.nearest(6) == ('high', 4)
+    assert fast_motor.presets.nearest(-2.5)[0] == 'low'
+    fast_motor.presets.positions.zero.deactivate()
+    assert fast_motor.presets.nearest() == ('low', -6)
+
+
+def test_nearest_presets(presets):
+    logger.debug('test_nearest_presets')
+    motors = [FastMotor(name='motor{}'.format(i)) for i in range(100)]
+    for i, motor in enumerate(motors):
+        motor.presets.add_hutch('in', i)
+        motor.presets.add_hutch('out', i + 50)
+        motor.mv(i + 50 if i % 2 else i + 0.5, wait=True)
+    nearest = nearest_presets(motors)
+    assert nearest['motor0'] == ('in', -0.5)
+    assert nearest['motor1'] == ('out', 0)
+    nearest = nearest_presets(motors, tolerance=0.1)
+    assert nearest['motor0'] is None
+    assert nearest['motor1'] == ('out', 0)
+    assert nearest_presets([]) == {}
+
+
 def test_engineering_mode():
     logger.debug('test_engineering_mode')
     set_engineering_mode(False)
@@ -184,3 +328,73 @@ def test_dir_whitelist_basic(fast_motor):
     set_engineering_mode(True)
     eng_dir = dir(fast_motor)
     assert len(eng_dir) > len(user_dir)
+
+
+def test_dir_presets(presets, fast_motor):
+    logger.debug('test_dir_presets')
+    set_engineering_mode(False)
+    assert 'mv_zero' not in dir(fast_motor)
+    fast_motor.presets.add_hutch('zero', 0)
+    assert 'mv_zero' in dir(fast_motor)
+    assert 'wm_zero' in dir(fast_motor)
+    assert '_mov_ev' not in dir(fast_motor)
+    fast_motor.presets.positions.zero.deactivate()
+    assert 'mv_zero' not in dir(fast_motor)
+    set_engineering_mode(True)
+    assert '_mov_ev' in dir(fast_motor)
+
+
+def naive_tab_regex(cls):
+    """Build the whitelist regex from the whole MRO, like we used to."""
+    string_whitelist = []
+    for parent in cls.mro():
+        if hasattr(parent, "tab_whitelist"):
+            string_whitelist.extend(parent.tab_whitelist)
+    return re.compile("|".join(string_whitelist))
+
+
+def test_tab_whitelist_nested():
+    logger.debug('test_tab_whitelist_nested')
+    depth = 50
+    cls = BaseInterface
+    for i in range(depth):
+        cls = type(f'Interface{i}', (cls,),
+                   dict(tab_whitelist=[f'method{i}', f'attr{i}_.*']))
+    regex = cls._get_tab_regex()
+    assert regex.fullmatch('method0')
+    assert regex.fullmatch(f'attr{depth - 1}_thing')
+    assert not regex.fullmatch('_private')
+    assert len(cls._tab_patterns) == len(set(cls._tab_patterns))
+    # Same matches as building the regex from the whole MRO
+    naive = naive_tab_regex(cls)
+    for name in ('method7', 'attr3_x', 'move', 'position', 'nope', '_x'):
+        assert bool(regex.fullmatch(name)) == bool(naive.fullmatch(name))
+
+    set_engineering_mode(False)
+    try:
+        att = make_fake_device(FEESolidAttenuator)('AT2L0:XTES', name='att')
+        first = dir(att)
+        assert sorted(dir(att)) == sorted(first)
+        assert 'find_configuration' in first
+        assert '_lightpath_lock' not in first
+    finally:
+        set_engineering_mode(True)
+
+
+def test_tab_class_index():
+    logger.debug('test_tab_class_index')
+    cls = type('Interface', (BaseInterface,), dict(tab_whitelist=['method']))
+    set_engineering_mode(False)
+    try:
+        assert 'method' not in dir(cls())
+        cls.method = lambda self: None
+        # The index is rebuilt when the patterns are
+        cls._init_tab_patterns()
+        assert 'method' in dir(cls())
+    finally:
+        set_engineering_mode(True)
+    # The index does not keep classes alive
+    ref = weakref.ref(cls)
+    del cls
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,285 @@
+import fcntl
+import logging
+import multiprocessing as mp
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pcdsdevices import preset_store
+from pcdsdevices.interface import Presets, setup_preset_paths
+from pcdsdevices.preset_store import (SqlitePresetStore, YamlPresetStore,
+                                      export_yaml, get_store, import_yaml,
+                                      split_history)
+from pcdsdevices.sim import FastMotor
+
+logger = logging.getLogger(__name__)
+
+
+def sample_presets(index):
+    return {'zero': {'value': 0.0, 'active': True,
+                     'history': {'01 Jan 2020 00:00:00': '    0.0000'}},
+            'out': {'value': float(index), 'active': index % 2 == 0,
+                    'history': {}}}
+
+
+@pytest.fixture(scope='function')
+def yaml_dir(tmp_path):
+    folder = tmp_path / 'yaml'
+    folder.mkdir()
+    store = YamlPresetStore(folder)
+    for i in range(3):
+        store.write('motor{}'.format(i), sample_presets(i))
+    return folder
+
+
+@pytest.fixture(scope='function')
+def sqlite_presets(tmp_path):
+    hutch = tmp_path / 'hutch.db'
+    user = tmp_path / 'user.db'
+    setup_preset_paths(hutch=hutch, user=user)
+    yield
+    setup_preset_paths()
+
+
+def test_get_store(tmp_path):
+    logger.debug('test_get_store')
+    assert isinstance(get_store(tmp_path), YamlPresetStore)
+    store = get_store(tmp_path / 'presets.db')
+    assert isinstance(store, SqlitePresetStore)
+    assert get_store(store) is store
+
+
+def test_setup_reuses_stores(tmp_path):
+    logger.debug('test_setup_reuses_stores')
+    setup_preset_paths(hutch=tmp_path / 'hutch.db')
+    store = Presets._stores['hutch']
+    setup_preset_paths(hutch=tmp_path / 'hutch.db', user=tmp_path / 'user')
+    assert Presets._stores['hutch'] is store
+    setup_preset_paths()
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.devices()
+
+
+def test_yaml_roundtrip(yaml_dir, tmp_path):
+    logger.debug('test_yaml_roundtrip')
+    database = tmp_path / 'presets.db'
+    assert import_yaml(yaml_dir, database) == ['motor0', 'motor1', 'motor2']
+    store = SqlitePresetStore(database)
+    assert store.exists('motor1')
+    assert not store.exists('motor5')
+    values, history = split_history(sample_presets(1))
+    assert store.read('motor1') == values
+    assert store.read_history('motor1') == history
+
+    # Exported files use the original layout, with the history embedded
+    export_dir = tmp_path / 'export'
+    export_yaml(database, export_dir)
+    assert (YamlPresetStore(export_dir).read_all()
+            == YamlPresetStore(yaml_dir).read_all())
+
+
+@pytest.mark.parametrize('backend', ['yaml', 'sqlite'])
+def test_history_log(yaml_dir, tmp_path, backend):
+    logger.debug('test_history_log')
+    if backend == 'yaml':
+        store = YamlPresetStore(yaml_dir)
+    else:
+        store = SqlitePresetStore(tmp_path / 'presets.db')
+        store.write('motor0', sample_presets(0))
+    # Legacy history is merged with the log
+    store.append_history('motor0', 'zero', '02 Jan 2020 00:00:00', '1')
+    store.append_history('motor0', 'zero', '03 Jan 2020 00:00:00', '2')
+    store.append_history('motor0', 'out', '03 Jan 2020 00:00:00', '3')
+    history = store.read_history('motor0')
+    assert list(history['zero'].values()) == ['    0.0000', '1', '2']
+    assert history['out'] == {'03 Jan 2020 00:00:00': '3'}
+    assert 'history' in store.read('motor0')['zero']
+
+    # Compaction moves the legacy history into the log
+    store.compact('motor0')
+    assert 'history' not in store.read('motor0')['zero']
+    assert store.read_history('motor0') == history
+
+    store.compact('motor0', keep=1)
+    assert store.read_history('motor0') == {
+        'zero': {'03 Jan 2020 00:00:00': '2'},
+        'out': {'03 Jan 2020 00:00:00': '3'},
+        }
+
+
+def append_many(path, writer, count):
+    store = YamlPresetStore(path)
+    for i in range(count):
+        store.append_history('motor0', 'zero', '{} {}'.format(writer, i),
+                             'x' * (i % 50))
+
+
+def test_history_log_concurrent_writers(yaml_dir):
+    logger.debug('test_history_log_concurrent_writers')
+    num_writers = 8
+    count = 300
+    procs = [mp.Process(target=append_many, args=(yaml_dir, writer, count))
+             for writer in range(num_writers)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    store = YamlPresetStore(yaml_dir)
+    with open(store.history_path('motor0')) as f:
+        lines = f.readlines()
+    assert len(lines) == num_writers * count
+    history = store.read_history('motor0')['zero']
+    # Plus the one legacy entry
+    assert len(history) == num_writers * count + 1
+    for writer in range(num_writers):
+        assert history['{} {}'.format(writer, count - 1)] == 'x' * 49
+
+
+def test_sqlite_lock(tmp_path):
+    logger.debug('test_sqlite_lock')
+    store = SqlitePresetStore(tmp_path / 'presets.db')
+    with store.lock('motor'):
+        store.write('motor', sample_presets(0))
+        with store.lock('motor'):
+            data = store.read('motor')
+        data['zero']['value'] = 1.0
+        store.write('motor', data)
+    assert store.read('motor')['zero']['value'] == 1.0
+
+    with pytest.raises(RuntimeError):
+        with store.lock('motor'):
+            store.write('motor', sample_presets(1))
+            raise RuntimeError('abort')
+    assert store.read('motor')['zero']['value'] == 1.0
+
+    other = SqlitePresetStore(tmp_path / 'presets.db')
+    with other.lock('motor'):
+        with pytest.raises(BlockingIOError):
+            with store.lock('motor', timeout=0.1):
+                pass
+
+
+def test_sqlite_lock_busy_timeout(tmp_path):
+    logger.debug('test_sqlite_lock_busy_timeout')
+    store = SqlitePresetStore(tmp_path / 'presets.db')
+
+    def busy_timeout():
+        return store._conn.execute('PRAGMA busy_timeout').fetchone()[0]
+
+    store._conn.execute('PRAGMA busy_timeout = 1234')
+    with store.lock('motor', timeout=0.5):
+        assert busy_timeout() == 500
+        with store.lock('motor', timeout=2):
+            assert busy_timeout() == 500
+    assert busy_timeout() == 1234
+
+    other = SqlitePresetStore(tmp_path / 'presets.db')
+    with other.lock('motor'):
+        with pytest.raises(BlockingIOError):
+            with store.lock('motor', timeout=0.1):
+                pass
+    assert busy_timeout() == 1234
+
+
+def test_yaml_lock_in_thread(yaml_dir):
+    logger.debug('test_yaml_lock_in_thread')
+    store = YamlPresetStore(yaml_dir)
+
+    def locked_read(timeout):
+        with store.lock('motor0', timeout=timeout):
+            return store.read('motor0')
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with open(store.device_path('motor0'), 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            start = time.monotonic()
+            with pytest.raises(BlockingIOError):
+                pool.submit(locked_read, 0.2).result()
+            assert time.monotonic() - start >= 0.2
+            # Released partway through the wait
+            future = pool.submit(locked_read, 2)
+            time.sleep(0.1)
+            fcntl.flock(f, fcntl.LOCK_UN)
+            assert future.result() == sample_presets(0)
+
+
+def test_sqlite_presets(sqlite_presets, fast_motor):
+    logger.debug('test_sqlite_presets')
+    fast_motor.mv(3, wait=True)
+    fast_motor.presets.add_hutch('zero', 0, comment='center')
+    fast_motor.presets.add_here_user('sample')
+    assert fast_motor.wm_zero() == -3
+    assert fast_motor.wm_sample() == 0
+
+    old_paths = fast_motor.presets._paths
+    setup_preset_paths()
+    assert not hasattr(fast_motor, 'wm_zero')
+    setup_preset_paths(**old_paths)
+    assert fast_motor.wm_zero() == -3
+    assert fast_motor.presets.positions.zero.path.endswith('hutch.db')
+
+    fast_motor.presets.positions.zero.update_pos(comment='hats')
+    assert fast_motor.wm_zero() == 0
+    history = fast_motor.presets.positions.zero.history
+    assert list(history.values())[-1].endswith('hats')
+    fast_motor.presets.positions.zero.deactivate()
+    assert not hasattr(fast_motor, 'wm_zero')
+
+
+def test_sqlite_bulk_load(tmp_path, monkeypatch):
+    logger.debug('test_sqlite_bulk_load')
+    motors = [FastMotor(name='motor{}'.format(i)) for i in range(20)]
+    store = SqlitePresetStore(tmp_path / 'hutch.db')
+    for i, motor in enumerate(motors):
+        store.write(motor.name, sample_presets(i))
+        motor.presets
+    store.close()
+
+    calls = []
+    for method in ('read', 'read_all'):
+        orig = getattr(SqlitePresetStore, method)
+
+        def counted(self, *args, method=method, orig=orig):
+            calls.append(method)
+            return orig(self, *args)
+
+        monkeypatch.setattr(SqlitePresetStore, method, counted)
+    setup_preset_paths(hutch=tmp_path / 'hutch.db')
+    # One query for every device, instead of one read per device
+    assert calls == ['read_all']
+    assert all(motor.wm_zero() == 0 for motor in motors)
+    assert hasattr(motors[0], 'wm_out')
+    assert not hasattr(motors[1], 'wm_out')
+    setup_preset_paths()
+
+
+def test_preset_parallel_sync(tmp_path, monkeypatch):
+    logger.debug('test_preset_parallel_sync')
+    monkeypatch.setattr(preset_store, 'LOCK_TIMEOUT', 30)
+    motors = [FastMotor(name='motor{}'.format(i)) for i in range(20)]
+    store = YamlPresetStore(tmp_path)
+    for i, motor in enumerate(motors):
+        store.write(motor.name, sample_presets(i))
+        motor.presets
+
+    # Another session is editing the first file, which only holds up motor0
+    with open(store.device_path('motor0'), 'r+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        setup = threading.Thread(target=setup_preset_paths,
+                                 kwargs=dict(hutch=tmp_path))
+        setup.start()
+        deadline = time.monotonic() + 10
+        while (not all(hasattr(motor, 'wm_zero') for motor in motors[1:])
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+        assert all('wm_zero' in dir(motor) for motor in motors[1:])
+        assert not hasattr(motors[0], 'wm_zero')
+        assert setup.is_alive()
+    setup.join(timeout=10)
+    assert not setup.is_alive()
+    assert motors[0].wm_zero() == 0
+    assert 'wm_zero' in dir(motors[0])
+    setup_preset_paths()
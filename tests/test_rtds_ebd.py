@@ -0,0 +1,69 @@
+import logging
+import time
+
+import pytest
+from ophyd.sim import make_fake_device
+
+from pcdsdevices.rtds_ebd import RTDSK0, RTDSL0
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope='function')
+def fake_rtds():
+    FakeRTDS = make_fake_device(RTDSK0)
+    rtds = FakeRTDS('RTDS:K0', name='rtds')
+    for mpa in rtds.lightpath_cpts:
+        getattr(rtds, mpa).state.sim_put(0)
+    return rtds
+
+
+def test_rtds_lightpath(fake_rtds):
+    logger.debug('test_rtds_lightpath')
+    rtds = fake_rtds
+    states = []
+    rtds.subscribe(lambda **kwargs: states.append(rtds.inserted),
+                   event_type=rtds.SUB_STATE, run=False)
+    assert rtds.removed
+    assert not rtds.inserted
+    rtds.mpa2.state.sim_put(1)
+    assert rtds.inserted
+    assert not rtds.removed
+    assert rtds.transmission == 1
+    # Only the first move to an invalid state changes the transmission
+    rtds.mpa3.state.sim_put(2)
+    rtds.mpa3.state.sim_put(3)
+    assert states == [True, True]
+    rtds.mpa2.state.sim_put(0)
+    rtds.mpa3.state.sim_put(0)
+    assert rtds.removed
+    assert rtds.transmission == 1
+    assert states == [True, True, False, False]
+
+
+def test_rtds_lightpath_debounce(fake_rtds):
+    logger.debug('test_rtds_lightpath_debounce')
+    rtds = fake_rtds
+    rtds.lightpath_debounce = 0.05
+    states = []
+    rtds.subscribe(lambda **kwargs: states.append(rtds.inserted),
+                   event_type=rtds.SUB_STATE, run=False)
+    # A burst of actuator moves is one state update
+    for mpa in rtds.lightpath_cpts:
+        getattr(rtds, mpa).state.sim_put(1)
+    assert states == []
+    time.sleep(0.2)
+    assert states == [True]
+    rtds.mpa1.state.sim_put(0)
+    time.sleep(0.2)
+    assert states == [True]
+    for mpa in rtds.lightpath_cpts:
+        getattr(rtds, mpa).state.sim_put(0)
+    time.sleep(0.2)
+    assert states == [True, False]
+    assert rtds.removed
+
+
+def test_rtds_disconnected():
+    logger.debug('test_rtds_disconnected')
+    RTDSL0('RTDS:L0', name='rtds')
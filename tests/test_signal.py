@@ -1,9 +1,16 @@
 import logging
+import threading
+import time
 from unittest.mock import Mock
 
+import numpy as np
+import pytest
 from ophyd.signal import EpicsSignal, EpicsSignalRO, Signal
 
-from pcdsdevices.signal import AvgSignal, PytmcSignal
+from pcdsdevices.signal import (AggregateSignal, AvgSignal, HistorySignal,
+                                PytmcSignal, RollingStats, SignalStats,
+                                TimeSeriesBuffer, downsample_minmax,
+                                subscribe_when_connected)
 
 logger = logging.getLogger(__name__)
 
@@ -46,3 +53,342 @@ def test_avg_signal():
     avg.subscribe(cb)
     sig.put(0)
     assert cb.called
+
+
+def test_rolling_stats():
+    logger.debug('test_rolling_stats')
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=1000)
+    values[rng.random(1000) < 0.1] = np.nan
+    rolling = RollingStats(50)
+    for i, value in enumerate(values):
+        rolling.append(value)
+        window = values[max(0, i - 49):i + 1]
+        stats = rolling.stats
+        if np.isnan(window).all():
+            assert stats.count == 0
+            assert np.isnan(stats.mean)
+            continue
+        assert stats.count == np.count_nonzero(~np.isnan(window))
+        assert np.isclose(stats.mean, np.nanmean(window))
+        assert np.isclose(stats.std, np.nanstd(window))
+        assert stats.min == np.nanmin(window)
+        assert stats.max == np.nanmax(window)
+
+
+def test_avg_signal_rolling_mean():
+    logger.debug('test_avg_signal_rolling_mean')
+    for averages in (120, 12000):
+        sig = Signal(name='raw', value=0)
+        avg = AvgSignal(sig, averages, name='avg')
+        for i in range(averages + 500):
+            avg._update_avg(value=np.nan if i % 7 == 0 else i)
+        assert np.isclose(avg.get(), np.nanmean(avg.values))
+
+
+class ConnectingSignal(Signal):
+    """Soft signal that starts out disconnected, like a PV."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metadata['connected'] = False
+        self._connect_event = threading.Event()
+
+    def connect(self):
+        self._metadata['connected'] = True
+        self._connect_event.set()
+        self._run_subs(sub_type=self.SUB_META, **self._metadata)
+
+    def wait_for_connection(self, timeout=2):
+        if not self._connect_event.wait(timeout):
+            raise TimeoutError(f'{self.name} did not connect')
+
+
+def test_subscribe_when_connected():
+    logger.debug('test_subscribe_when_connected')
+    callback = Mock()
+    dead = [ConnectingSignal(name=f'dead{i}') for i in range(8)]
+    dead_futures = [subscribe_when_connected(sig, callback) for sig in dead]
+    # Signals that never connect do not hold up the others
+    sig = ConnectingSignal(name='sig', value=1)
+    future = subscribe_when_connected(sig, callback)
+    assert not future.done()
+    sig.connect()
+    future.result(timeout=1)
+    assert not any(future.done() for future in dead_futures)
+    sig.put(2)
+    assert callback.call_count == 1
+    # Reconnecting does not subscribe again
+    sig.connect()
+    sig.put(3)
+    assert callback.call_count == 2
+    assert subscribe_when_connected(sig, callback).done()
+
+
+def test_signal_stats():
+    logger.debug('test_signal_stats')
+    sig = Signal(name='raw', value=0)
+    stats = SignalStats(signal=sig, averages=3, name='stats')
+    stats._subscribed.result(timeout=1)
+    for value in (1, 2, np.nan, 6):
+        sig.put(value)
+    assert stats.count.get() == 2
+    assert stats.mean.get() == 4
+    assert stats.std.get() == 2
+    assert stats.min.get() == 2
+    assert stats.max.get() == 6
+    stats.averages = 2
+    sig.put(5)
+    assert stats.count.get() == 1
+    assert stats.mean.get() == 5
+    assert 'stats_mean' in stats.read()
+
+
+def test_time_series_buffer():
+    logger.debug('test_time_series_buffer')
+    rng = np.random.default_rng(1)
+    num_samples = 500
+    values = rng.normal(size=num_samples)
+    values[rng.random(num_samples) < 0.1] = np.nan
+    timestamps = np.cumsum(rng.uniform(0, 0.1, size=num_samples))
+    buffer = TimeSeriesBuffer(100)
+    windows = {(30, None): buffer.add_window(shots=30),
+               (None, 2.5): buffer.add_window(seconds=2.5),
+               (200, None): buffer.add_window(shots=200),
+               (50, 1.): buffer.add_window(shots=50, seconds=1.)}
+    updates = Mock()
+    buffer.add_window(shots=1, callback=updates)
+    for i, (value, timestamp) in enumerate(zip(values, timestamps)):
+        buffer.append(value, timestamp=timestamp)
+        if i == 250:
+            # Late windows start with the history that fits
+            windows[(None, 4.)] = buffer.add_window(seconds=4.)
+        for (shots, seconds), window in windows.items():
+            first = max(0, i + 1 - buffer.capacity)
+            if shots is not None:
+                first = max(first, i + 1 - shots)
+            if seconds is not None:
+                first = max(first, np.searchsorted(
+                    timestamps, timestamp - seconds, side='right'))
+            expected = values[first:i + 1]
+            np.testing.assert_array_equal(window.values, expected)
+            np.testing.assert_array_equal(window.timestamps,
+                                          timestamps[first:i + 1])
+            if np.isnan(expected).all():
+                assert window.stats.count == 0
+                continue
+            assert np.isclose(window.stats.mean, np.nanmean(expected))
+            assert np.isclose(window.stats.std, np.nanstd(expected))
+            assert window.stats.min == np.nanmin(expected)
+            assert window.stats.max == np.nanmax(expected)
+    assert updates.call_count == num_samples
+    # Views, not copies
+    assert all(np.shares_memory(window.values, buffer._values)
+               for window in windows.values())
+
+
+def test_downsample_minmax():
+    logger.debug('test_downsample_minmax')
+    timestamps = np.arange(10005, dtype=float)
+    values = np.sin(timestamps / 100)
+    values[1234] = 50
+    values[5678] = -50
+    values[9000:9010] = np.nan
+    ts, vals = downsample_minmax(timestamps, values, 200)
+    assert len(vals) <= 202
+    assert np.all(np.diff(ts) > 0)
+    # Spikes survive, and every point is a real sample
+    assert 50 in vals and -50 in vals
+    np.testing.assert_array_equal(vals, values[ts.astype(int)])
+    # Short series are returned as they are
+    ts, vals = downsample_minmax(timestamps[:100], values[:100], 200)
+    assert np.shares_memory(vals, values)
+
+
+def test_history_signal():
+    logger.debug('test_history_signal')
+    sig = Signal(name='raw', value=0)
+    hist = HistorySignal(sig, capacity=1000, name='hist')
+    hist._subscribed.result(timeout=1)
+    for i in range(1, 1500):
+        sig.put(i, timestamp=1000 + i)
+    assert hist.get() == 1499
+    timestamps, values = hist.history()
+    assert len(values) == hist.capacity == 1000
+    np.testing.assert_array_equal(values, np.arange(500, 1500))
+    np.testing.assert_array_equal(timestamps, 1000 + np.arange(500, 1500))
+    _, values = hist.history(start=2400, stop=2409)
+    np.testing.assert_array_equal(values, np.arange(1400, 1410))
+
+
+def test_history_signal_downsample_full():
+    logger.debug('test_history_signal_downsample_full')
+    sig = Signal(name='raw', value=0)
+    hist = HistorySignal(sig, capacity=20000, name='hist')
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=20000)
+    now = time.time()
+    for i, value in enumerate(values):
+        hist.buffer.append(value, timestamp=now + i)
+    timestamps, downsampled = hist.downsample(200)
+    assert len(downsampled) <= 200
+    assert len(timestamps) == len(downsampled)
+    assert downsampled.max() == values.max()
+    assert downsampled.min() == values.min()
+
+
+class SlowSignal(Signal):
+    """Soft signal where every read costs a simulated round trip."""
+    def __init__(self, *args, delay=0.05, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+        self.num_gets = 0
+
+    def get(self, **kwargs):
+        self.num_gets += 1
+        time.sleep(self.delay)
+        return super().get(**kwargs)
+
+
+class SumSignal(AggregateSignal):
+    def __init__(self, signals, *, name, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self._sub_signals.extend(signals)
+
+    def _calc_readback(self):
+        return sum(self._cache[sig] for sig in self._sub_signals)
+
+
+class BarrierSignal(Signal):
+    """Soft signal whose reads only finish once all of them have started."""
+    def __init__(self, *args, barrier, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.barrier = barrier
+
+    def get(self, **kwargs):
+        self.barrier.wait(timeout=5)
+        return super().get(**kwargs)
+
+
+def test_aggregate_signal_parallel_get():
+    logger.debug('test_aggregate_signal_parallel_get')
+    # This would time out if the reads were made one at a time
+    barrier = threading.Barrier(8)
+    subs = [BarrierSignal(name=f'sub{i}', value=i, barrier=barrier)
+            for i in range(8)]
+    agg = SumSignal(subs, name='agg')
+    assert agg.get() == sum(range(8))
+
+
+class UpdatingSignal(Signal):
+    """Soft signal that gets a new value while a read is in progress."""
+    update_to = None
+
+    def get(self, **kwargs):
+        value = super().get(**kwargs)
+        if self.update_to is not None:
+            new_value, self.update_to = self.update_to, None
+            self.put(new_value)
+        return value
+
+
+def test_aggregate_signal_get_during_update():
+    logger.debug('test_aggregate_signal_get_during_update')
+    subs = [UpdatingSignal(name=f'sub{i}', value=1) for i in range(2)]
+    agg = SumSignal(subs, name='agg')
+    agg.subscribe(lambda **kwargs: None)
+    subs[0].update_to = 5
+    # The monitor update that arrived during the read is newer than the read
+    assert agg.get() == 6
+    assert agg._cache[subs[0]] == 5
+
+
+def test_aggregate_signal_max_age():
+    logger.debug('test_aggregate_signal_max_age')
+    subs = [SlowSignal(name=f'sub{i}', value=i, delay=0) for i in range(4)]
+    agg = SumSignal(subs, name='agg')
+    # Not monitored yet, so the cache is never fresh
+    agg.get(max_age=10)
+    assert subs[0].num_gets == 1
+    agg.subscribe(lambda **kwargs: None)
+    assert subs[0].num_gets == 2
+    subs[0].put(10)
+    assert agg.get(max_age=10) == 16
+    assert subs[0].num_gets == 2
+    # Values that never change are still current while connected
+    time.sleep(0.01)
+    assert agg.get(max_age=0.001) == 16
+    assert subs[0].num_gets == 2
+    # A disconnected signal is only trusted for max_age
+    subs[3]._metadata['connected'] = False
+    assert agg.get(max_age=10) == 16
+    assert subs[0].num_gets == 2
+    assert agg.get(max_age=0.001) == 16
+    assert subs[0].num_gets == 3
+
+
+class LatestSignal(AggregateSignal):
+    def __init__(self, signals, *, name, **kwargs):
+        super().__init__(name=name, **kwargs)
+        self._sub_signals.extend(signals)
+
+    def _calc_readback(self):
+        return max(self._cache.values())
+
+
+def test_aggregate_signal_callback_threads():
+    logger.debug('test_aggregate_signal_callback_threads')
+    num_signals = 8
+    num_puts = 200
+    subs = [Signal(name=f'sub{i}', value=0) for i in range(num_signals)]
+    agg = LatestSignal(subs, name='agg')
+    values = []
+    agg.subscribe(lambda value, **kwargs: values.append(value), run=False)
+
+    def update(index, sig):
+        for i in range(num_puts):
+            sig.put(i * num_signals + index + 1)
+
+    threads = [threading.Thread(target=update, args=(i, sig))
+               for i, sig in enumerate(subs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The maximum only grows, so any out of order delivery would show
+    assert values == sorted(set(values))
+    assert values[-1] == num_puts * num_signals == agg.get()
+
+
+@pytest.mark.parametrize('coalesce', [False, True])
+def test_aggregate_signal_callback_order(coalesce):
+    logger.debug('test_aggregate_signal_callback_order')
+    sub = Signal(name='sub', value=0)
+    agg = LatestSignal([sub], name='agg')
+    agg._coalesce_sub_values = coalesce
+    values = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_subscriber(value, **kwargs):
+        if value == 1:
+            started.set()
+            release.wait(timeout=5)
+        values.append(value)
+
+    agg.subscribe(blocking_subscriber, run=False)
+    thread = threading.Thread(target=sub.put, args=(1,))
+    thread.start()
+    assert started.wait(timeout=5)
+    # These arrive while the first one is being sent, and do not wait for it
+    sub.put(2)
+    sub.put(3)
+    assert values == []
+    release.set()
+    thread.join(timeout=5)
+    if coalesce:
+        # Only the newest of the merged readbacks is sent
+        assert values == [1, 3]
+    else:
+        # Every readback is sent, in order
+        assert values == [1, 2, 3]
+    assert agg.get() == 3
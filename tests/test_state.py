@@ -7,7 +7,8 @@ from ophyd.signal import Signal
 from ophyd.sim import make_fake_device
 
 from pcdsdevices.state import (PVStatePositioner, StatePositioner,
-                               StateRecordPositioner, StateStatus)
+                               StateRecordPositioner, StateStatus,
+                               TwinCATStatePositioner)
 
 logger = logging.getLogger(__name__)
 
@@ -95,6 +96,32 @@ def test_pvstate_positioner_logic():
         lim_obj.states_enum['defer']
 
 
+class FirstLimCls(LimCls):
+    _state_logic_mode = 'FIRST'
+
+
+def test_pvstate_positioner_table():
+    logger.debug('test_pvstate_positioner_table')
+    for cls in (LimCls, FirstLimCls):
+        assert len(cls._state_table) == 4
+        for values, state in cls._state_table.items():
+            assert state == cls._evaluate_state_logic(values)
+    assert LimCls._state_table[(0, 0)] == 'Unknown'
+    assert FirstLimCls._state_table[(0, 0)] == 'in'
+
+    # Unaccounted values are only inspected if they are reached
+    lim_obj = LimCls('BASE', name='test')
+    lim_obj.lowlim.put(0)
+    lim_obj.highlim.put(5)
+    assert lim_obj.position == 'Unknown'
+    first_obj = FirstLimCls('BASE', name='test')
+    first_obj.lowlim.put(0)
+    first_obj.highlim.put(5)
+    assert first_obj.position == 'IN'
+    first_obj.lowlim.put(5)
+    assert first_obj.position == 'Unknown'
+
+
 def test_pvstate_positioner_describe():
     logger.debug('test_pvstate_positioner_describe')
     lim_obj = LimCls('BASE', name='test')
@@ -205,3 +232,26 @@ def test_auto_states():
     enum_strs = ('Unknown', 'IN', 'OUT')
     states.state._run_subs(sub_type=states.state.SUB_META, enum_strs=enum_strs)
     assert states.states_list == list(enum_strs)
+
+
+def test_twincat_state_config_lazy():
+    logger.debug('test_twincat_state_config_lazy')
+    FakeTwinCAT = make_fake_device(TwinCATStatePositioner)
+    state = FakeTwinCAT('PREFIX', name='test')
+    # No config signals until someone asks for them
+    assert 'config' not in state._signals
+    assert 'state01' not in state.config._signals
+    state.config.state02.setpoint.sim_put(1.5)
+    assert list(state.config._signals) == ['state02']
+
+    config = state.config
+    for i, state_name in enumerate(('OUT', 'TARGET1')):
+        cfg = getattr(config, f'state{i + 1:02}')
+        cfg.state_name.sim_put(state_name)
+        cfg.setpoint.sim_put(10.0 * i)
+        cfg.valid.sim_put(1)
+    table = config.read_state_table()
+    assert table.shape == (15,)
+    assert list(table['state_name'][:2]) == ['OUT', 'TARGET1']
+    assert list(table['setpoint'][:3]) == [0, 10, 0]
+    assert list(table['valid'][:3]) == [True, True, False]
@@ -3,8 +3,11 @@ import pty
 import sys
 import threading
 import time
+from unittest.mock import Mock
 
+import ophyd
 import pytest
+from ophyd.signal import Signal
 
 import pcdsdevices.utils as util
 
@@ -60,3 +63,206 @@ def test_cbreak(sim_input):
     # send the ctrl+c character
     input_later(sim_input, '\x03\n')
     assert util.get_input() == '\n'
+
+
+class FakeScheduler:
+    """Records scheduled calls so a test can run them one at a time."""
+    def __init__(self):
+        self.delays = []
+        self.later = []
+        self.submitted = []
+
+    def call_later(self, delay, func, **kwargs):
+        self.delays.append(delay)
+        self.later.append(func)
+        return Mock()
+
+    def submit(self, func, **kwargs):
+        self.submitted.append(func)
+
+    def run_next(self):
+        """Run the next timed call and the delivery it hands off."""
+        self.later.pop(0)()
+        self.submitted.pop(0)()
+
+
+@pytest.fixture(scope='function')
+def fake_scheduler(monkeypatch):
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(util, 'get_scheduler', lambda: scheduler)
+    return scheduler
+
+
+def test_rate_limited_callback(fake_scheduler):
+    logger.debug('test_rate_limited_callback')
+    sig = Signal(name='sig', value=0)
+    values = []
+
+    def callback(value, **kwargs):
+        values.append(value)
+
+    rate_limited = util.subscribe_rate_limited(sig, callback, max_rate=20,
+                                               run=False)
+    for i in range(1, 101):
+        sig.put(i)
+    # One delivery is scheduled right away for the whole burst
+    assert fake_scheduler.delays == [0]
+    fake_scheduler.run_next()
+    assert values == [100]
+    assert rate_limited.dropped == 99
+    # The next one waits for the rest of the period
+    sig.put(101)
+    sig.put(102)
+    assert len(fake_scheduler.delays) == 2
+    assert 0 < fake_scheduler.delays[1] <= 1 / 20
+    fake_scheduler.run_next()
+    assert values == [100, 102]
+    assert rate_limited.delivered == 2
+    assert rate_limited.delivered + rate_limited.dropped == 102
+
+    rate_limited.unsubscribe()
+    sig.put(-1)
+    assert not fake_scheduler.later
+    assert values[-1] == 102
+
+
+def test_rate_limited_slow_callback(fake_scheduler):
+    logger.debug('test_rate_limited_slow_callback')
+    sig = Signal(name='sig', value=0)
+    values = []
+
+    def slow_callback(value, **kwargs):
+        values.append(value)
+        if value == 1:
+            # Events that arrive while the callback is still running
+            for i in range(2, 201):
+                sig.put(i)
+            assert not fake_scheduler.later
+
+    rate_limited = util.subscribe_rate_limited(sig, slow_callback,
+                                               max_rate=1000, run=False)
+    sig.put(1)
+    fake_scheduler.run_next()
+    assert values == [1]
+    # The delivery schedules the next one when it finishes
+    assert len(fake_scheduler.later) == 1
+    fake_scheduler.run_next()
+    assert values == [1, 200]
+    assert rate_limited.dropped == 198
+
+
+def test_rate_limited_unsubscribe_during_delivery(fake_scheduler, caplog):
+    logger.debug('test_rate_limited_unsubscribe_during_delivery')
+    sig = Signal(name='sig', value=0)
+    callback = Mock()
+    rate_limited = util.subscribe_rate_limited(sig, callback, max_rate=100,
+                                               run=False)
+    sig.put(1)
+    fake_scheduler.later.pop(0)()
+    rate_limited.unsubscribe()
+    with caplog.at_level(logging.ERROR):
+        fake_scheduler.submitted.pop(0)()
+    assert not caplog.records
+    assert not callback.called
+    assert not fake_scheduler.later
+
+
+def test_rate_limited_busy_utility_thread():
+    logger.debug('test_rate_limited_busy_utility_thread')
+    sig = Signal(name='sig', value=0)
+    delivered = threading.Event()
+    rate_limited = util.subscribe_rate_limited(
+        sig, lambda **kwargs: delivered.set(), max_rate=100, run=False)
+    # Other callbacks are stuck in all of ophyd's utility threads
+    release = threading.Event()
+    dispatcher = ophyd.cl.get_dispatcher()
+    for name in dispatcher.threads:
+        if name.startswith('util'):
+            dispatcher.schedule_utility_task(release.wait, 5)
+    try:
+        sig.put(1)
+        assert delivered.wait(timeout=1)
+    finally:
+        release.set()
+        rate_limited.unsubscribe()
+
+
+def test_task_scheduler():
+    logger.debug('test_task_scheduler')
+    scheduler = util.TaskScheduler(name='test_scheduler')
+    calls = []
+    scheduler.call_later(0.1, calls.append, args=('late',))
+    scheduler.call_later(0.05, calls.append, args=('early',))
+    cancelled = scheduler.call_later(0.01, calls.append, args=('cancelled',))
+    cancelled.cancel()
+    first = scheduler.call_later(0.02, calls.append, args=('first',), key=1)
+    second = scheduler.call_later(0.03, calls.append, args=('second',),
+                                  key=1)
+    assert first is second
+    assert scheduler.metrics()['queue_depth'] == 3
+    time.sleep(0.2)
+    assert calls == ['second', 'early', 'late']
+    metrics = scheduler.metrics()
+    assert metrics['queue_depth'] == 0
+    assert metrics['run'] == 3
+    assert metrics['coalesced'] == 1
+    assert metrics['cancelled'] == 1
+
+    # Cancelling after the call ran changes nothing
+    first.cancel()
+    metrics = scheduler.metrics()
+    assert metrics['queue_depth'] == 0
+    assert metrics['cancelled'] == 1
+
+    # A merged call runs at the earlier of the two times
+    late = scheduler.call_later(1, calls.append, args=('merged',), key=2)
+    early = scheduler.call_later(0.01, calls.append, args=('merged',), key=2)
+    assert late is early
+    time.sleep(0.1)
+    assert calls[-1] == 'merged'
+    assert scheduler.metrics()['queue_depth'] == 0
+
+
+class Retry:
+    def __init__(self):
+        self.calls = 0
+
+    def retry(self):
+        self.calls += 1
+
+
+def test_schedule_task_burst():
+    logger.debug('test_schedule_task_burst')
+    num_devices = 500
+    devices = [Retry() for i in range(num_devices)]
+    threads_before = threading.active_count()
+    start = time.monotonic()
+    for device in devices:
+        # Each device asks for a retry three times before the first runs
+        for i in range(3):
+            util.schedule_task(device.retry, delay=0.2, key=device)
+    elapsed = time.monotonic() - start
+    extra_threads = threading.active_count() - threads_before
+    time.sleep(0.4)
+    metrics = util.get_scheduler().metrics()
+    logger.info('Scheduled %d delayed tasks in %.1f ms with %d new threads, '
+                'max lateness %.1f ms', 3 * num_devices, 1e3 * elapsed,
+                extra_threads, 1e3 * metrics['max_lateness'])
+    assert extra_threads <= 1
+    assert all(device.calls == 1 for device in devices)
+    assert metrics['coalesced'] >= 2 * num_devices
+
+    handle = util.schedule_task(devices[0].retry, delay=0.05)
+    handle.cancel()
+    time.sleep(0.1)
+    assert devices[0].calls == 1
+
+
+def test_schedule_task_no_key():
+    logger.debug('test_schedule_task_no_key')
+    device = Retry()
+    # Tasks without a key all run, even for the same bound method
+    for i in range(3):
+        util.schedule_task(device.retry, delay=0.05)
+    time.sleep(0.2)
+    assert device.calls == 3